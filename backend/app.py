@@ -1,44 +1,223 @@
 import asyncio
+import itertools
 import json
 import os
+import tarfile
 import uuid
+import zipfile
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 
 import redis
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, request, jsonify, session, stream_with_context
 from flask_cors import CORS
 from flask_socketio import SocketIO, join_room, leave_room, emit
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from services.code_quality import CodeQualityAnalyzer
+from services.batch_analysis import BatchAnalyzer, iter_archive_items
+from services.code_quality import CodeQualityAnalyzer, ANALYZER_VERSION, analysis_backends
+from services.collaboration_store import SessionStore
+from services.eslint_daemon import get_eslint_daemon
+from services.lint_pool import get_pylint_pool
 from services.llm_service import LLMService
 from services.multilingual import MultiLanguageSupport
+from services.presence import PresenceTicker
 from services.tts_service import TTSService
-from utils.cache import CacheManager
+from utils.audio_store import AudioStore, audio_digest, render_key
+from utils.cache import CacheManager, content_key
+from utils.helpers import interleave, iterate_async, sse_event
+from utils.memory import process_memory
+from utils.singleflight import SingleFlight
+from utils.stage_graph import StageGraph
 from models.collaboration import CollaborationSession
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379')
+# Larger request bodies (e.g. batch archives) are rejected with 413
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 50 * 1024 * 1024))
 
 # Enable CORS
 CORS(app, supports_credentials=True, origins=os.getenv('ALLOWED_ORIGINS', '*').split(','))
 
-# Initialize SocketIO for real-time collaboration
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+# Initialize SocketIO for real-time collaboration. Room broadcasts go through
+# the Redis message queue so they reach clients connected to other workers
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode='eventlet',
+    message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE', app.config['REDIS_URL']) or None
+)
 
 # Initialize services
 redis_client = redis.from_url(app.config['REDIS_URL'])
 cache_manager = CacheManager(redis_client)
+audio_store = AudioStore(redis_client)
+singleflight = SingleFlight(redis_client, cache_manager)
 code_analyzer = CodeQualityAnalyzer()
 llm_service = LLMService()
 multilingual = MultiLanguageSupport()
 tts_service = TTSService()
+batch_analyzer = BatchAnalyzer(cache_manager, ANALYZER_VERSION, llm_service=llm_service)
 
-# Store active collaboration sessions
-active_sessions: Dict[str, CollaborationSession] = {}
+# One structured completion for roast, suggestions and correction instead of three
+COMBINED_REVIEW = os.getenv('LLM_COMBINED_REVIEW', 'false').lower() == 'true'
+
+# Collaboration sessions, shared by all workers through Redis
+session_store = SessionStore(redis_client)
+
+def save_cursor_positions(session_id: str, positions: Dict[str, Dict]) -> None:
+    """Persist the cursors of a flushed presence frame"""
+    session = session_store.get(session_id)
+    if session is not None:
+        session_store.update_cursor_positions(
+            session, {user_id: position['cursor_position'] for user_id, position in positions.items()}
+        )
+
+# Cursor moves are batched into one presence frame per room per tick
+presence = PresenceTicker(socketio, on_flush=save_cursor_positions)
+
+# Socket id -> (session id, user id), so dropped connections leave their session
+collab_connections: Dict[str, Tuple[str, str]] = {}
+
+def is_connected_as(session_id: str, user_id: str) -> bool:
+    """Whether this socket joined the session as that user (guards against spoofed ids)"""
+    return bool(session_id and user_id) and collab_connections.get(request.sid) == (session_id, user_id)
+
+SESSION_REAP_INTERVAL = int(os.getenv('COLLAB_REAP_INTERVAL', 60))
+_reaper_started = False
+
+def run_session_reaper():
+    """Periodically snapshot and evict idle collaboration sessions"""
+    while True:
+        socketio.sleep(SESSION_REAP_INTERVAL)
+        try:
+            session_store.reap()
+        except Exception as e:
+            app.logger.warning(f"Session reaper failed: {e}")
+
+def ensure_session_reaper():
+    """Start the reaper in this worker on first use (never in a preloading master)"""
+    global _reaper_started
+    if not _reaper_started:
+        _reaper_started = True
+        socketio.start_background_task(run_session_reaper)
+
+def run_static_analysis(code: str, language: str) -> Dict:
+    """Run (or fetch from cache) the static analysis and metrics for code"""
+    static_key = content_key('static', code, language, ANALYZER_VERSION)
+    static = cache_manager.get(static_key)
+    if static is None:
+        static = code_analyzer.analyze_with_metrics(code, language)
+        cache_manager.set(static_key, static, ttl=3600)
+    return static
+
+async def render_audio(roast_text: str, intensity: str, language: str) -> Optional[str]:
+    """Render a roast to audio once per (text, voice, intensity) and return its URL
+    
+    The audio store is content-addressed, so it doubles as the audio cache;
+    concurrent requests for the same audio share a single TTS call.
+    """
+    digest = audio_digest(roast_text, language, intensity)
+    if audio_store.exists(digest):
+        return audio_store.url_for(digest)
+    
+    async def synthesize():
+        audio_data = await tts_service.generate_audio_roast(
+            roast_text=roast_text,
+            intensity=intensity,
+            language=language
+        )
+        if not audio_data:
+            return None
+        audio_store.put(digest, audio_data)
+        return audio_store.url_for(digest)
+    
+    return await singleflight.do(render_key(digest), synthesize)
+
+def build_analysis_stages(code: str, language: str, roast_level: str, issues: List[str],
+                          on_token: Optional[Callable[[str, str], None]] = None) -> StageGraph:
+    """Build the LLM/TTS stage graph for an analysis
+    
+    Suggestions and corrections only need the static analysis, so they run
+    alongside the roast, and only the audio waits for the roast text. Each
+    stage is cached under a key built only from its own inputs, and identical
+    stages in flight on any worker are computed only once.
+    
+    With ``LLM_COMBINED_REVIEW`` set, a single ``review`` stage produces all
+    three texts from one completion, and the roast, suggestions and
+    corrected code stages just pick their field out of it.
+    
+    ``on_token(stage, chunk)``, if given, receives the roast and suggestions
+    text as it is generated (not in combined mode, whose output is JSON).
+    """
+    def token_sink(stage):
+        if on_token is None:
+            return None
+        return lambda chunk: on_token(stage, chunk)
+    
+    async def roast_stage(_):
+        return await llm_service.generate_roast(
+            code=code,
+            issues=issues,
+            language=language,
+            intensity=roast_level,
+            on_token=token_sink('roast')
+        )
+    
+    async def suggestions_stage(_):
+        return await llm_service.generate_suggestions(
+            code=code,
+            issues=issues,
+            language=language,
+            on_token=token_sink('suggestions')
+        )
+    
+    async def corrected_code_stage(_):
+        return await llm_service.correct_code(
+            code=code,
+            issues=issues,
+            language=language
+        )
+    
+    async def audio_stage(deps):
+        return await render_audio(deps['roast']['text'], roast_level, language)
+    
+    if COMBINED_REVIEW:
+        async def review_stage(_):
+            return await llm_service.generate_review(
+                code=code,
+                issues=issues,
+                language=language,
+                intensity=roast_level
+            )
+        
+        def review_field(field):
+            async def pick(deps):
+                return deps['review'][field]
+            return pick
+        
+        return (
+            StageGraph()
+            .add('review', singleflight.stage(
+                content_key('review', code, language, roast_level, ANALYZER_VERSION), review_stage))
+            .add('roast', review_field('roast'), depends_on=['review'])
+            .add('suggestions', review_field('suggestions'), depends_on=['review'])
+            .add('corrected_code', review_field('corrected_code'), depends_on=['review'])
+            .add('audio', audio_stage, depends_on=['roast'])
+        )
+    
+    return (
+        StageGraph()
+        .add('roast', singleflight.stage(
+            content_key('roast', code, language, roast_level, ANALYZER_VERSION), roast_stage))
+        .add('suggestions', singleflight.stage(
+            content_key('suggestions', code, language, ANALYZER_VERSION), suggestions_stage))
+        .add('corrected_code', singleflight.stage(
+            content_key('corrected', code, language, ANALYZER_VERSION), corrected_code_stage))
+        .add('audio', audio_stage, depends_on=['roast'])
+    )
 
 @app.route('/api/analyze', methods=['POST'])
 async def analyze_code():
@@ -53,76 +232,28 @@ async def analyze_code():
         if not code:
             return jsonify({"error": "No code provided"}), 400
         
-        # Check cache first
-        cache_key = f"analysis:{hash(code)}:{language}:{roast_level}"
-        cached_result = cache_manager.get(cache_key)
-        if cached_result:
-            return jsonify(cached_result)
-        
-        # Analyze code based on language
-        if language == 'python':
-            analysis = code_analyzer.analyze_python(code)
-        elif language == 'javascript':
-            analysis = code_analyzer.analyze_javascript(code)
-        elif language == 'java':
-            analysis = code_analyzer.analyze_java(code)
-        elif language == 'cpp':
-            analysis = code_analyzer.analyze_cpp(code)
-        else:
-            analysis = code_analyzer.analyze_generic(code, language)
-        
-        # Generate roast with AI
-        roast = await llm_service.generate_roast(
-            code=code,
-            issues=analysis['issues'],
-            language=language,
-            intensity=roast_level
-        )
+        # Changing the roast level reuses the cached static analysis,
+        # suggestions and corrected code and only re-runs the roast and audio
+        static = run_static_analysis(code, language)
+        analysis = static['analysis']
+        metrics = static['metrics']
         
-        # Generate suggestions for improvement
-        suggestions = await llm_service.generate_suggestions(
-            code=code,
-            issues=analysis['issues'],
-            language=language
-        )
-        
-        # Generate audio roast
-        audio_data = await tts_service.generate_audio_roast(
-            roast_text=roast['text'],
-            intensity=roast_level,
-            language=language
-        )
-        
-        # Generate corrected code
-        corrected_code = await llm_service.correct_code(
-            code=code,
-            issues=analysis['issues'],
-            language=language
-        )
-        
-        # Calculate comprehensive metrics
-        metrics = code_analyzer.calculate_comprehensive_metrics(
-            code=code,
-            analysis=analysis,
-            language=language
-        )
+        stages = build_analysis_stages(code, language, roast_level, analysis['issues'])
+        stage_results = await stages.run()
         
         # Prepare response
         result = {
             "success": True,
             "analysis": analysis,
-            "roast": roast,
-            "suggestions": suggestions,
-            "corrected_code": corrected_code,
+            "roast": stage_results['roast'],
+            "suggestions": stage_results['suggestions'],
+            "corrected_code": stage_results['corrected_code'],
             "metrics": metrics,
-            "audio": audio_data,
+            "audio": stage_results['audio'],
             "language": language,
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        # Cache the result
-        cache_manager.set(cache_key, result, ttl=3600)
-        
         # Track user analytics
         track_analysis_metrics(user_id, language, metrics)
         
@@ -135,6 +266,137 @@ async def analyze_code():
             "message": str(e)
         }), 500
 
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_code_stream():
+    """Analyze code, streaming each stage as a server-sent event when it completes
+    
+    Emits ``analysis`` (static analysis and metrics) first, then ``roast``,
+    ``suggestions``, ``corrected_code`` and ``audio`` in completion order,
+    and finally ``done``. Failures are reported as an ``error`` event.
+    
+    With ``"stream_tokens": true`` the roast and suggestions text is also
+    sent as it is generated, in ``roast_token`` and ``suggestions_token``
+    events carrying ``{"text": chunk}``. Cached stages only send their
+    final event.
+    """
+    data = request.json or {}
+    code = data.get('code', '')
+    language = data.get('language', 'python')
+    roast_level = data.get('roast_level', 'medium')
+    user_id = data.get('user_id', str(uuid.uuid4()))
+    stream_tokens = bool(data.get('stream_tokens', False))
+    
+    if not code:
+        return jsonify({"error": "No code provided"}), 400
+    
+    def generate():
+        try:
+            static = run_static_analysis(code, language)
+            yield sse_event('analysis', {
+                "analysis": static['analysis'],
+                "metrics": static['metrics'],
+                "language": language
+            })
+            
+            async def stage_events():
+                queue = asyncio.Queue()
+                
+                def on_token(stage, chunk):
+                    queue.put_nowait((f"{stage}_token", {"text": chunk}))
+                
+                stages = build_analysis_stages(code, language, roast_level, static['analysis']['issues'],
+                                               on_token=on_token if stream_tokens else None)
+                async for name, stage_result in interleave(stages.stream(), queue):
+                    if name.endswith('_token'):
+                        yield name, stage_result
+                    elif name != 'review':
+                        # The internal review stage's fields arrive as their own events
+                        yield name, {name: stage_result}
+            
+            for name, payload in iterate_async(stage_events()):
+                yield sse_event(name, payload)
+            
+            track_analysis_metrics(user_id, language, static['metrics'])
+            yield sse_event('done', {
+                "success": True,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        except Exception as e:
+            app.logger.error(f"Streaming analysis error: {str(e)}")
+            yield sse_event('error', {
+                "error": "Internal server error",
+                "message": str(e)
+            })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze many files in one request, streaming per-file results as NDJSON
+    
+    Accepts either a JSON body ``{"items": [{"path", "language", "code",
+    "roast"}], "roast": bool, "roast_level": str}`` or a multipart upload with
+    a zip/tar ``archive`` file (plus optional ``roast``/``roast_level`` form
+    fields). Each output line is one file's result, in completion order.
+    """
+    max_items = int(os.getenv('BATCH_MAX_ITEMS', 1000))
+    max_file_size = int(os.getenv('BATCH_MAX_FILE_SIZE', 1024 * 1024))
+    
+    if 'archive' in request.files:
+        upload = request.files['archive']
+        options = request.form
+        extensions = {
+            info['ext']: language
+            for language, info in multilingual.supported_languages.items()
+        }
+        try:
+            # Stop reading members one past the limit; that is enough to reject it
+            items = list(itertools.islice(
+                iter_archive_items(upload.read(), upload.filename or '', extensions, max_file_size),
+                max_items + 1
+            ))
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            return jsonify({"error": f"Unreadable archive: {str(e)}"}), 400
+        roast = options.get('roast', 'false').lower() == 'true'
+    else:
+        options = request.get_json(silent=True)
+        if not isinstance(options, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        items = options.get('items', [])
+        if not isinstance(items, list):
+            return jsonify({"error": "'items' must be a list"}), 400
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not isinstance(item.get('code', ''), str):
+                return jsonify({"error": f"Item {index}: 'code' must be a string"}), 400
+            if not all(isinstance(item.get(field, ''), str) for field in ('path', 'language')):
+                return jsonify({"error": f"Item {index}: 'path' and 'language' must be strings"}), 400
+        items = [
+            item for item in items
+            if item.get('code') and len(item['code']) <= max_file_size
+        ]
+        roast = bool(options.get('roast', False))
+    
+    roast_level = options.get('roast_level', 'medium')
+    
+    if not items:
+        return jsonify({"error": "No files to analyze"}), 400
+    if len(items) > max_items:
+        return jsonify({"error": f"Too many files (max {max_items})"}), 413
+    
+    def generate():
+        for result in iterate_async(batch_analyzer.analyze(items, roast=roast, roast_level=roast_level)):
+            yield json.dumps(result) + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/generate', methods=['POST'])
 async def generate_code():
     """Generate code based on prompt with multi-language support"""
@@ -167,11 +429,7 @@ async def generate_code():
         )
         
         # Generate audio
-        audio_data = await tts_service.generate_audio_roast(
-            roast_text=roast['text'],
-            intensity='medium',
-            language=language
-        )
+        audio_data = await render_audio(roast['text'], 'medium', language)
         
         result = {
             "success": True,
@@ -192,6 +450,91 @@ async def generate_code():
         app.logger.error(f"Generation error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/generate/stream', methods=['POST'])
+def generate_code_stream():
+    """Generate code, streaming the completion as server-sent events
+    
+    Emits ``code_token`` events (``{"text": chunk}``) while the code is
+    generated and then ``code`` with the final, fence-stripped code. The
+    analysis and roast of the generated code follow as ``analysis``,
+    ``roast_token``/``roast`` and ``audio``, then ``done``. Failures are
+    reported as an ``error`` event.
+    """
+    data = request.json or {}
+    prompt = data.get('prompt', '')
+    language = data.get('language', 'python')
+    complexity = data.get('complexity', 'medium')
+    user_id = data.get('user_id', str(uuid.uuid4()))
+    
+    if not prompt:
+        return jsonify({"error": "No prompt provided"}), 400
+    
+    async def generation_events():
+        queue = asyncio.Queue()
+        
+        def token_sink(event):
+            return lambda chunk: queue.put_nowait((event, {"text": chunk}))
+        
+        async def steps():
+            generated_code = await llm_service.generate_code_from_prompt(
+                prompt=prompt,
+                language=language,
+                complexity=complexity,
+                on_token=token_sink('code_token')
+            )
+            yield 'code', {"code": generated_code, "language": language}
+            
+            analysis = code_analyzer.analyze_code(generated_code, language)
+            yield 'analysis', {"analysis": analysis}
+            
+            roast = await llm_service.generate_roast(
+                code=generated_code,
+                issues=analysis['issues'],
+                language=language,
+                intensity='medium',
+                on_token=token_sink('roast_token')
+            )
+            yield 'roast', {"roast": roast}
+            yield 'audio', {"audio": await render_audio(roast['text'], 'medium', language)}
+            
+            track_generation_metrics(user_id, language, len(generated_code))
+        
+        async for item in interleave(steps(), queue):
+            yield item
+    
+    def generate():
+        try:
+            for name, payload in iterate_async(generation_events()):
+                yield sse_event(name, payload)
+            yield sse_event('done', {
+                "success": True,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        except Exception as e:
+            app.logger.error(f"Streaming generation error: {str(e)}")
+            yield sse_event('error', {"error": str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/audio/<digest>', methods=['GET'])
+def get_audio(digest):
+    """Serve a stored audio blob with ETag and Range support"""
+    audio = audio_store.get(digest)
+    if audio is None:
+        return jsonify({"error": "Audio not found"}), 404
+    
+    response = Response(audio, mimetype='audio/mpeg')
+    # Blobs are content-addressed and therefore immutable
+    response.set_etag(digest)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(audio))
+
 @app.route('/api/languages', methods=['GET'])
 def get_supported_languages():
     """Get list of supported programming languages"""
@@ -218,6 +561,15 @@ def get_user_metrics_history():
         "metrics": metrics
     })
 
+@app.route('/api/metrics/memory', methods=['GET'])
+def get_worker_memory():
+    """Memory report for the worker process serving this request"""
+    return jsonify({
+        "success": True,
+        "memory": process_memory(),
+        "local_model_loaded": llm_service.backends.is_loaded('local') and llm_service.local_engine.is_loaded
+    })
+
 @app.route('/api/collaboration/create', methods=['POST'])
 def create_collaboration_session():
     """Create a new collaboration session"""
@@ -237,8 +589,8 @@ def create_collaboration_session():
         language=language
     )
     
-    active_sessions[session_id] = collaboration_session
     collaboration_session.add_participant(user_id, "host")
+    session_store.create(collaboration_session)
     
     return jsonify({
         "success": True,
@@ -253,11 +605,11 @@ def join_collaboration_session(session_id):
     user_id = data.get('user_id')
     username = data.get('username', f"User-{user_id[:8]}")
     
-    if session_id not in active_sessions:
+    session = session_store.get(session_id)
+    if session is None:
         return jsonify({"error": "Session not found"}), 404
     
-    session = active_sessions[session_id]
-    session.add_participant(user_id, username)
+    session_store.add_participant(session, user_id, username)
     
     return jsonify({
         "success": True,
@@ -272,60 +624,145 @@ def handle_join_session(data):
     user_id = data.get('user_id')
     username = data.get('username')
     
-    if session_id in active_sessions:
+    ensure_session_reaper()
+    session = session_store.get(session_id)
+    if session is not None:
         join_room(session_id)
-        session = active_sessions[session_id]
-        session.add_participant(user_id, username)
+        session_store.add_participant(session, user_id, username)
+        collab_connections[request.sid] = (session_id, user_id)
+        participant = session.participants.get(user_id)
         
+        # The room only needs the newcomer; the full session state goes to
+        # the joiner alone, so a join costs O(1) per existing participant
         emit('user_joined', {
             'user_id': user_id,
             'username': username,
-            'participants': session.participants,
+            'participant': participant.to_dict() if participant else None,
+            'participant_count': len(session.participants),
             'timestamp': datetime.utcnow().isoformat()
-        }, room=session_id)
+        }, room=session_id, include_self=False)
+        
+        emit('session_update', session.to_dict())
+        
+        # The joiner starts editing from this version
+        emit('code_sync', session.snapshot())
+
+@socketio.on('code_delta')
+def handle_code_delta(data):
+    """Handle an edit sent as operations against a known code version
+    
+    The sender gets ``code_ack`` with the version its edit became, the other
+    participants get the (transformed) operations. A client whose edit
+    cannot be merged gets ``code_resync`` with the full code instead.
+    """
+    session_id = data.get('session_id')
+    user_id = data.get('user_id')
+    cursor_position = data.get('cursor_position')
+    
+    session = session_store.get(session_id)
+    if session is not None:
+        try:
+            version, ops = session_store.apply_delta(session, data.get('ops'), int(data.get('version')), user_id)
+        except (TypeError, ValueError) as e:
+            emit('code_resync', {**session.snapshot(), 'error': str(e)})
+            return
         
-        emit('session_update', session.to_dict(), room=session_id)
+        emit('code_ack', {'version': version})
+        emit('code_delta', {
+            'user_id': user_id,
+            'version': version,
+            'ops': ops,
+            'timestamp': datetime.utcnow().isoformat()
+        }, room=session_id, include_self=False)
+        
+        if cursor_position is not None and is_connected_as(session_id, user_id):
+            presence.update(session_id, user_id, cursor_position, data.get('selection'))
+
+@socketio.on('request_resync')
+def handle_request_resync(data):
+    """Send the full code to a participant whose delta stream has a gap"""
+    session_id = data.get('session_id')
+    connection = collab_connections.get(request.sid)
+    
+    session = session_store.get(session_id)
+    if session is not None and connection is not None and connection[0] == session_id:
+        emit('code_resync', session.snapshot())
+
+@socketio.on('cursor_update')
+def handle_cursor_update(data):
+    """Handle a cursor or selection move; sent out with the room's next presence frame
+    
+    Only accepted from a connection that joined that session, as that user.
+    """
+    session_id = data.get('session_id')
+    user_id = data.get('user_id')
+    
+    if is_connected_as(session_id, user_id):
+        presence.update(session_id, user_id, data.get('cursor_position'), data.get('selection'))
 
 @socketio.on('code_update')
 def handle_code_update(data):
-    """Handle real-time code updates"""
+    """Handle a full-buffer code update from clients without delta support"""
     session_id = data.get('session_id')
     user_id = data.get('user_id')
     code = data.get('code')
     cursor_position = data.get('cursor_position')
     
-    if session_id in active_sessions:
-        session = active_sessions[session_id]
-        session.update_code(code)
-        session.update_cursor_position(user_id, cursor_position)
+    session = session_store.get(session_id)
+    if session is not None and isinstance(code, str):
+        try:
+            version, ops = session_store.update_code(session, code, user_id)
+        except ValueError:
+            return
+        timestamp = datetime.utcnow().isoformat()
         
+        # Delta clients stay in step through the equivalent operations
+        emit('code_delta', {
+            'user_id': user_id,
+            'version': version,
+            'ops': ops,
+            'timestamp': timestamp
+        }, room=session_id, include_self=False)
         emit('code_updated', {
             'user_id': user_id,
             'code': code,
             'cursor_position': cursor_position,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': timestamp
         }, room=session_id, include_self=False)
+        
+        if cursor_position is not None and is_connected_as(session_id, user_id):
+            presence.update(session_id, user_id, cursor_position)
 
 @socketio.on('leave_session')
 def handle_leave_session(data):
     """Handle client leaving a collaboration session"""
-    session_id = data.get('session_id')
-    user_id = data.get('user_id')
-    
-    if session_id in active_sessions:
+    collab_connections.pop(request.sid, None)
+    leave_collaboration(data.get('session_id'), data.get('user_id'))
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    """Treat a dropped connection as leaving its collaboration session"""
+    connection = collab_connections.pop(request.sid, None)
+    if connection is not None:
+        leave_collaboration(*connection)
+
+def leave_collaboration(session_id: str, user_id: str) -> None:
+    """Remove a participant, tell the room, and delete the session once empty"""
+    session = session_store.get(session_id)
+    if session is not None:
         leave_room(session_id)
-        session = active_sessions[session_id]
-        session.remove_participant(user_id)
+        presence.remove(session_id, user_id)
+        session_store.remove_participant(session, user_id)
         
         emit('user_left', {
             'user_id': user_id,
-            'participants': session.participants,
+            'participant_count': len(session.participants),
             'timestamp': datetime.utcnow().isoformat()
         }, room=session_id)
         
         # If no participants left, clean up session
         if not session.participants:
-            del active_sessions[session_id]
+            session_store.delete(session_id)
 
 @socketio.on('chat_message')
 def handle_chat_message(data):
@@ -334,16 +771,17 @@ def handle_chat_message(data):
     user_id = data.get('user_id')
     message = data.get('message')
     
-    if session_id in active_sessions:
-        session = active_sessions[session_id]
+    session = session_store.get(session_id)
+    if session is not None:
+        participant = session.participants.get(user_id)
         chat_message = {
             'user_id': user_id,
-            'username': session.participants.get(user_id, {}).get('username'),
+            'username': participant.username if participant else None,
             'message': message,
             'timestamp': datetime.utcnow().isoformat()
         }
         
-        session.add_chat_message(chat_message)
+        session_store.add_chat_message(session, chat_message)
         
         emit('new_chat_message', chat_message, room=session_id)
 
@@ -393,6 +831,25 @@ def calculate_user_metrics(user_id):
         }
     }
 
+def warmup_worker_processes() -> None:
+    """Start this process's pylint worker pool and ESLint daemon"""
+    get_pylint_pool().warmup()
+    get_eslint_daemon().warmup()
+
+def warmup_services(worker_processes: bool = True) -> Dict[str, float]:
+    """Load analyzers, model backends and lint workers ahead of the first request
+    
+    Returns the load time in seconds of each lazily registered backend.
+    ``worker_processes=False`` skips the lint pool and ESLint daemon, which
+    belong to one process and must not be started in a preloading master.
+    """
+    timings = {}
+    timings.update({f"analyzer:{name}": t for name, t in analysis_backends.warmup().items()})
+    timings.update({f"llm:{name}": t for name, t in llm_service.backends.warmup().items()})
+    if worker_processes:
+        warmup_worker_processes()
+    return timings
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -404,9 +861,19 @@ def health_check():
             "llm": llm_service.is_available(),
             "tts": tts_service.is_available()
         },
-        "active_sessions": len(active_sessions)
+        "loaded_backends": analysis_backends.loaded() + llm_service.backends.loaded(),
+        "llm_providers": llm_service.router.snapshot(),
+        "active_sessions": session_store.count(),
+        "resident_sessions": len(session_store)
     })
 
+# Optional eager warmup phase; otherwise every backend loads on first use.
+# In a preloading gunicorn master only the shared backends are loaded here;
+# each worker starts its own lint processes from post_fork
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'false').lower() == 'true'
+if WARMUP_ON_START:
+    warmup_services(worker_processes=os.getenv('GUNICORN_PRELOADING') != 'true')
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5001))
     socketio.run(app, host='0.0.0.0', port=port, debug=os.getenv('FLASK_DEBUG', 'False') == 'True')
\ No newline at end of file
@@ -0,0 +1,69 @@
+# Gunicorn configuration for the backend.
+#
+# Run from the repository root (model and template paths are relative to it):
+#
+#     gunicorn --config backend/gunicorn.conf.py app:app
+#
+# The app is imported once in the master (preload_app) and the local model
+# weights are loaded there into shared memory before any worker is forked,
+# so N workers share a single copy of the weights instead of loading N.
+#
+# DEPLOY_MODE=sticky runs one eventlet worker per instance for Socket.IO
+# collaboration. Gunicorn cannot route a client's long-polling requests back
+# to the same worker, so scale by running several instances behind a load
+# balancer with sticky routing (see nginx/nginx.sticky.conf and
+# docker-compose.sticky.yml). Session state and room broadcasts are shared
+# between instances through Redis.
+import gc
+import os
+
+DEPLOY_MODE = os.getenv('DEPLOY_MODE', 'default')
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5001)}"
+pythonpath = 'backend'
+
+if DEPLOY_MODE == 'sticky':
+    worker_class = 'eventlet'
+    workers = 1
+    worker_connections = int(os.getenv('WORKER_CONNECTIONS', 1000))
+    # The eventlet worker monkey-patches at startup; anything imported
+    # before that (in a preloading master) would keep blocking sockets
+    preload_app = False
+else:
+    workers = int(os.getenv('WEB_CONCURRENCY', 4))
+    threads = int(os.getenv('GUNICORN_THREADS', 2))
+    preload_app = os.getenv('PRELOAD_MODELS', 'true').lower() == 'true'
+
+# Tells the app it is being imported by the master, so process-bound
+# services (lint pool, ESLint daemon) are left for post_fork
+if preload_app:
+    os.environ['GUNICORN_PRELOADING'] = 'true'
+
+
+def when_ready(server):
+    """Load shared model weights in the master, right before workers are forked"""
+    if not preload_app:
+        return
+
+    from app import llm_service
+
+    if llm_service.preload_local_model():
+        server.log.info("Local model preloaded into shared memory")
+    else:
+        server.log.info("Local model unavailable; workers will run without it")
+
+    # Move everything allocated so far into the permanent generation so the
+    # workers' garbage collector never touches (and copies) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from utils.memory import process_memory
+
+    if preload_app:
+        from app import WARMUP_ON_START, warmup_worker_processes
+
+        if WARMUP_ON_START:
+            warmup_worker_processes()
+
+    server.log.info(f"Worker {worker.pid} memory at boot: {process_memory()}")
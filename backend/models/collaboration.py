@@ -1,9 +1,21 @@
-from datetime import datetime
-from typing import Dict, List, Optional
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass, field
 import uuid
 
-@dataclass
+from models.operations import Delta, apply, diff, transform, validate
+
+# Applied deltas kept for transforming late client edits; clients further
+# behind than this must resync from the full code
+OP_LOG_SIZE = 500
+CODE_HISTORY_SIZE = 100
+CHAT_HISTORY_SIZE = 100
+# Participants who did something this recently count as active
+ACTIVE_WINDOW = timedelta(minutes=5)
+
+@dataclass(slots=True)
 class Participant:
     """Collaboration session participant"""
     user_id: str
@@ -22,8 +34,19 @@ class Participant:
             'last_active': self.last_active.isoformat(),
             'cursor_position': self.cursor_position
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Participant':
+        return cls(
+            user_id=data['user_id'],
+            username=data['username'],
+            role=data['role'],
+            joined_at=datetime.fromisoformat(data['joined_at']),
+            cursor_position=data.get('cursor_position'),
+            last_active=datetime.fromisoformat(data['last_active'])
+        )
 
-@dataclass
+@dataclass(slots=True)
 class ChatMessage:
     """Chat message in collaboration session"""
     id: str
@@ -42,6 +65,122 @@ class ChatMessage:
             'timestamp': self.timestamp.isoformat(),
             'type': self.message_type
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ChatMessage':
+        return cls(
+            id=data['id'],
+            user_id=data['user_id'],
+            username=data['username'],
+            message=data['message'],
+            timestamp=datetime.fromisoformat(data['timestamp']),
+            message_type=data.get('type', 'chat')
+        )
+
+@dataclass
+class HistoryEntry:
+    """One code change: the delta that produced a version, plus the full
+    code after it on keyframes"""
+    version: int
+    timestamp: datetime
+    user_id: Optional[str]
+    change_size: int
+    delta: Delta
+    snapshot: Optional[str] = None
+    
+    def to_dict(self) -> Dict:
+        return {
+            'version': self.version,
+            'timestamp': self.timestamp.isoformat(),
+            'user_id': self.user_id,
+            'change_size': self.change_size,
+            'delta': self.delta,
+            'snapshot': self.snapshot
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'HistoryEntry':
+        return cls(
+            version=data['version'],
+            timestamp=datetime.fromisoformat(data['timestamp']),
+            user_id=data['user_id'],
+            change_size=data['change_size'],
+            delta=data['delta'],
+            snapshot=data.get('snapshot')
+        )
+
+
+def _delta_size(delta: Delta) -> int:
+    return sum(len(op['text']) if op['type'] == 'insert' else 1 for op in delta)
+
+
+class CodeHistory:
+    """Ring buffer of recent code changes stored as deltas with sparse keyframes
+    
+    The oldest retained entry always carries a full snapshot, and a new
+    keyframe is taken once the deltas since the last one add up to the size
+    of the code. Memory therefore follows the volume of edits rather than
+    file size times number of changes, while rebuilding any retained version
+    replays at most about one file's worth of edits.
+    """
+    
+    def __init__(self, limit: int = CODE_HISTORY_SIZE):
+        self.entries: Deque[HistoryEntry] = deque(maxlen=limit)
+        self._since_keyframe = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def restore(self, entries: Iterable[HistoryEntry]) -> None:
+        """Replace the history with previously saved entries (oldest first)"""
+        self.entries.clear()
+        self.entries.extend(entries)
+        self._since_keyframe = 0
+        for entry in reversed(self.entries):
+            if entry.snapshot is not None:
+                break
+            self._since_keyframe += _delta_size(entry.delta)
+    
+    def keyframe_size(self) -> int:
+        """Characters held in keyframe snapshots"""
+        return sum(len(entry.snapshot) for entry in self.entries if entry.snapshot is not None)
+    
+    def record(self, version: int, code: str, delta: Delta, user_id: Optional[str], change_size: int,
+               timestamp: Optional[datetime] = None) -> None:
+        """Record the change that produced ``code`` at ``version``"""
+        entry = HistoryEntry(version, timestamp or datetime.utcnow(), user_id, change_size, delta)
+        self._since_keyframe += _delta_size(delta)
+        if not self.entries or self._since_keyframe >= len(code):
+            entry.snapshot = code
+            self._since_keyframe = 0
+        
+        evicted = self.entries[0] if len(self.entries) == self.entries.maxlen else None
+        self.entries.append(entry)
+        
+        # Keep the oldest entry a keyframe so every retained version can be rebuilt
+        oldest = self.entries[0]
+        if evicted is not None and oldest.snapshot is None:
+            oldest.snapshot = apply(evicted.snapshot, oldest.delta)
+    
+    def code_at(self, version: int) -> Optional[str]:
+        """Code as it was at ``version``, or None if that is no longer retained"""
+        if not self.entries:
+            return None
+        index = version - self.entries[0].version
+        if not 0 <= index < len(self.entries):
+            return None
+        
+        start = index
+        while self.entries[start].snapshot is None:
+            start -= 1
+        code = self.entries[start].snapshot
+        for position in range(start + 1, index + 1):
+            code = apply(code, self.entries[position].delta)
+        return code
+    
+    def slice(self, start: int = None, end: int = None) -> List[HistoryEntry]:
+        return list(self.entries)[start:end]
+
 
 class CollaborationSession:
     """Real-time collaboration session"""
@@ -55,9 +194,14 @@ class CollaborationSession:
         self.updated_at = datetime.utcnow()
         
         self.participants: Dict[str, Participant] = {}
-        self.chat_messages: List[ChatMessage] = []
+        # user_id -> last activity, least recent first; pruned as entries age
+        # out of ACTIVE_WINDOW so counting active participants stays cheap
+        self._recent: 'OrderedDict[str, datetime]' = OrderedDict()
+        self.chat_messages: Deque[ChatMessage] = deque(maxlen=CHAT_HISTORY_SIZE)
         self.code = ""
-        self.code_history: List[Dict] = []
+        self.version = 0
+        self.op_log: Deque[Tuple[int, Delta]] = deque(maxlen=OP_LOG_SIZE)
+        self.code_history = CodeHistory()
         self.settings = {
             'read_only': False,
             'allow_guests': True,
@@ -76,6 +220,7 @@ class CollaborationSession:
                 username=username,
                 role=role
             )
+            self._touch(user_id)
             self.updated_at = datetime.utcnow()
             return True
         return False
@@ -84,34 +229,95 @@ class CollaborationSession:
         """Remove participant from session"""
         if user_id in self.participants:
             del self.participants[user_id]
+            self._recent.pop(user_id, None)
             self.updated_at = datetime.utcnow()
             return True
         return False
     
-    def update_code(self, code: str, user_id: Optional[str] = None) -> None:
-        """Update session code"""
-        self.code = code
-        self.updated_at = datetime.utcnow()
+    def set_members(self, participants: Iterable[Participant], chat_messages: Iterable[ChatMessage]) -> None:
+        """Replace participants and chat wholesale (e.g. when reloaded from storage)"""
+        self.participants = {p.user_id: p for p in participants}
+        self._recent = OrderedDict(
+            (p.user_id, p.last_active) for p in sorted(self.participants.values(), key=lambda p: p.last_active)
+        )
+        self.chat_messages = deque(chat_messages, maxlen=CHAT_HISTORY_SIZE)
+    
+    def _touch(self, user_id: Optional[str]) -> None:
+        """Mark a participant as active now"""
+        participant = self.participants.get(user_id)
+        if participant is None:
+            return
+        participant.last_active = datetime.utcnow()
+        self._recent[user_id] = participant.last_active
+        self._recent.move_to_end(user_id)
+    
+    def active_participant_count(self) -> int:
+        """Participants active within ACTIVE_WINDOW"""
+        cutoff = datetime.utcnow() - ACTIVE_WINDOW
+        while self._recent:
+            user_id, last_active = next(iter(self._recent.items()))
+            if last_active >= cutoff:
+                break
+            del self._recent[user_id]
+        return len(self._recent)
+    
+    def apply_delta(self, delta: Delta, base_version: int, user_id: Optional[str] = None) -> Tuple[int, Delta]:
+        """Merge a client's edit made against ``base_version`` of the code
         
-        # Save to history (limited to last 100 changes)
-        change_entry = {
-            'timestamp': datetime.utcnow(),
-            'user_id': user_id,
-            'code': code,
-            'change_size': len(code) - len(self.code_history[-1]['code'] if self.code_history else 0)
-        }
+        The delta is transformed past every delta applied since that version,
+        then applied. Returns the new version and the transformed delta, which
+        is what the other participants must apply. Raises ValueError if the
+        delta is malformed or out of range, or its base version is no longer
+        in the operation log.
+        """
+        if not self.version - len(self.op_log) <= base_version <= self.version:
+            raise ValueError(f"Cannot merge edits based on version {base_version}")
         
-        self.code_history.append(change_entry)
-        if len(self.code_history) > 100:
-            self.code_history = self.code_history[-100:]
+        concurrent = [op for version, ops in self.op_log if version > base_version for op in ops]
+        delta = transform(validate(delta), concurrent)
+        self._commit(apply(self.code, delta), delta, user_id)
+        self._touch(user_id)
+        return self.version, delta
+    
+    def replay_delta(self, version: int, delta: Delta, user_id: Optional[str] = None,
+                     timestamp: Optional[datetime] = None) -> None:
+        """Apply a delta already merged elsewhere (e.g. by another worker) as ``version``"""
+        if version != self.version + 1:
+            raise ValueError(f"Expected version {self.version + 1}, got {version}")
+        self._commit(apply(self.code, delta), delta, user_id, timestamp)
+    
+    def update_code(self, code: str, user_id: Optional[str] = None) -> Delta:
+        """Replace the whole code; returns the equivalent delta"""
+        delta = diff(self.code, code)
+        self._commit(code, delta, user_id)
+        self._touch(user_id)
+        return delta
+    
+    def snapshot(self) -> Dict:
+        """Current code and its version, for (re)synchronizing a client"""
+        return {'code': self.code, 'version': self.version}
+    
+    def _commit(self, code: str, delta: Delta, user_id: Optional[str], timestamp: Optional[datetime] = None) -> None:
+        change_size = len(code) - len(self.code)
+        self.version += 1
+        self.op_log.append((self.version, delta))
+        self.code = code
+        self.updated_at = timestamp or datetime.utcnow()
+        self.code_history.record(self.version, code, delta, user_id, change_size, self.updated_at)
+    
+    def get_code_at_version(self, version: int) -> Optional[str]:
+        """Reconstruct the code at a past version still held in history"""
+        if version == self.version:
+            return self.code
+        return self.code_history.code_at(version)
     
     def update_cursor_position(self, user_id: str, position: Dict) -> None:
         """Update user's cursor position"""
         if user_id in self.participants:
             self.participants[user_id].cursor_position = position
-            self.participants[user_id].last_active = datetime.utcnow()
+            self._touch(user_id)
     
-    def add_chat_message(self, message_data: Dict) -> None:
+    def add_chat_message(self, message_data: Dict) -> ChatMessage:
         """Add chat message to session"""
         message = ChatMessage(
             id=str(uuid.uuid4()),
@@ -121,11 +327,10 @@ class CollaborationSession:
             timestamp=datetime.utcnow()
         )
         
+        # Only the last CHAT_HISTORY_SIZE messages are kept
         self.chat_messages.append(message)
-        
-        # Keep only last 100 messages
-        if len(self.chat_messages) > 100:
-            self.chat_messages = self.chat_messages[-100:]
+        self._touch(message.user_id)
+        return message
     
     def get_participant_list(self) -> List[Dict]:
         """Get list of participants"""
@@ -133,36 +338,60 @@ class CollaborationSession:
     
     def get_recent_chat(self, limit: int = 50) -> List[Dict]:
         """Get recent chat messages"""
-        return [msg.to_dict() for msg in self.chat_messages[-limit:]]
+        start = max(len(self.chat_messages) - limit, 0)
+        return [msg.to_dict() for msg in islice(self.chat_messages, start, None)]
     
     def get_code_history_slice(self, start: int = -10, end: int = None) -> List[Dict]:
         """Get slice of code history"""
-        history_slice = self.code_history[start:end]
+        history_slice = self.code_history.slice(start, end)
         return [
             {
-                'timestamp': entry['timestamp'].isoformat(),
-                'user_id': entry['user_id'],
-                'change_size': entry['change_size']
+                'version': entry.version,
+                'timestamp': entry.timestamp.isoformat(),
+                'user_id': entry.user_id,
+                'change_size': entry.change_size
             }
             for entry in history_slice
         ]
     
     def analyze_session_activity(self) -> Dict:
-        """Analyze session activity metrics"""
-        active_participants = [
-            p for p in self.participants.values()
-            if (datetime.utcnow() - p.last_active).seconds < 300  # Active in last 5 minutes
-        ]
+        """Analyze session activity metrics
         
+        Every figure is a maintained count, so this does not grow with the
+        number of participants.
+        """
         return {
             'total_participants': len(self.participants),
-            'active_participants': len(active_participants),
+            'active_participants': self.active_participant_count(),
             'total_chat_messages': len(self.chat_messages),
             'code_changes': len(self.code_history),
-            'session_duration': (datetime.utcnow() - self.created_at).seconds,
+            'session_duration': int((datetime.utcnow() - self.created_at).total_seconds()),
             'last_activity': self.updated_at.isoformat()
         }
     
+    def approximate_size(self) -> int:
+        """Rough number of characters the session holds in memory"""
+        return (len(self.code) + self.code_history.keyframe_size()
+                + sum(len(message.message) for message in self.chat_messages))
+    
+    def meta(self) -> Dict:
+        """Fields that do not change after creation (besides settings)"""
+        return {
+            'session_id': self.session_id,
+            'name': self.name,
+            'creator_id': self.creator_id,
+            'language': self.language,
+            'created_at': self.created_at.isoformat(),
+            'settings': self.settings
+        }
+    
+    @classmethod
+    def from_meta(cls, meta: Dict) -> 'CollaborationSession':
+        session = cls(meta['session_id'], meta['name'], meta['creator_id'], meta['language'])
+        session.created_at = datetime.fromisoformat(meta['created_at'])
+        session.settings = meta['settings']
+        return session
+    
     def to_dict(self) -> Dict:
         """Convert session to dictionary"""
         return {
@@ -176,5 +405,6 @@ class CollaborationSession:
             'participant_count': len(self.participants),
             'settings': self.settings,
             'code_length': len(self.code),
+            'version': self.version,
             'activity': self.analyze_session_activity()
         }
\ No newline at end of file
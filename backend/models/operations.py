@@ -0,0 +1,144 @@
+"""Insert/delete text operations and their operational transform
+
+An operation is a dict, either ``{'type': 'insert', 'pos': int, 'text': str}``
+or ``{'type': 'delete', 'pos': int, 'length': int}``, with positions in
+characters. A delta is a list of operations applied in order.
+
+``transform(a, b)`` rewrites delta ``a`` so it can be applied after a
+concurrent delta ``b`` and still express the same edit. When both insert at
+the same position, ``b``'s text goes first, so the side that was applied
+first (the server's history) wins ties.
+"""
+from typing import Dict, List, Tuple
+
+Operation = Dict
+Delta = List[Operation]
+
+
+def insert(pos: int, text: str) -> Operation:
+    return {'type': 'insert', 'pos': pos, 'text': text}
+
+
+def delete(pos: int, length: int) -> Operation:
+    return {'type': 'delete', 'pos': pos, 'length': length}
+
+
+def validate(delta: Delta) -> Delta:
+    """Normalize a client delta, raising ValueError if it is malformed"""
+    if not isinstance(delta, list):
+        raise ValueError("Delta must be a list of operations")
+    normalized = []
+    for op in delta:
+        if not isinstance(op, dict):
+            raise ValueError("Operation must be an object")
+        if op.get('type') == 'insert' and isinstance(op.get('text'), str) and isinstance(op.get('pos'), int):
+            if op['text']:
+                normalized.append(insert(op['pos'], op['text']))
+        elif op.get('type') == 'delete' and isinstance(op.get('length'), int) and isinstance(op.get('pos'), int):
+            if op['length'] > 0:
+                normalized.append(delete(op['pos'], op['length']))
+        else:
+            raise ValueError(f"Invalid operation: {op}")
+    return normalized
+
+
+def apply(text: str, delta: Delta) -> str:
+    """Apply a delta to text, raising ValueError if an operation is out of range"""
+    for op in delta:
+        pos = op['pos']
+        if op['type'] == 'insert':
+            if not 0 <= pos <= len(text):
+                raise ValueError(f"Insert position {pos} out of range")
+            text = text[:pos] + op['text'] + text[pos:]
+        else:
+            if pos < 0 or pos + op['length'] > len(text):
+                raise ValueError(f"Delete range {pos}+{op['length']} out of range")
+            text = text[:pos] + text[pos + op['length']:]
+    return text
+
+
+def _common_length(a: str, b: str, limit: int, from_end: bool = False) -> int:
+    """Length of the common prefix (or suffix) of a and b, up to limit
+
+    Bisects on slice comparisons so large buffers are compared in C
+    rather than one character at a time.
+    """
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if (a[len(a) - mid:] == b[len(b) - mid:]) if from_end else (a[:mid] == b[:mid]):
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def diff(old: str, new: str) -> Delta:
+    """Smallest single-range delta turning old into new (common prefix and suffix kept)"""
+    limit = min(len(old), len(new))
+    prefix = _common_length(old, new, limit)
+    suffix = _common_length(old, new, limit - prefix, from_end=True)
+
+    delta = []
+    if len(old) - prefix - suffix > 0:
+        delta.append(delete(prefix, len(old) - prefix - suffix))
+    if len(new) - prefix - suffix > 0:
+        delta.append(insert(prefix, new[prefix:len(new) - suffix]))
+    return delta
+
+
+def _transform_op(a: Operation, b: Operation, a_first: bool) -> Delta:
+    """Rewrite single operation a to apply after b"""
+    if b['type'] == 'insert':
+        shift = len(b['text'])
+        if a['type'] == 'insert':
+            if a['pos'] < b['pos'] or (a['pos'] == b['pos'] and a_first):
+                return [a]
+            return [insert(a['pos'] + shift, a['text'])]
+
+        start, end = a['pos'], a['pos'] + a['length']
+        if b['pos'] <= start:
+            return [delete(start + shift, a['length'])]
+        if b['pos'] >= end:
+            return [a]
+        # Text was inserted inside the deleted range: delete around it
+        before = b['pos'] - start
+        return [delete(start, before), delete(start + shift, a['length'] - before)]
+
+    b_start, b_end = b['pos'], b['pos'] + b['length']
+    if a['type'] == 'insert':
+        if a['pos'] <= b_start:
+            return [a]
+        if a['pos'] >= b_end:
+            return [insert(a['pos'] - b['length'], a['text'])]
+        return [insert(b_start, a['text'])]
+
+    a_start, a_end = a['pos'], a['pos'] + a['length']
+    if a_end <= b_start:
+        return [a]
+    if a_start >= b_end:
+        return [delete(a_start - b['length'], a['length'])]
+    # Overlapping deletes: only what b did not already remove is left
+    overlap = min(a_end, b_end) - max(a_start, b_start)
+    remaining = a['length'] - overlap
+    return [delete(min(a_start, b_start), remaining)] if remaining else []
+
+
+def _transform_pair(a: Delta, b: Delta, a_first: bool) -> Tuple[Delta, Delta]:
+    """Return ``(a', b')`` with a' applying after b and b' applying after a"""
+    if not a or not b:
+        return a, b
+    if len(a) > 1:
+        head, b = _transform_pair(a[:1], b, a_first)
+        tail, b = _transform_pair(a[1:], b, a_first)
+        return head + tail, b
+    if len(b) > 1:
+        a, head = _transform_pair(a, b[:1], a_first)
+        a, tail = _transform_pair(a, b[1:], a_first)
+        return a, head + tail
+    return _transform_op(a[0], b[0], a_first), _transform_op(b[0], a[0], not a_first)
+
+
+def transform(a: Delta, b: Delta) -> Delta:
+    """Rewrite delta a to apply after the concurrent delta b (b wins ties)"""
+    return _transform_pair(a, b, a_first=False)[0]
@@ -0,0 +1,224 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from utils.cache import content_key
+
+logger = logging.getLogger(__name__)
+
+
+def _default_workers() -> int:
+    """Share the CPUs between the gunicorn workers, each of which has its own pool"""
+    web_workers = max(1, int(os.getenv('WEB_CONCURRENCY', 4)))
+    return max(1, (os.cpu_count() or 2) // web_workers)
+
+# A job running longer than this is presumed stuck; its pool is recycled
+BATCH_ITEM_TIMEOUT = float(os.getenv('BATCH_ITEM_TIMEOUT', 60))
+
+# Per-worker analyzer, created by _init_worker in each pool process
+_analyzer = None
+
+
+def _init_worker() -> None:
+    """Build one analyzer per batch worker; pylint runs in-process here"""
+    global _analyzer
+    from services.code_quality import CodeQualityAnalyzer
+    from services.lint_pool import InProcessLinter, set_pylint_pool
+
+    set_pylint_pool(InProcessLinter())
+    _analyzer = CodeQualityAnalyzer()
+
+
+def _analyze_static(code: str, language: str) -> Dict[str, Any]:
+    return _analyzer.analyze_with_metrics(code, language)
+
+
+def iter_archive_items(data: bytes, filename: str, extensions: Dict[str, str],
+                       max_file_size: int) -> Iterator[Dict[str, str]]:
+    """Yield ``{path, language, code}`` items for the source files in a zip or tar archive
+
+    Files with an unknown extension, over ``max_file_size`` bytes or that
+    are not valid UTF-8 are skipped.
+    """
+    def to_item(path: str, size: int, read) -> Optional[Dict[str, str]]:
+        language = extensions.get(os.path.splitext(path)[1].lower())
+        if not language or size > max_file_size:
+            return None
+        try:
+            code = read().decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+        return {'path': path, 'language': language, 'code': code}
+
+    if filename.lower().endswith('.zip') or zipfile.is_zipfile(io.BytesIO(data)):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                item = to_item(info.filename, info.file_size, lambda: archive.read(info))
+                if item:
+                    yield item
+    else:
+        with tarfile.open(fileobj=io.BytesIO(data), mode='r:*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                item = to_item(member.name, member.size, lambda: archive.extractfile(member).read())
+                if item:
+                    yield item
+
+
+class BatchAnalyzer:
+    """Analyze many files per request on a shared process pool
+
+    Static analysis runs on a pool of spawn workers. Items whose content is
+    already cached are answered without touching the pool, and duplicate
+    contents within a batch are analyzed once. Results are yielded per file
+    in completion order, each with an optional LLM roast.
+
+    A pool broken by a dying worker is replaced, and the job retried once.
+    Workers lint in-process without pylint's own timeout, so a job that
+    runs (not queues) for longer than ``item_timeout`` seconds fails and
+    its pool is torn down; the other jobs it took with it are retried.
+    """
+
+    def __init__(self, cache_manager, analyzer_version: str, llm_service=None,
+                 max_workers: Optional[int] = None, item_timeout: float = BATCH_ITEM_TIMEOUT):
+        self.cache_manager = cache_manager
+        self.analyzer_version = analyzer_version
+        self.llm_service = llm_service
+        self.max_workers = max_workers or int(os.getenv('BATCH_WORKERS', _default_workers()))
+        self.item_timeout = item_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+        return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor, terminate: bool = False) -> None:
+        """Drop a broken (or, with ``terminate``, stuck) pool unless it was already replaced"""
+        if self._executor is executor:
+            logger.warning("Batch worker pool broke; starting a new one")
+            if terminate:
+                # ProcessPoolExecutor cannot stop a running job; kill its workers
+                for process in list(executor._processes.values()):
+                    process.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run_job(self, executor: ProcessPoolExecutor, fn, *args) -> Any:
+        """Run fn on the pool, failing with TimeoutError once it has run for ``item_timeout``"""
+        loop = asyncio.get_running_loop()
+        future = executor.submit(fn, *args)
+        waiter = asyncio.wrap_future(future)
+        started = None
+        while True:
+            done, _ = await asyncio.wait({waiter}, timeout=min(1.0, self.item_timeout / 4))
+            if done:
+                return waiter.result()
+            # The clock starts when a worker takes the job, not while it queues
+            if started is None:
+                if future.running():
+                    started = loop.time()
+            elif loop.time() - started > self.item_timeout:
+                waiter.cancel()
+                logger.warning(f"Batch job exceeded {self.item_timeout}s, recycling the worker pool")
+                self._discard_executor(executor, terminate=True)
+                raise TimeoutError(f"Static analysis exceeded {self.item_timeout}s")
+
+    async def analyze(self, items: List[Dict[str, Any]], roast: bool = False,
+                      roast_level: str = 'medium') -> AsyncIterator[Dict[str, Any]]:
+        """Analyze items, yielding one result dict per item as it completes"""
+        loop = asyncio.get_running_loop()
+        in_flight: Dict[str, asyncio.Future] = {}
+        tasks = []
+
+        for index, item in enumerate(items):
+            code = item.get('code', '')
+            language = item.get('language', 'python')
+            key = content_key('static', code, language, self.analyzer_version)
+
+            if key not in in_flight:
+                cached = self.cache_manager.get(key)
+                if cached is not None:
+                    future = loop.create_future()
+                    future.set_result((cached, True))
+                else:
+                    future = asyncio.ensure_future(self._run_static(key, code, language))
+                in_flight[key] = future
+
+            tasks.append(asyncio.ensure_future(
+                self._analyze_item(index, item, in_flight[key], item.get('roast', roast), roast_level)
+            ))
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _run_static(self, key: str, code: str, language: str):
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                static = await self._run_job(executor, _analyze_static, code, language)
+                break
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                if attempt:
+                    raise
+        self.cache_manager.set(key, static, ttl=3600)
+        return static, False
+
+    async def _analyze_item(self, index: int, item: Dict[str, Any], static_future: asyncio.Future,
+                            roast: bool, roast_level: str) -> Dict[str, Any]:
+        language = item.get('language', 'python')
+        result = {
+            'index': index,
+            'path': item.get('path', f"item-{index}"),
+            'language': language
+        }
+
+        try:
+            static, cached = await asyncio.shield(static_future)
+        except Exception as e:
+            logger.error(f"Batch analysis failed for {result['path']}: {e}")
+            result['error'] = str(e)
+            return result
+
+        result.update(static)
+        result['cached'] = cached
+
+        if roast and self.llm_service is not None:
+            code = item.get('code', '')
+            roast_key = content_key('roast', code, language, roast_level, self.analyzer_version)
+            roast_result = self.cache_manager.get(roast_key)
+            if roast_result is None:
+                roast_result = await self.llm_service.generate_roast(
+                    code=code,
+                    issues=static['analysis']['issues'],
+                    language=language,
+                    intensity=roast_level
+                )
+                self.cache_manager.set(roast_key, roast_result, ttl=3600)
+            result['roast'] = roast_result
+
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
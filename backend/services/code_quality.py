@@ -1,16 +1,25 @@
 import ast
+import importlib
 import subprocess
 import tempfile
 import os
 from typing import Dict, List, Any
-import lizard
-import radon
-from radon.complexity import cc_visit
-from radon.metrics import mi_visit
-from radon.raw import analyze
-import javalang
-import esprima
-import clang.cindex
+
+from services.eslint_daemon import ESLintDaemonError, get_eslint_daemon
+from services.lint_pool import get_pylint_pool
+from services.rule_scanner import get_rule_scanner
+from utils.lazy import LazyRegistry
+
+# Bump whenever analyzer output changes so cached results are invalidated
+ANALYZER_VERSION = '4'
+
+# Parsing backends are imported on first use (or during warmup) so that
+# importing the analyzer does not pull in every language toolchain
+analysis_backends = LazyRegistry()
+analysis_backends.register('python', lambda: importlib.import_module('services.python_engine').PythonAnalysisEngine())
+analysis_backends.register('esprima', lambda: importlib.import_module('esprima'))
+analysis_backends.register('javalang', lambda: importlib.import_module('javalang'))
+analysis_backends.register('lizard', lambda: importlib.import_module('lizard'))
 
 class CodeQualityAnalyzer:
     """Comprehensive code quality analyzer for multiple languages"""
@@ -20,11 +29,7 @@ class CodeQualityAnalyzer:
             'python': self.analyze_python,
             'javascript': self.analyze_javascript,
             'java': self.analyze_java,
-            'cpp': self.analyze_cpp,
-            'typescript': self.analyze_typescript,
-            'go': self.analyze_go,
-            'rust': self.analyze_rust,
-            'ruby': self.analyze_ruby
+            'cpp': self.analyze_cpp
         }
     
     def analyze_code(self, code: str, language: str) -> Dict[str, Any]:
@@ -34,55 +39,40 @@ class CodeQualityAnalyzer:
         else:
             return self.analyze_generic(code, language)
     
+    def analyze_with_metrics(self, code: str, language: str) -> Dict[str, Any]:
+        """Run static analysis and comprehensive metrics for code"""
+        analysis = self.analyze_code(code, language)
+        
+        metrics = self.calculate_comprehensive_metrics(
+            code=code,
+            analysis=analysis,
+            language=language
+        )
+        return {'analysis': analysis, 'metrics': metrics}
+    
     def analyze_python(self, code: str) -> Dict[str, Any]:
         """Comprehensive Python code analysis"""
         issues = []
         metrics = {}
         
         try:
-            # Parse AST
-            tree = ast.parse(code)
-            
-            # Basic metrics
-            lines = code.splitlines()
-            metrics['line_count'] = len(lines)
-            metrics['character_count'] = len(code)
-            
-            # Complexity analysis
-            complexity_results = cc_visit(code)
-            metrics['cyclomatic_complexity'] = max([func.complexity for func in complexity_results] + [0])
-            metrics['function_count'] = len(complexity_results)
-            
-            # Maintainability index
-            mi_score = mi_visit(code, multi=True)
-            metrics['maintainability_index'] = mi_score
-            
-            # Raw metrics
-            raw_metrics = analyze(code)
-            metrics['comment_lines'] = raw_metrics.comments
-            metrics['blank_lines'] = raw_metrics.blank
-            metrics['code_lines'] = raw_metrics.loc
-            
-            # Check for issues
-            self._check_python_issues(tree, issues)
+            # Parse once; AST rules and radon metrics share the tree
+            engine_result = analysis_backends.get('python').analyze(code)
+            issues.extend(engine_result['issues'])
+            metrics.update(engine_result['metrics'])
             
             # Run pylint for additional checks
             pylint_issues = self._run_pylint(code)
             issues.extend(pylint_issues)
             
-            # Security analysis
-            security_issues = self._check_security(code)
-            issues.extend(security_issues)
-            
-            # Performance analysis
-            performance_issues = self._check_performance(code)
-            issues.extend(performance_issues)
-            
         except SyntaxError as e:
             issues.append(f"Syntax error: {str(e)}")
         except Exception as e:
             issues.append(f"Analysis error: {str(e)}")
         
+        # Security and performance rules work on text, so they run even if parsing failed
+        issues.extend(self._scan_rules(code, 'python'))
+        
         return {
             'issues': issues,
             'metrics': metrics,
@@ -96,7 +86,7 @@ class CodeQualityAnalyzer:
         
         try:
             # Parse with esprima
-            tree = esprima.parseScript(code, loc=True)
+            tree = analysis_backends.get('esprima').parseScript(code, loc=True)
             
             # Basic metrics
             lines = code.splitlines()
@@ -113,6 +103,8 @@ class CodeQualityAnalyzer:
         except Exception as e:
             issues.append(f"JavaScript parsing error: {str(e)}")
         
+        issues.extend(self._scan_rules(code, 'javascript'))
+        
         return {
             'issues': issues,
             'metrics': metrics,
@@ -126,7 +118,7 @@ class CodeQualityAnalyzer:
         
         try:
             # Parse with javalang
-            tree = javalang.parse.parse(code)
+            tree = analysis_backends.get('javalang').parse.parse(code)
             
             # Basic metrics
             lines = code.splitlines()
@@ -139,6 +131,8 @@ class CodeQualityAnalyzer:
         except Exception as e:
             issues.append(f"Java parsing error: {str(e)}")
         
+        issues.extend(self._scan_rules(code, 'java'))
+        
         return {
             'issues': issues,
             'metrics': metrics,
@@ -152,7 +146,7 @@ class CodeQualityAnalyzer:
         
         try:
             # Use lizard for C++ analysis
-            analysis = lizard.analyze_file.analyze_source_code("temp.cpp", code)
+            analysis = analysis_backends.get('lizard').analyze_file.analyze_source_code("temp.cpp", code)
             
             metrics['line_count'] = analysis.nloc
             metrics['function_count'] = len(analysis.function_list)
@@ -161,6 +155,8 @@ class CodeQualityAnalyzer:
         except Exception as e:
             issues.append(f"C++ analysis error: {str(e)}")
         
+        issues.extend(self._scan_rules(code, 'cpp'))
+        
         return {
             'issues': issues,
             'metrics': metrics,
@@ -218,55 +214,32 @@ class CodeQualityAnalyzer:
         
         return metrics
     
-    def _check_python_issues(self, tree: ast.AST, issues: List[str]):
-        """Check Python AST for issues"""
-        for node in ast.walk(tree):
-            # Check for missing docstrings
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.Module)):
-                if not ast.get_docstring(node):
-                    issues.append(f"No docstring for {node.__class__.__name__.lower()} '{getattr(node, 'name', 'module')}'")
-            
-            # Check for single-letter variables
-            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
-                if len(node.id) == 1 and node.id.isalpha():
-                    issues.append(f"Single-letter variable name '{node.id}'")
-            
-            # Check for overly long functions
-            if isinstance(node, ast.FunctionDef):
-                body_lines = len(node.body)
-                if body_lines > 50:
-                    issues.append(f"Overly long function '{node.name}' ({body_lines} lines)")
-    
     def _run_pylint(self, code: str) -> List[str]:
-        """Run pylint analysis"""
+        """Run pylint analysis on the resident worker pool"""
         issues = []
         try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
-            
-            result = subprocess.run(
-                ['pylint', '--disable=all', '--enable=C,R,W', temp_file],
-                capture_output=True,
-                text=True
-            )
-            
-            for line in result.stdout.splitlines():
-                if ':' in line:
-                    parts = line.split(':')
-                    if len(parts) >= 4:
-                        issue = parts[3].strip()
-                        if issue:
-                            issues.append(issue)
-            
-            os.unlink(temp_file)
+            for message in get_pylint_pool().lint(code):
+                issues.append(f"{message['msg_id']}: {message['message']} (line {message['line']})")
         except:
             pass
         
         return issues[:10]  # Limit to 10 issues
     
     def _run_eslint(self, code: str) -> List[str]:
-        """Run ESLint for JavaScript"""
+        """Run ESLint for JavaScript on the resident daemon, falling back to npx"""
+        try:
+            messages = get_eslint_daemon().lint(code)
+        except ESLintDaemonError:
+            return self._run_eslint_cli(code)
+        
+        return [
+            f"line {m['line']}, col {m['column']}, {'Error' if m['severity'] == 2 else 'Warning'} - "
+            f"{m['message']} ({m['ruleId']})"
+            for m in messages
+        ]
+    
+    def _run_eslint_cli(self, code: str) -> List[str]:
+        """Run ESLint for JavaScript through npx"""
         issues = []
         try:
             with tempfile.NamedTemporaryFile(mode='w', suffix='.js', delete=False) as f:
@@ -289,42 +262,12 @@ class CodeQualityAnalyzer:
         
         return issues
     
-    def _check_security(self, code: str) -> List[str]:
-        """Check for security issues"""
-        issues = []
-        
-        # Python security checks
-        dangerous_patterns = [
-            ('eval(', 'Use of eval() is dangerous'),
-            ('exec(', 'Use of exec() is dangerous'),
-            ('pickle.loads', 'Unpickling untrusted data is dangerous'),
-            ('subprocess.call', 'Shell injection possible'),
-            ('os.system', 'Shell injection possible'),
-            ('input()', 'raw_input() in Python 2'),
-        ]
-        
-        for pattern, message in dangerous_patterns:
-            if pattern in code:
-                issues.append(f"Security: {message}")
-        
-        return issues
-    
-    def _check_performance(self, code: str) -> List[str]:
-        """Check for performance issues"""
-        issues = []
-        
-        # Performance anti-patterns
-        performance_patterns = [
-            ('for key in dict.keys():', 'Use "for key in dict:" instead'),
-            ('list.append() in loop', 'Consider list comprehension'),
-            ('string += in loop', 'Use str.join() instead'),
+    def _scan_rules(self, code: str, language: str) -> List[str]:
+        """Check the language's security and performance rule pack in a single pass"""
+        return [
+            f"{hit['category'].capitalize()}: {hit['message']} (line {hit['line']}, col {hit['column']})"
+            for hit in get_rule_scanner(language).scan(code)
         ]
-        
-        for pattern, message in performance_patterns:
-            if pattern in code:
-                issues.append(f"Performance: {message}")
-        
-        return issues
     
     def _analyze_javascript_structure(self, tree) -> List[str]:
         """Analyze JavaScript structure"""
@@ -338,9 +281,32 @@ class CodeQualityAnalyzer:
     def _analyze_java_structure(self, tree) -> List[str]:
         """Analyze Java structure"""
         issues = []
-        
-        # TODO: Implement detailed Java structure analysis
-        # This would involve traversing the javalang AST
+        javalang_tree = analysis_backends.get('javalang').tree
+        loops = (javalang_tree.ForStatement, javalang_tree.WhileStatement, javalang_tree.DoStatement)
+        scopes = (javalang_tree.MethodDeclaration, javalang_tree.ConstructorDeclaration,
+                  javalang_tree.LambdaExpression, javalang_tree.ClassDeclaration)
+        
+        def is_string(node) -> bool:
+            if isinstance(node, javalang_tree.Literal):
+                return node.value.startswith('"')
+            if isinstance(node, javalang_tree.BinaryOperation):
+                return is_string(node.operandl) or is_string(node.operandr)
+            return False
+        
+        def in_loop(path) -> bool:
+            # Only a loop inside the same method (or lambda) counts
+            for ancestor in reversed(path):
+                if isinstance(ancestor, loops):
+                    return True
+                if isinstance(ancestor, scopes):
+                    return False
+            return False
+        
+        for path, node in tree.filter(javalang_tree.Assignment):
+            if node.type == '+=' and is_string(node.value) and in_loop(path):
+                positions = [p.position for p in path if getattr(p, 'position', None)]
+                location = f" (line {positions[-1].line}, col {positions[-1].column})" if positions else ''
+                issues.append(f"Performance: String built with += inside a loop; use StringBuilder{location}")
         
         return issues
     
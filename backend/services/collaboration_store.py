@@ -0,0 +1,445 @@
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import redis
+
+from models.collaboration import OP_LOG_SIZE, ChatMessage, CollaborationSession, HistoryEntry, Participant
+from models.operations import Delta
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = int(os.getenv('COLLAB_SESSION_TTL', 24 * 3600))
+# A full copy of the code is written every this many versions; keep it at
+# most half of OP_LOG_SIZE so the ops since the older checkpoint are kept
+CHECKPOINT_INTERVAL = int(os.getenv('COLLAB_CHECKPOINT_INTERVAL', 100))
+COMMIT_RETRIES = 5
+# Sessions untouched this long are snapshotted and dropped from memory
+SESSION_IDLE_SECONDS = int(os.getenv('COLLAB_IDLE_SECONDS', 600))
+# Bounds on what one worker keeps resident; least recently used go first
+MAX_RESIDENT_SESSIONS = int(os.getenv('COLLAB_MAX_RESIDENT_SESSIONS', 200))
+MAX_RESIDENT_CHARS = int(os.getenv('COLLAB_MAX_RESIDENT_CHARS', 20_000_000))
+
+
+class SessionStore:
+    """Collaboration sessions shared by every worker through Redis
+
+    Each worker keeps the sessions it serves in memory and checks them
+    against a small Redis hash (code ``version`` and ``rev`` for everything
+    else) on every read, reloading only what changed. A worker that is
+    behind on the code catches up by replaying the deltas it missed.
+
+    Code edits are committed with an optimistic transaction on that hash:
+    the edit is merged into an up-to-date copy of the session and written
+    only if no other worker committed in between, otherwise it is retried.
+    Redis holds the last ``OP_LOG_SIZE`` committed deltas and a full copy
+    of the code every ``CHECKPOINT_INTERVAL`` versions, so writes follow
+    the size of the edits rather than of the file.
+
+    Resident sessions are bounded by count and approximate size, least
+    recently used first, and ``reap`` drops the ones idle for longer than
+    ``idle_seconds``. An evicted session leaves a zlib-compressed snapshot
+    of its code and history, so the next access rebuilds it from that
+    snapshot instead of replaying from a checkpoint.
+
+    Keys (all under ``collab:<session_id>:``): ``meta`` (JSON), ``state``
+    (hash), ``participants`` (hash of JSON), ``chat`` and ``ops`` (lists of
+    JSON), ``checkpoints`` (list of the two latest checkpoints) and
+    ``snapshot`` (compressed JSON).
+    """
+
+    PARTS = ('meta', 'state', 'participants', 'chat', 'ops', 'checkpoints', 'snapshot')
+    INDEX_KEY = 'collab:sessions'
+
+    def __init__(self, redis_client, ttl: int = SESSION_TTL, idle_seconds: int = SESSION_IDLE_SECONDS,
+                 max_resident: int = MAX_RESIDENT_SESSIONS, max_resident_chars: int = MAX_RESIDENT_CHARS):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.idle_seconds = idle_seconds
+        self.max_resident = max_resident
+        self.max_resident_chars = max_resident_chars
+        # Least recently used first. The residency fields below are guarded
+        # by _resident_lock, which is never held while taking another lock
+        self._sessions: 'OrderedDict[str, CollaborationSession]' = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._resident_chars = 0
+        self._resident_lock = threading.Lock()
+        self._revs: Dict[str, int] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._locks_lock = threading.Lock()
+
+    @staticmethod
+    def _key(session_id: str, part: str) -> str:
+        return f"collab:{session_id}:{part}"
+
+    def _lock(self, session_id: str) -> threading.RLock:
+        with self._locks_lock:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = threading.RLock()
+            return lock
+
+    def _touch(self, pipe, session_id: str) -> None:
+        for part in self.PARTS:
+            pipe.expire(self._key(session_id, part), self.ttl)
+
+    def __len__(self) -> int:
+        """Sessions held in this worker's memory"""
+        return len(self._sessions)
+
+    def count(self) -> int:
+        """Sessions across all workers"""
+        return self.redis.scard(self.INDEX_KEY)
+
+    def create(self, session: CollaborationSession) -> None:
+        sid = session.session_id
+        pipe = self.redis.pipeline()
+        pipe.set(self._key(sid, 'meta'), json.dumps(session.meta()))
+        pipe.hset(self._key(sid, 'state'), mapping={'version': session.version, 'rev': 0})
+        pipe.rpush(self._key(sid, 'checkpoints'), json.dumps({'version': session.version, 'code': session.code}))
+        for participant in session.participants.values():
+            pipe.hset(self._key(sid, 'participants'), participant.user_id, json.dumps(participant.to_dict()))
+        pipe.sadd(self.INDEX_KEY, sid)
+        self._touch(pipe, sid)
+        pipe.execute()
+
+        self._revs[sid] = 0
+        self._make_resident(session)
+
+    def delete(self, session_id: str) -> None:
+        pipe = self.redis.pipeline()
+        pipe.delete(*(self._key(session_id, part) for part in self.PARTS))
+        pipe.srem(self.INDEX_KEY, session_id)
+        pipe.execute()
+        self._forget(session_id)
+
+    def _forget(self, session_id: str) -> None:
+        with self._resident_lock:
+            self._sessions.pop(session_id, None)
+            self._last_used.pop(session_id, None)
+            self._resident_chars -= self._sizes.pop(session_id, 0)
+        self._revs.pop(session_id, None)
+
+    def _mark_used(self, session_id: str) -> None:
+        with self._resident_lock:
+            if session_id in self._sessions:
+                self._sessions.move_to_end(session_id)
+                self._last_used[session_id] = time.monotonic()
+
+    def _resize(self, session: CollaborationSession) -> None:
+        """Update the running size total after a resident session changed"""
+        size = session.approximate_size()
+        with self._resident_lock:
+            if session.session_id in self._sizes:
+                self._resident_chars += size - self._sizes[session.session_id]
+                self._sizes[session.session_id] = size
+
+    def _make_resident(self, session: CollaborationSession) -> None:
+        sid = session.session_id
+        size = session.approximate_size()
+        with self._resident_lock:
+            self._sessions[sid] = session
+            self._resident_chars += size - self._sizes.get(sid, 0)
+            self._sizes[sid] = size
+        self._mark_used(sid)
+        self._enforce_limits()
+
+    def _enforce_limits(self) -> None:
+        """Evict least recently used sessions until within the residency bounds
+
+        Only the sessions that have to go are visited, against the running
+        count and size totals.
+        """
+        victims = []
+        with self._resident_lock:
+            count, size = len(self._sessions), self._resident_chars
+            # The most recently used session always stays
+            for session_id in itertools.islice(self._sessions, max(0, count - 1)):
+                if count <= self.max_resident and size <= self.max_resident_chars:
+                    break
+                victims.append(session_id)
+                count -= 1
+                size -= self._sizes.get(session_id, 0)
+        for session_id in victims:
+            self.evict(session_id, blocking=False)
+
+    def evict(self, session_id: str, blocking: bool = True) -> bool:
+        """Snapshot a resident session to Redis and drop it from memory
+
+        Returns False if it is not resident, or it is in use and ``blocking``
+        is False.
+        """
+        lock = self._lock(session_id)
+        if not lock.acquire(blocking=blocking):
+            return False
+        try:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            try:
+                self._save_snapshot(session)
+            except redis.RedisError as e:
+                # The checkpoints and op log still allow a full rebuild
+                logger.warning(f"Could not snapshot session {session_id}: {e}")
+            self._forget(session_id)
+            return True
+        finally:
+            lock.release()
+
+    def _save_snapshot(self, session: CollaborationSession) -> None:
+        data = {
+            'version': session.version,
+            'code': session.code,
+            'history': [entry.to_dict() for entry in session.code_history.entries]
+        }
+        self.redis.set(self._key(session.session_id, 'snapshot'),
+                       zlib.compress(json.dumps(data).encode('utf-8')), ex=self.ttl)
+
+    def reap(self) -> int:
+        """Evict sessions idle for longer than ``idle_seconds``; returns how many
+
+        Also forgets locks of sessions no longer resident and drops sessions
+        whose keys have expired from the shared index.
+        """
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._resident_lock:
+            idle = [session_id for session_id, used in self._last_used.items() if used < cutoff]
+        evicted = sum(self.evict(session_id, blocking=False) for session_id in idle)
+
+        with self._locks_lock:
+            for session_id in [sid for sid in self._locks if sid not in self._sessions]:
+                lock = self._locks[session_id]
+                if lock.acquire(blocking=False):
+                    del self._locks[session_id]
+                    lock.release()
+
+        self._prune_index()
+        if evicted:
+            logger.info(f"Evicted {evicted} idle collaboration sessions, {len(self._sessions)} resident")
+        return evicted
+
+    def _prune_index(self) -> None:
+        batch: List = []
+        for session_id in self.redis.sscan_iter(self.INDEX_KEY, count=500):
+            batch.append(session_id)
+            if len(batch) >= 500:
+                self._prune_batch(batch)
+                batch = []
+        if batch:
+            self._prune_batch(batch)
+
+    def _prune_batch(self, session_ids: List) -> None:
+        pipe = self.redis.pipeline()
+        for session_id in session_ids:
+            pipe.exists(self._key(session_id.decode() if isinstance(session_id, bytes) else session_id, 'state'))
+        expired = [sid for sid, exists in zip(session_ids, pipe.execute()) if not exists]
+        if expired:
+            self.redis.srem(self.INDEX_KEY, *expired)
+
+    def get(self, session_id: str) -> Optional[CollaborationSession]:
+        """The session, refreshed from Redis if another worker changed it"""
+        with self._lock(session_id):
+            session = self._refresh(session_id, self.redis)
+            if session is not None:
+                self._resize(session)
+            return session
+
+    def _refresh(self, session_id: str, conn) -> Optional[CollaborationSession]:
+        version, rev = conn.hmget(self._key(session_id, 'state'), 'version', 'rev')
+        if version is None:
+            self._forget(session_id)
+            return None
+        version, rev = int(version), int(rev)
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            return self._load(session_id, conn, version, rev)
+        self._mark_used(session_id)
+
+        if rev != self._revs[session_id]:
+            self._load_members(session, conn)
+            self._revs[session_id] = rev
+
+        missing = version - session.version
+        if missing:
+            records = [json.loads(r) for r in conn.lrange(self._key(session_id, 'ops'), -missing, -1)]
+            if missing < 0 or len(records) < missing or records[0]['version'] != session.version + 1:
+                # Too far behind (or ahead after a failed commit) to replay
+                return self._load(session_id, conn, version, rev)
+            for record in records:
+                self._replay(session, record)
+        return session
+
+    def _load(self, session_id: str, conn, version: int, rev: int) -> Optional[CollaborationSession]:
+        meta = conn.get(self._key(session_id, 'meta'))
+        checkpoints = conn.lrange(self._key(session_id, 'checkpoints'), 0, -1)
+        if meta is None or not checkpoints:
+            self._forget(session_id)
+            return None
+
+        session = CollaborationSession.from_meta(json.loads(meta))
+        self._load_members(session, conn)
+        records = [json.loads(r) for r in conn.lrange(self._key(session_id, 'ops'), 0, -1)]
+
+        # Start from the eviction snapshot if the op log bridges it to the
+        # current version, else rebuild from the oldest checkpoint kept
+        snapshot = conn.get(self._key(session_id, 'snapshot'))
+        snapshot = json.loads(zlib.decompress(snapshot)) if snapshot else None
+        if snapshot and (snapshot['version'] == version
+                         or (snapshot['version'] < version and records
+                             and records[0]['version'] <= snapshot['version'] + 1)):
+            session.code = snapshot['code']
+            session.version = snapshot['version']
+            session.code_history.restore(HistoryEntry.from_dict(entry) for entry in snapshot['history'])
+        else:
+            checkpoint = json.loads(checkpoints[0])
+            session.code = checkpoint['code']
+            session.version = checkpoint['version']
+        for record in records:
+            if record['version'] > session.version:
+                self._replay(session, record)
+        session.op_log.clear()
+        session.op_log.extend((record['version'], record['delta']) for record in records)
+
+        if session.version != version:
+            logger.warning(f"Session {session_id} rebuilt at version {session.version}, expected {version}")
+        self._revs[session_id] = rev
+        self._make_resident(session)
+        return session
+
+    def _load_members(self, session: CollaborationSession, conn) -> None:
+        sid = session.session_id
+        session.set_members(
+            (Participant.from_dict(json.loads(data)) for data in conn.hvals(self._key(sid, 'participants'))),
+            (ChatMessage.from_dict(json.loads(data)) for data in conn.lrange(self._key(sid, 'chat'), -100, -1))
+        )
+
+    @staticmethod
+    def _replay(session: CollaborationSession, record: Dict) -> None:
+        session.replay_delta(record['version'], record['delta'], record.get('user_id'),
+                             datetime.fromisoformat(record['timestamp']))
+
+    def apply_delta(self, session: CollaborationSession, delta: Delta, base_version: int,
+                    user_id: Optional[str] = None) -> Tuple[int, Delta]:
+        """Merge a client edit into the shared session (see ``CollaborationSession.apply_delta``)"""
+        return self._commit(session.session_id, user_id,
+                            lambda current: current.apply_delta(delta, base_version, user_id)[1])
+
+    def update_code(self, session: CollaborationSession, code: str,
+                    user_id: Optional[str] = None) -> Tuple[int, Delta]:
+        """Replace the shared code; returns the new version and the equivalent delta"""
+        return self._commit(session.session_id, user_id, lambda current: current.update_code(code, user_id))
+
+    def _commit(self, session_id: str, user_id: Optional[str],
+                change: Callable[[CollaborationSession], Delta]) -> Tuple[int, Delta]:
+        state_key = self._key(session_id, 'state')
+        with self._lock(session_id):
+            for _ in range(COMMIT_RETRIES):
+                with self.redis.pipeline() as pipe:
+                    try:
+                        pipe.watch(state_key)
+                        session = self._refresh(session_id, pipe)
+                        if session is None:
+                            raise ValueError(f"Session {session_id} no longer exists")
+
+                        delta = change(session)
+
+                        pipe.multi()
+                        self._write_commit(pipe, session, delta, user_id)
+                        pipe.execute()
+                        self._resize(session)
+                        # Edits grow the session, so the size bound can be crossed here too
+                        self._enforce_limits()
+                        return session.version, delta
+                    except redis.WatchError:
+                        # Another worker committed first; our copy now holds an
+                        # edit that was never stored, so rebuild it and retry
+                        self._forget(session_id)
+            raise ValueError("Too many concurrent edits, please resync")
+
+    def _write_commit(self, pipe, session: CollaborationSession, delta: Delta, user_id: Optional[str]) -> None:
+        sid = session.session_id
+        ops_key = self._key(sid, 'ops')
+        pipe.hset(self._key(sid, 'state'), 'version', session.version)
+        pipe.rpush(ops_key, json.dumps({
+            'version': session.version,
+            'delta': delta,
+            'user_id': user_id,
+            'timestamp': session.updated_at.isoformat()
+        }))
+        pipe.ltrim(ops_key, -OP_LOG_SIZE, -1)
+        if session.version % CHECKPOINT_INTERVAL == 0:
+            checkpoints_key = self._key(sid, 'checkpoints')
+            pipe.rpush(checkpoints_key, json.dumps({'version': session.version, 'code': session.code}))
+            # The older checkpoint keeps a full interval of history rebuildable
+            pipe.ltrim(checkpoints_key, -2, -1)
+        self._touch(pipe, sid)
+
+    def _update_members(self, session: CollaborationSession, write) -> None:
+        """Store a participant/chat change and bump ``rev`` so other workers reload them"""
+        sid = session.session_id
+        pipe = self.redis.pipeline()
+        write(pipe)
+        pipe.hincrby(self._key(sid, 'state'), 'rev', 1)
+        self._touch(pipe, sid)
+        rev = pipe.execute()[-1 - len(self.PARTS)]
+
+        # Only skip our own reload if nobody else changed members in between
+        if self._revs.get(sid) == rev - 1:
+            self._revs[sid] = rev
+
+    def _save_participant(self, pipe, session: CollaborationSession, user_id: str) -> None:
+        pipe.hset(self._key(session.session_id, 'participants'), user_id,
+                  json.dumps(session.participants[user_id].to_dict()))
+
+    def add_participant(self, session: CollaborationSession, user_id: str, username: str,
+                        role: str = "participant") -> bool:
+        with self._lock(session.session_id):
+            added = session.add_participant(user_id, username, role)
+            if added:
+                self._update_members(session, lambda pipe: self._save_participant(pipe, session, user_id))
+            return added
+
+    def remove_participant(self, session: CollaborationSession, user_id: str) -> bool:
+        with self._lock(session.session_id):
+            removed = session.remove_participant(user_id)
+            if removed:
+                self._update_members(
+                    session, lambda pipe: pipe.hdel(self._key(session.session_id, 'participants'), user_id)
+                )
+            return removed
+
+    def update_cursor_positions(self, session: CollaborationSession, positions: Dict[str, Dict]) -> None:
+        """Store a batch of cursor positions (user_id -> position)
+
+        Cursors are stored without bumping ``rev``: they reach clients as
+        presence frames, so other workers may serve a slightly stale cursor.
+        """
+        with self._lock(session.session_id):
+            pipe = self.redis.pipeline()
+            for user_id, position in positions.items():
+                session.update_cursor_position(user_id, position)
+                if user_id in session.participants:
+                    self._save_participant(pipe, session, user_id)
+            pipe.execute()
+
+    def add_chat_message(self, session: CollaborationSession, message_data: Dict) -> ChatMessage:
+        with self._lock(session.session_id):
+            message = session.add_chat_message(message_data)
+            chat_key = self._key(session.session_id, 'chat')
+
+            def write(pipe):
+                pipe.rpush(chat_key, json.dumps(message.to_dict()))
+                pipe.ltrim(chat_key, -100, -1)
+
+            self._update_members(session, write)
+            self._resize(session)
+            return message
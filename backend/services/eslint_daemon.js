@@ -0,0 +1,95 @@
+// Long-lived ESLint server for the backend.
+//
+// Listens on a local (unix domain) socket and speaks newline-delimited JSON:
+//   -> {"id": 1, "op": "lint", "code": "..."}
+//   <- {"id": 1, "messages": [{"line": 1, "column": 5, "severity": 2, ...}]}
+//   -> {"id": 2, "op": "ping"}
+//   <- {"id": 2, "ok": true}
+// ESLint and its config are loaded once at startup, so each lint request
+// only pays for the lint itself.
+
+const fs = require('fs');
+const net = require('net');
+const { ESLint } = require('eslint');
+
+const socketPath = process.argv[2];
+if (!socketPath) {
+  console.error('usage: node eslint_daemon.js <socket-path>');
+  process.exit(2);
+}
+
+const eslint = new ESLint({
+  useEslintrc: false,
+  overrideConfig: {
+    extends: ['eslint:recommended'],
+    env: { browser: true, node: true, es2021: true },
+    parserOptions: { ecmaVersion: 'latest', sourceType: 'module' },
+  },
+});
+
+async function handle(request) {
+  if (request.op === 'ping') {
+    return { id: request.id, ok: true };
+  }
+  if (request.op === 'lint') {
+    const [result] = await eslint.lintText(request.code || '', { filePath: 'snippet.js' });
+    return {
+      id: request.id,
+      messages: result.messages.map((m) => ({
+        line: m.line,
+        column: m.column,
+        severity: m.severity,
+        ruleId: m.ruleId,
+        message: m.message,
+      })),
+    };
+  }
+  return { id: request.id, error: `unknown op: ${request.op}` };
+}
+
+const server = net.createServer((conn) => {
+  let buffer = '';
+  conn.setEncoding('utf8');
+  conn.on('data', (chunk) => {
+    buffer += chunk;
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline);
+      buffer = buffer.slice(newline + 1);
+      if (!line.trim()) continue;
+      let request;
+      try {
+        request = JSON.parse(line);
+      } catch (err) {
+        conn.write(JSON.stringify({ error: `invalid request: ${err.message}` }) + '\n');
+        continue;
+      }
+      handle(request)
+        .then((response) => conn.write(JSON.stringify(response) + '\n'))
+        .catch((err) => conn.write(JSON.stringify({ id: request.id, error: err.message }) + '\n'));
+    }
+  });
+  conn.on('error', () => {});
+});
+
+if (fs.existsSync(socketPath)) {
+  fs.unlinkSync(socketPath);
+}
+
+server.listen(socketPath);
+
+function shutdown() {
+  server.close();
+  try {
+    fs.unlinkSync(socketPath);
+  } catch (err) {
+    // already gone
+  }
+  process.exit(0);
+}
+
+process.on('SIGTERM', shutdown);
+process.on('SIGINT', shutdown);
+// Exit with the backend: the parent holds our stdin open for its lifetime
+process.stdin.on('end', shutdown);
+process.stdin.resume();
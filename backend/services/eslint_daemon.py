@@ -0,0 +1,235 @@
+import itertools
+import json
+import logging
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DAEMON_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eslint_daemon.js')
+
+
+class ESLintDaemonError(Exception):
+    """Raised when the ESLint daemon cannot serve a request"""
+
+
+class ESLintDaemon:
+    """Keeps a Node ESLint server warm and talks to it over a unix socket
+
+    The daemon is started on first use and restarted when it dies or stops
+    answering health checks. Restarts are rate limited: after
+    ``max_restarts`` within ``restart_window`` seconds the daemon is left
+    down for ``cooldown`` seconds and callers fall back to ``npx eslint``.
+
+    Startup happens outside the lock: one caller launches the process and
+    the others wait on its ready event. A daemon that has been quiet for
+    ``health_interval`` seconds is pinged before it is reused.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, node_bin: Optional[str] = None,
+                 timeout: Optional[float] = None, startup_timeout: float = 15.0,
+                 max_restarts: int = 3, restart_window: float = 60.0, cooldown: float = 300.0,
+                 health_interval: float = 30.0):
+        self.socket_path = socket_path or os.getenv(
+            'ESLINT_DAEMON_SOCKET',
+            os.path.join(tempfile.gettempdir(), f"roast-eslint-{os.getpid()}.sock")
+        )
+        self.node_bin = node_bin or os.getenv('NODE_BIN', 'node')
+        self.timeout = timeout or float(os.getenv('ESLINT_TIMEOUT', 5))
+        self.startup_timeout = startup_timeout
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+
+        self._process: Optional[subprocess.Popen] = None
+        self._restarts = deque()
+        self._disabled_until = 0.0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._ready = False
+        # Set when the startup in progress (if any) has finished, either way
+        self._startup: Optional[threading.Event] = None
+        self._last_ok = 0.0
+
+    def lint(self, code: str) -> List[Dict]:
+        """Lint JavaScript source and return ESLint messages"""
+        self._ensure_running()
+        try:
+            response = self._request({'op': 'lint', 'code': code})
+        except ESLintDaemonError:
+            # A daemon that fails a request is presumed wedged; recycle it
+            self.stop()
+            raise
+        return response['messages']
+
+    def ping(self) -> bool:
+        """Health check: True if the daemon answers a ping"""
+        try:
+            return bool(self._request({'op': 'ping'}, timeout=1.0).get('ok'))
+        except ESLintDaemonError:
+            return False
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def warmup(self) -> None:
+        """Start the daemon ahead of the first request"""
+        try:
+            self._ensure_running()
+        except ESLintDaemonError as e:
+            logger.warning(f"ESLint daemon warmup failed: {e}")
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stop_locked()
+
+    def _stop_locked(self) -> None:
+        self._ready = False
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.terminate()
+                try:
+                    self._process.wait(timeout=2)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            self._process = None
+        if os.path.exists(self.socket_path):
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def _ensure_running(self) -> None:
+        while True:
+            launched = False
+            with self._lock:
+                if self._ready and not self.is_running():
+                    self._stop_locked()
+                if self._ready:
+                    if time.monotonic() - self._last_ok < self.health_interval:
+                        return
+                    process = self._process
+                else:
+                    process = None
+                    startup = self._startup
+                    if startup is None:
+                        startup = self._launch_locked()
+                        launched = True
+
+            if launched:
+                self._await_startup(startup)
+                return
+            if process is None:
+                startup.wait(self.startup_timeout)
+                with self._lock:
+                    if self._ready:
+                        return
+                raise ESLintDaemonError("ESLint daemon failed to start")
+
+            # Idle for a while; make sure it still answers before reusing it
+            if self.ping():
+                return
+            logger.warning("ESLint daemon stopped answering, restarting it")
+            with self._lock:
+                if self._process is process:
+                    self._stop_locked()
+
+    def _launch_locked(self) -> threading.Event:
+        """Start the process, subject to the restart limit; returns its startup event"""
+        now = time.monotonic()
+        if now < self._disabled_until:
+            raise ESLintDaemonError("ESLint daemon disabled after repeated failures")
+
+        while self._restarts and now - self._restarts[0] > self.restart_window:
+            self._restarts.popleft()
+        if len(self._restarts) >= self.max_restarts:
+            self._disabled_until = now + self.cooldown
+            self._restarts.clear()
+            logger.error(f"ESLint daemon restarted {self.max_restarts} times in "
+                         f"{self.restart_window}s; disabling for {self.cooldown}s")
+            raise ESLintDaemonError("ESLint daemon restart limit reached")
+        self._restarts.append(now)
+
+        self._stop_locked()
+        try:
+            self._process = subprocess.Popen(
+                [self.node_bin, DAEMON_SCRIPT, self.socket_path],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            self._process = None
+            raise ESLintDaemonError(f"Could not start ESLint daemon: {e}")
+        self._startup = threading.Event()
+        return self._startup
+
+    def _await_startup(self, startup: threading.Event) -> None:
+        """Wait (without the lock) for the launched daemon to answer, then release the waiters"""
+        process = self._process
+        ready = False
+        try:
+            deadline = time.monotonic() + self.startup_timeout
+            while time.monotonic() < deadline and process.poll() is None:
+                if os.path.exists(self.socket_path) and self.ping():
+                    ready = True
+                    break
+                time.sleep(0.05)
+        finally:
+            with self._lock:
+                if self._process is process:
+                    if ready:
+                        self._ready = True
+                    else:
+                        self._stop_locked()
+                self._startup = None
+            startup.set()
+
+        if not ready:
+            raise ESLintDaemonError("ESLint daemon failed to start")
+        logger.info(f"ESLint daemon ready on {self.socket_path}")
+
+    def _request(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        payload = dict(payload, id=next(self._ids))
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.settimeout(timeout or self.timeout)
+                conn.connect(self.socket_path)
+                conn.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+
+                buffer = b''
+                while not buffer.endswith(b'\n'):
+                    chunk = conn.recv(65536)
+                    if not chunk:
+                        break
+                    buffer += chunk
+        except OSError as e:
+            raise ESLintDaemonError(f"ESLint daemon request failed: {e}")
+
+        try:
+            response = json.loads(buffer)
+        except ValueError:
+            raise ESLintDaemonError("Malformed response from ESLint daemon")
+        # Answered, so it is alive even if the request itself failed
+        self._last_ok = time.monotonic()
+        if 'error' in response:
+            raise ESLintDaemonError(response['error'])
+        return response
+
+
+_default_daemon: Optional[ESLintDaemon] = None
+
+
+def get_eslint_daemon() -> ESLintDaemon:
+    """Get the process-wide ESLint daemon, creating it on first use"""
+    global _default_daemon
+    if _default_daemon is None:
+        _default_daemon = ESLintDaemon()
+    return _default_daemon
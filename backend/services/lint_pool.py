@@ -0,0 +1,163 @@
+import logging
+import multiprocessing
+import os
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Module name pylint reports for in-memory snippets
+SNIPPET_MODULE = 'snippet'
+
+# Per-worker state, populated by _init_worker in each pool process
+_linter = None
+_reporter = None
+_source = ''
+
+
+def _read_source() -> str:
+    """Stand-in for pylint's stdin reader that returns the current job's source"""
+    return _source
+
+
+def _init_worker(enabled: List[str]) -> None:
+    """Build one PyLinter per worker process and warm up astroid"""
+    global _linter, _reporter
+    from pylint.lint import PyLinter, pylinter
+    from pylint.reporters import CollectingReporter
+
+    # pylint's --from-stdin mode takes the module source from _read_stdin();
+    # pointing it at the job's source lets us lint without touching disk.
+    pylinter._read_stdin = _read_source
+
+    _reporter = CollectingReporter()
+    _linter = PyLinter(reporter=_reporter)
+    _linter.load_default_plugins()
+    _linter.load_plugin_configuration()
+    _linter.disable('all')
+    for category in enabled:
+        _linter.enable(category)
+    _linter.config.from_stdin = True
+
+    # Pay the astroid bootstrap (builtins, brain plugins) once, up front
+    _lint_source('"""warmup"""\n')
+
+
+def _lint_source(code: str) -> List[Dict]:
+    """Lint a source string with the worker's resident PyLinter"""
+    global _source
+    from astroid import MANAGER
+
+    _source = code
+    _reporter.messages = []
+    try:
+        _linter.check([f"{SNIPPET_MODULE}.py"])
+    finally:
+        MANAGER.astroid_cache.pop(SNIPPET_MODULE, None)
+        _source = ''
+
+    return [
+        {
+            'line': message.line,
+            'column': message.column,
+            'msg_id': message.msg_id,
+            'symbol': message.symbol,
+            'category': message.category,
+            'message': message.msg
+        }
+        for message in _reporter.messages
+    ]
+
+
+class PylintWorkerPool:
+    """Pool of long-lived pylint workers that lint source in memory
+
+    Workers keep pylint and astroid imported between jobs and are recycled
+    after ``max_jobs_per_worker`` jobs to bound memory growth.
+    """
+
+    def __init__(self, processes: Optional[int] = None, max_jobs_per_worker: Optional[int] = None,
+                 timeout: Optional[float] = None, enabled: Optional[List[str]] = None):
+        self.processes = processes or int(os.getenv('PYLINT_WORKERS', 2))
+        self.max_jobs_per_worker = max_jobs_per_worker or int(os.getenv('PYLINT_MAX_JOBS_PER_WORKER', 200))
+        self.timeout = timeout or float(os.getenv('PYLINT_TIMEOUT', 10))
+        self.enabled = enabled or ['C', 'R', 'W']
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn keeps the workers free of the parent's sockets and model weights
+                context = multiprocessing.get_context('spawn')
+                self._pool = context.Pool(
+                    processes=self.processes,
+                    initializer=_init_worker,
+                    initargs=(self.enabled,),
+                    maxtasksperchild=self.max_jobs_per_worker
+                )
+            return self._pool
+
+    def lint(self, code: str) -> List[Dict]:
+        """Lint source code and return structured pylint messages
+
+        Raises ``multiprocessing.TimeoutError`` if the job exceeds the timeout;
+        the pool is torn down so the stuck worker does not linger.
+        """
+        pool = self._get_pool()
+        try:
+            return pool.apply_async(_lint_source, (code,)).get(timeout=self.timeout)
+        except multiprocessing.TimeoutError:
+            logger.warning(f"pylint job exceeded {self.timeout}s, restarting worker pool")
+            self.terminate()
+            raise
+
+    def warmup(self) -> None:
+        """Start the workers ahead of the first request"""
+        self._get_pool()
+
+    def terminate(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool = None
+
+
+class InProcessLinter:
+    """Lints in the calling process with a resident PyLinter
+
+    For callers that already run inside a worker pool (e.g. batch analysis
+    workers), where spawning a nested pylint pool would be wasteful.
+    """
+
+    def __init__(self, enabled: Optional[List[str]] = None):
+        self.enabled = enabled or ['C', 'R', 'W']
+
+    def lint(self, code: str) -> List[Dict]:
+        if _linter is None:
+            _init_worker(self.enabled)
+        return _lint_source(code)
+
+    def warmup(self) -> None:
+        if _linter is None:
+            _init_worker(self.enabled)
+
+    def terminate(self) -> None:
+        pass
+
+
+_default_pool = None
+
+
+def get_pylint_pool():
+    """Get the process-wide pylint worker pool, creating it on first use"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = PylintWorkerPool()
+    return _default_pool
+
+
+def set_pylint_pool(pool) -> None:
+    """Replace the process-wide pylint pool, e.g. with an ``InProcessLinter``"""
+    global _default_pool
+    _default_pool = pool
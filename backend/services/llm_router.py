@@ -0,0 +1,366 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Collection, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Messages = List[Dict[str, str]]
+
+
+class LLMRouterError(Exception):
+    """Raised when no provider could serve a completion"""
+
+
+class ProviderStats:
+    """Rolling latency and error statistics for one provider"""
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+
+    def record_failure(self) -> None:
+        self.outcomes.append(False)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.latencies) < 5:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open probe after a cooldown"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, error_rate_threshold: float = 0.5,
+                 cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+
+    def is_available(self) -> bool:
+        """Whether a request would be let through; unlike ``allow_request`` changes nothing"""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.cooldown
+        return self.state == self.CLOSED
+
+    def allow_request(self) -> bool:
+        """Admit a request that is about to be sent; past the cooldown it becomes the probe"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            # Let a single probe through
+            self.state = self.HALF_OPEN
+            return True
+        return self.state == self.CLOSED
+
+    def release_probe(self) -> None:
+        """The probe ended without an outcome (e.g. cancelled): reopen, still past its cooldown"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self, stats: ProviderStats) -> None:
+        self.consecutive_failures += 1
+        if (self.state == self.HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+                or (len(stats.outcomes) >= 20 and stats.error_rate() >= self.error_rate_threshold)):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class LLMProvider(ABC):
+    """A chat-completion backend the router can dispatch to"""
+
+    name = 'provider'
+
+    def __init__(self, timeout: float = 30.0):
+        self.label = self.name
+        self.timeout = timeout
+        self.stats = ProviderStats()
+        self.breaker = CircuitBreaker()
+
+    @abstractmethod
+    async def complete(self, messages: Messages, temperature: float, max_tokens: int) -> str:
+        """Return the whole completion text"""
+
+    async def stream(self, messages: Messages, temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        """Yield the completion as it is produced; by default in a single chunk"""
+        yield await self.complete(messages, temperature, max_tokens)
+
+    @staticmethod
+    def flatten(messages: Messages) -> str:
+        """Render chat messages as a single prompt for non-chat backends"""
+        return "\n\n".join(message['content'] for message in messages)
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions; honours OPENAI_BASE_URL, e.g. for a local stub server"""
+
+    name = 'openai'
+
+    def __init__(self, client_factory: Callable[[], Any], model: str = 'gpt-4', timeout: float = 30.0):
+        super().__init__(timeout)
+        self.client_factory = client_factory
+        self.model = model
+        self.label = model
+
+    async def complete(self, messages: Messages, temperature: float, max_tokens: int) -> str:
+        response = await self.client_factory().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+    async def stream(self, messages: Messages, temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        response = await self.client_factory().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini; honours GEMINI_API_ENDPOINT, e.g. for a local stub server"""
+
+    name = 'gemini'
+
+    def __init__(self, model_factory: Callable[[], Any], timeout: float = 30.0):
+        super().__init__(timeout)
+        self.model_factory = model_factory
+        self.label = 'gemini-pro'
+
+    async def complete(self, messages: Messages, temperature: float, max_tokens: int) -> str:
+        response = await self.model_factory().generate_content_async(
+            self.flatten(messages),
+            generation_config={'temperature': temperature, 'max_output_tokens': max_tokens}
+        )
+        return response.text
+
+    async def stream(self, messages: Messages, temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        response = await self.model_factory().generate_content_async(
+            self.flatten(messages),
+            generation_config={'temperature': temperature, 'max_output_tokens': max_tokens},
+            stream=True
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class LocalProvider(LLMProvider):
+    """The resident local model; slowest and weakest, but always reachable"""
+
+    name = 'local'
+
+    def __init__(self, engine_factory: Callable[[], Any], timeout: float = 60.0):
+        super().__init__(timeout)
+        self.engine_factory = engine_factory
+        self.label = 'distilgpt2-local'
+
+    async def complete(self, messages: Messages, temperature: float, max_tokens: int) -> str:
+        engine = self.engine_factory()
+        if not engine.is_loaded:
+            raise LLMRouterError("Local model is not loaded")
+        return await engine.generate(self.flatten(messages), max_new_tokens=max_tokens)
+
+
+class LLMRouter:
+    """Latency-aware router across LLM providers
+
+    Providers are tried in preference order, skipping those whose circuit
+    is open. If the current attempt has not answered within its
+    provider's p95 latency, a hedged request goes to the next provider and
+    the first successful answer wins. A failed attempt fails over to the
+    next provider immediately.
+
+    Callers can ``exclude`` providers by name for tasks they are not fit
+    for (e.g. the local model for code correction).
+    """
+
+    def __init__(self, providers: List[LLMProvider], hedge: Optional[bool] = None,
+                 default_hedge_delay: Optional[float] = None, min_hedge_delay: float = 0.5):
+        self.providers = providers
+        self.hedge = hedge if hedge is not None else os.getenv('LLM_HEDGING', 'true').lower() == 'true'
+        self.default_hedge_delay = default_hedge_delay or float(os.getenv('LLM_HEDGE_DELAY', 8))
+        self.min_hedge_delay = min_hedge_delay
+
+    def _candidates(self, exclude: Collection[str]) -> List[LLMProvider]:
+        candidates = [p for p in self.providers if p.name not in exclude and p.breaker.is_available()]
+        if not candidates:
+            raise LLMRouterError("All LLM providers are unavailable")
+        return candidates
+
+    async def complete(self, messages: Messages, temperature: float = 0.7,
+                       max_tokens: int = 500, exclude: Collection[str] = ()) -> Tuple[str, str]:
+        """Return ``(text, model_label)`` from the first provider to answer"""
+        candidates = self._candidates(exclude)
+        running: Dict[asyncio.Task, LLMProvider] = {}
+        probes = set()
+        errors = []
+
+        def launch_next() -> bool:
+            """Start the next candidate its breaker admits; False if none is left"""
+            while candidates:
+                provider = candidates.pop(0)
+                probe = provider.breaker.state == CircuitBreaker.OPEN
+                if not provider.breaker.allow_request():
+                    # Another request took the probe since the candidates were listed
+                    continue
+                task = asyncio.ensure_future(self._attempt(provider, messages, temperature, max_tokens))
+                if probe:
+                    probes.add(task)
+                running[task] = provider
+                return True
+            return False
+
+        if not launch_next():
+            raise LLMRouterError("All LLM providers are unavailable")
+        try:
+            while running:
+                timeout = None
+                if self.hedge and candidates and len(running) == 1:
+                    timeout = self._hedge_delay(next(iter(running.values())))
+
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Primary is past its p95: hedge to the next provider
+                    if launch_next():
+                        logger.info(f"Hedging LLM request to {list(running.values())[-1].name}")
+                    continue
+
+                for task in done:
+                    provider = running.pop(task)
+                    try:
+                        return task.result(), provider.label
+                    except Exception as e:
+                        errors.append(f"{provider.name}: {e}")
+                        if len(running) == 0:
+                            launch_next()
+        finally:
+            for task, provider in running.items():
+                if not task.done():
+                    task.cancel()
+                    # A probe cut short has no outcome; it must not leave the
+                    # breaker half-open (and so closed to every request) for good
+                    if task in probes:
+                        provider.breaker.release_probe()
+
+        raise LLMRouterError("; ".join(errors) or "No LLM provider answered")
+
+    async def stream(self, messages: Messages, on_token: Callable[[str], None],
+                     temperature: float = 0.7, max_tokens: int = 500,
+                     exclude: Collection[str] = ()) -> Tuple[str, str]:
+        """Stream a completion to ``on_token`` chunk by chunk; returns ``(text, model_label)``
+
+        Providers are tried in preference order until one produces its first
+        chunk. Requests are not hedged here, since two providers cannot both
+        stream to the same client. An error after the first chunk is raised,
+        as the client has already seen part of the answer.
+        """
+        errors = []
+        for provider in self._candidates(exclude):
+            probe = provider.breaker.state == CircuitBreaker.OPEN
+            if not provider.breaker.allow_request():
+                continue
+            start = time.monotonic()
+            chunks = []
+            iterator = provider.stream(messages, temperature, max_tokens).__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), timeout=provider.timeout)
+                    except StopAsyncIteration:
+                        break
+                    chunks.append(chunk)
+                    on_token(chunk)
+                if not chunks:
+                    raise LLMRouterError("Empty completion")
+            except asyncio.CancelledError:
+                if probe:
+                    provider.breaker.release_probe()
+                raise
+            except Exception as e:
+                provider.stats.record_failure()
+                provider.breaker.record_failure(provider.stats)
+                if chunks:
+                    raise
+                errors.append(f"{provider.name}: {e}")
+                continue
+            finally:
+                if hasattr(iterator, 'aclose'):
+                    await iterator.aclose()
+
+            provider.stats.record_success(time.monotonic() - start)
+            provider.breaker.record_success()
+            return ''.join(chunks), provider.label
+
+        raise LLMRouterError("; ".join(errors) or "All LLM providers are unavailable")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Per-provider health, for monitoring"""
+        return {
+            provider.name: {
+                'circuit': provider.breaker.state,
+                'p50': provider.stats.percentile(0.5),
+                'p95': provider.stats.percentile(0.95),
+                'error_rate': round(provider.stats.error_rate(), 3)
+            }
+            for provider in self.providers
+        }
+
+    def _hedge_delay(self, provider: LLMProvider) -> float:
+        p95 = provider.stats.percentile(0.95)
+        if p95 is None:
+            return self.default_hedge_delay
+        return max(p95, self.min_hedge_delay)
+
+    async def _attempt(self, provider: LLMProvider, messages: Messages,
+                       temperature: float, max_tokens: int) -> str:
+        start = time.monotonic()
+        try:
+            text = await asyncio.wait_for(
+                provider.complete(messages, temperature, max_tokens),
+                timeout=provider.timeout
+            )
+            if not text:
+                raise LLMRouterError("Empty completion")
+        except asyncio.CancelledError:
+            # Lost a hedge race; not the provider's fault
+            raise
+        except Exception:
+            provider.stats.record_failure()
+            provider.breaker.record_failure(provider.stats)
+            raise
+
+        provider.stats.record_success(time.monotonic() - start)
+        provider.breaker.record_success()
+        return text
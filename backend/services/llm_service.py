@@ -1,89 +1,156 @@
+import ast
+import asyncio
 import os
 import json
-from typing import Dict, List, Optional, Any
-import openai
-from openai import OpenAI
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-import google.generativeai as genai
+from typing import Dict, List, Optional, Any, Callable, Tuple
+
+from services.llm_router import GeminiProvider, LLMRouter, LocalProvider, OpenAIProvider
+from services.local_inference import LocalInferenceEngine
+from services.prompt_builder import PromptBuilder, rank_issues
+from services.roast_templates import TemplateRoaster
+from utils.lazy import LazyRegistry
+
+def _create_openai_client():
+    # Async client so independent calls can overlap. OPENAI_BASE_URL points
+    # it at any OpenAI-compatible server (e.g. a local stub for load tests).
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key=os.getenv('OPENAI_API_KEY', 'unused'),
+        base_url=os.getenv('OPENAI_BASE_URL') or None,
+        timeout=30.0
+    )
+
+def _create_gemini_model():
+    import google.generativeai as genai
+    endpoint = os.getenv('GEMINI_API_ENDPOINT')
+    if endpoint:
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'), transport='rest',
+                        client_options={'api_endpoint': endpoint})
+    else:
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+    return genai.GenerativeModel('gemini-pro')
+
+def _create_local_engine():
+    engine = LocalInferenceEngine()
+    engine.load()
+    return engine
 
 class LLMService:
-    """Service for interacting with various LLMs"""
+    """Service for interacting with various LLMs
+    
+    Provider clients and the local model are registered lazily and built on
+    first use (or by ``backends.warmup()``), so constructing the service is cheap.
+    """
     
     def __init__(self):
-        # Initialize OpenAI
-        self.openai_client = OpenAI(
-            api_key=os.getenv('OPENAI_API_KEY'),
-            timeout=30.0
-        )
+        self.backends = LazyRegistry()
+        self.backends.register('openai', _create_openai_client)
+        self.backends.register('gemini', _create_gemini_model)
+        self.backends.register('local', _create_local_engine)
         
-        # Initialize Google Gemini
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.gemini_model = genai.GenerativeModel('gemini-pro')
+        # Resident local model: fallback when OpenAI is unavailable, and the
+        # only backend when LLM_OFFLINE is set
+        self.offline = os.getenv('LLM_OFFLINE', 'false').lower() == 'true'
+        self.router = LLMRouter(self._build_providers())
+        self.prompts = PromptBuilder()
         
-        # Load local models
-        self.local_model = None
-        self.local_tokenizer = None
-        self._load_local_models()
+        # Roast templates, precompiled and indexed by issue category
+        self.template_roaster = TemplateRoaster('ml_models/roast_templates.json')
+    
+    @property
+    def openai_client(self):
+        return self.backends.get('openai')
+    
+    @property
+    def gemini_model(self):
+        return self.backends.get('gemini')
+    
+    @property
+    def local_engine(self) -> LocalInferenceEngine:
+        return self.backends.get('local')
+    
+    def _build_providers(self) -> List:
+        """Providers in preference order; only configured remote ones are included"""
+        providers = []
+        if not self.offline:
+            if os.getenv('OPENAI_API_KEY') or os.getenv('OPENAI_BASE_URL'):
+                providers.append(OpenAIProvider(lambda: self.openai_client,
+                                                model=os.getenv('OPENAI_MODEL', 'gpt-4')))
+            if os.getenv('GEMINI_API_KEY'):
+                providers.append(GeminiProvider(lambda: self.gemini_model))
+        providers.append(LocalProvider(lambda: self.local_engine))
+        return providers
+    
+    async def _complete(self, system: str, prompt: str, temperature: float, max_tokens: int,
+                        on_token: Optional[Callable[[str], None]] = None,
+                        allow_local: bool = True) -> Tuple[str, str]:
+        """Route a chat completion to the fastest healthy provider; returns (text, model)
+        
+        With ``on_token`` the completion is streamed and each chunk is passed
+        to it as it arrives. ``allow_local=False`` keeps the local model out,
+        for answers it cannot produce usefully (suggestions, corrected code).
+        """
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+        exclude = () if allow_local else (LocalProvider.name,)
+        if on_token is not None:
+            return await self.router.stream(messages, on_token, temperature=temperature, max_tokens=max_tokens,
+                                            exclude=exclude)
+        return await self.router.complete(messages, temperature=temperature, max_tokens=max_tokens,
+                                          exclude=exclude)
+    
+    def preload_local_model(self) -> bool:
+        """Load the local model now and place its weights in shared memory
         
-        # Load roast templates
-        with open('ml_models/roast_templates.json', 'r') as f:
-            self.roast_templates = json.load(f)
+        Meant for a pre-fork server (gunicorn ``preload_app``): workers forked
+        afterwards share one copy of the weights.
+        """
+        engine = self.local_engine
+        if not engine.is_loaded:
+            return False
+        engine.share_memory()
+        return True
     
-    async def generate_roast(self, code: str, issues: List[str], language: str, intensity: str = 'medium') -> Dict:
-        """Generate roast for code"""
+    async def generate_roast(self, code: str, issues: List[str], language: str, intensity: str = 'medium',
+                             on_token: Optional[Callable[[str], None]] = None) -> Dict:
+        """Generate roast for code, streaming it to ``on_token`` if given"""
+        if self.offline:
+            return await self._generate_local_roast(issues, language, intensity)
+        
         try:
-            # Use OpenAI for better quality roasts
-            prompt = self._create_roast_prompt(code, issues, language, intensity)
+            prompt = self.prompts.roast(code, issues, language, intensity)
             
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a sarcastic code reviewer. Provide humorous but helpful feedback."},
-                    {"role": "user", "content": prompt}
-                ],
+            roast_text, model = await self._complete(
+                prompt.system,
+                prompt.user,
                 temperature=0.7 + (0.1 if intensity == 'brutal' else 0),
-                max_tokens=500
+                max_tokens=prompt.max_tokens,
+                on_token=on_token
             )
             
-            roast_text = response.choices[0].message.content
-            
             return {
                 'text': roast_text,
                 'intensity': intensity,
                 'language': language,
-                'model': 'gpt-4'
+                'model': model
             }
             
         except Exception as e:
             # Fallback to template-based roasting
             return self._generate_template_roast(issues, intensity)
     
-    async def generate_suggestions(self, code: str, issues: List[str], language: str) -> List[str]:
-        """Generate improvement suggestions"""
+    async def generate_suggestions(self, code: str, issues: List[str], language: str,
+                                   on_token: Optional[Callable[[str], None]] = None) -> List[str]:
+        """Generate improvement suggestions, streaming the raw text to ``on_token`` if given"""
         try:
-            prompt = f"""Given this {language} code and these issues, provide 3 specific suggestions for improvement:
-
-Code:
-
-Issues:
-{chr(10).join(issues)}
-
-Provide suggestions in the format:
-1. Suggestion one
-2. Suggestion two
-3. Suggestion three"""
-
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a helpful code reviewer providing constructive suggestions."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=300
-            )
+            prompt = self.prompts.suggestions(code, issues, language)
+            
+            text, _ = await self._complete(prompt.system, prompt.user, temperature=0.3,
+                                           max_tokens=prompt.max_tokens, on_token=on_token, allow_local=False)
             
-            suggestions = response.choices[0].message.content.strip().split('\n')
+            suggestions = text.strip().split('\n')
             return [s.strip() for s in suggestions if s.strip()]
             
         except:
@@ -91,41 +158,98 @@ Provide suggestions in the format:
     
     async def correct_code(self, code: str, issues: List[str], language: str) -> str:
         """Generate corrected version of code"""
+        prompt = self.prompts.correction(code, issues, language)
+        if prompt is None:
+            # Too large to rewrite in one completion; leave it as is
+            return code
+        
         try:
-            prompt = f"""Correct this {language} code by fixing the following issues:
-
-Issues to fix:
-{chr(10).join(issues[:5])}
-
-Original code:
-
-Provide only the corrected code without any explanations:"""
-
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a code correction assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=1000
-            )
-            
-            corrected = response.choices[0].message.content.strip()
+            text, _ = await self._complete(prompt.system, prompt.user, temperature=0.1, max_tokens=prompt.max_tokens,
+                                           allow_local=False)
             
-            # Extract code from markdown if present
-            if '```' in corrected:
-                corrected = corrected.split('```')[1].split('```')[0].strip()
-                if corrected.startswith(language):
-                    corrected = corrected[len(language):].strip()
-            
-            return corrected
+            return self._valid_correction(self._extract_code(text, language), code, language)
             
         except Exception as e:
             return code
     
-    async def generate_code_from_prompt(self, prompt: str, language: str = 'python', complexity: str = 'medium') -> str:
-        """Generate code from natural language prompt"""
+    async def generate_review(self, code: str, issues: List[str], language: str, intensity: str = 'medium') -> Dict:
+        """Generate roast, suggestions and corrected code with one structured completion
+        
+        The code and issues are sent once instead of three times. Each field
+        of the JSON answer is validated on its own, and any field that is
+        missing or malformed is produced by its dedicated call instead.
+        """
+        review = {}
+        with_correction = True
+        if not self.offline:
+            prompt, with_correction = self.prompts.review(code, issues, language, intensity)
+            try:
+                text, model = await self._complete(prompt.system, prompt.user, temperature=0.5,
+                                                   max_tokens=prompt.max_tokens, allow_local=False)
+                review = self._parse_review(text, language, model)
+                if 'roast' in review:
+                    review['roast']['intensity'] = intensity
+            except Exception:
+                pass
+        
+        fallbacks = {}
+        if 'roast' not in review:
+            fallbacks['roast'] = self.generate_roast(code, issues, language, intensity)
+        if 'suggestions' not in review:
+            fallbacks['suggestions'] = self.generate_suggestions(code, issues, language)
+        if 'corrected_code' not in review:
+            if with_correction:
+                fallbacks['corrected_code'] = self.correct_code(code, issues, language)
+            else:
+                review['corrected_code'] = code
+        
+        if fallbacks:
+            results = await asyncio.gather(*fallbacks.values())
+            review.update(zip(fallbacks.keys(), results))
+        
+        return review
+    
+    def _parse_review(self, text: str, language: str, model: str) -> Dict:
+        """Validated fields of a structured review answer; invalid ones are left out"""
+        start, end = text.find('{'), text.rfind('}')
+        try:
+            data = json.loads(text[start:end + 1]) if 0 <= start < end else None
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return {}
+        
+        review = {}
+        roast = data.get('roast')
+        if isinstance(roast, str) and roast.strip():
+            review['roast'] = {'text': roast.strip(), 'language': language, 'model': model}
+        
+        suggestions = data.get('suggestions')
+        if isinstance(suggestions, str):
+            suggestions = suggestions.split('\n')
+        if isinstance(suggestions, list):
+            suggestions = [s.strip() for s in suggestions if isinstance(s, str) and s.strip()]
+            if suggestions:
+                review['suggestions'] = suggestions
+        
+        corrected = data.get('corrected_code')
+        if isinstance(corrected, str) and corrected.strip():
+            corrected = self._extract_code(corrected, language)
+            if self._valid_correction(corrected, None, language) is not None:
+                review['corrected_code'] = corrected
+        
+        return review
+    
+    async def generate_code_from_prompt(self, prompt: str, language: str = 'python', complexity: str = 'medium',
+                                        on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Generate code from natural language prompt, streaming it to ``on_token`` if given
+        
+        The streamed chunks are the raw completion; the returned code has any
+        markdown fence stripped.
+        """
+        if self.offline:
+            return await self._generate_with_local_model(prompt, language)
+        
         try:
             system_prompt = f"You are a {language} programming expert. Generate clean, efficient code."
             
@@ -137,77 +261,40 @@ Requirements:
 - Make the code {complexity} complexity level
 - Return only the code without explanations"""
 
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1000
-            )
-            
-            generated_code = response.choices[0].message.content.strip()
+            text, _ = await self._complete(system_prompt, user_prompt, temperature=0.3, max_tokens=1000,
+                                           on_token=on_token)
             
-            # Extract code from markdown if present
-            if '```' in generated_code:
-                generated_code = generated_code.split('```')[1].split('```')[0].strip()
-                if generated_code.startswith(language):
-                    generated_code = generated_code[len(language):].strip()
-            
-            return generated_code
+            return self._extract_code(text, language)
             
         except Exception as e:
             # Fallback to local model
-            return self._generate_with_local_model(prompt, language)
+            return await self._generate_with_local_model(prompt, language)
     
-    def _create_roast_prompt(self, code: str, issues: List[str], language: str, intensity: str) -> str:
-        """Create prompt for roast generation"""
-        intensity_map = {
-            'mild': 'gentle and constructive',
-            'medium': 'sarcastic but helpful',
-            'brutal': 'very sarcastic and brutally honest'
-        }
-        
-        return f"""As a {intensity_map.get(intensity, 'sarcastic')} code reviewer, provide feedback on this {language} code.
-
-Code:
-
-Issues found:
-{chr(10).join(issues[:5]) if issues else 'No major issues found'}
-
-Provide your feedback in a humorous, roast-style format. Keep it under 3 sentences:"""
+    @staticmethod
+    def _extract_code(text: str, language: str) -> str:
+        """Strip a markdown code fence from a completion, if present"""
+        code = text.strip()
+        if '```' in code:
+            code = code.split('```')[1].split('```')[0].strip()
+            if code.startswith(language):
+                code = code[len(language):].strip()
+        return code
+    
+    @staticmethod
+    def _valid_correction(corrected: str, original: Optional[str], language: str) -> Optional[str]:
+        """The corrected code, or ``original`` if it is empty or (for Python) does not parse"""
+        if not corrected.strip():
+            return original
+        if language == 'python':
+            try:
+                ast.parse(corrected)
+            except (SyntaxError, ValueError):
+                return original
+        return corrected
     
     def _generate_template_roast(self, issues: List[str], intensity: str) -> Dict:
-        """Generate roast from templates"""
-        import random
-        
-        if not issues:
-            templates = self.roast_templates['general'].get(intensity, [])
-            if templates:
-                roast_text = random.choice(templates)
-            else:
-                roast_text = "Your code is surprisingly decent. I'm almost disappointed."
-        else:
-            # Pick a random issue category
-            categories = list(self.roast_templates.keys())
-            category = random.choice(categories)
-            
-            if intensity in self.roast_templates[category]:
-                templates = self.roast_templates[category][intensity]
-                if templates:
-                    template = random.choice(templates)
-                    # Format with placeholders
-                    roast_text = template.format(
-                        name="this code",
-                        depth="several",
-                        score="high",
-                        issue=issues[0] if issues else "something"
-                    )
-                else:
-                    roast_text = f"Found {len(issues)} issues in your code."
-            else:
-                roast_text = f"Found {len(issues)} issues that need fixing."
+        """Generate roast from templates matched to the issues found"""
+        roast_text = self.template_roaster.roast(issues, intensity)
         
         return {
             'text': roast_text,
@@ -216,14 +303,36 @@ Provide your feedback in a humorous, roast-style format. Keep it under 3 sentenc
             'model': 'template-based'
         }
     
-    def _generate_with_local_model(self, prompt: str, language: str) -> str:
-        """Generate code using local model"""
-        if self.local_model and self.local_tokenizer:
+    async def _generate_local_roast(self, issues: List[str], language: str, intensity: str) -> Dict:
+        """Generate roast with the resident local model, falling back to templates"""
+        if self.local_engine.is_loaded:
+            try:
+                prompt = (
+                    f"A {intensity} roast of {language} code with these issues:\n"
+                    f"{chr(10).join(rank_issues(issues, 5)) if issues else 'No major issues found'}\n"
+                    "Roast:"
+                )
+                roast_text = (await self.local_engine.generate(prompt, max_new_tokens=80)).strip()
+                if roast_text:
+                    return {
+                        'text': roast_text,
+                        'intensity': intensity,
+                        'language': language,
+                        'model': 'distilgpt2-local'
+                    }
+            except Exception:
+                pass
+        
+        return self._generate_template_roast(issues, intensity)
+    
+    async def _generate_with_local_model(self, prompt: str, language: str) -> str:
+        """Generate code using the resident local model"""
+        if self.local_engine.is_loaded:
             try:
-                generator = pipeline('text-generation', model=self.local_model, tokenizer=self.local_tokenizer)
-                result = generator(prompt, max_length=200, num_return_sequences=1)
-                return result[0]['generated_text']
-            except:
+                generated = await self.local_engine.generate(f"# {language}: {prompt}\n")
+                if generated.strip():
+                    return generated.strip()
+            except Exception:
                 pass
         
         # Fallback to simple examples
@@ -248,20 +357,10 @@ solution();''',
         
         return examples.get(language, examples['python'])
     
-    def _load_local_models(self):
-        """Load local models for fallback"""
-        try:
-            model_path = "ml_models/fine_tuned_distilgpt2"
-            if os.path.exists(model_path):
-                self.local_tokenizer = AutoTokenizer.from_pretrained(model_path)
-                self.local_model = AutoModelForCausalLM.from_pretrained(model_path)
-        except:
-            pass
-    
     def is_available(self) -> bool:
         """Check if LLM services are available"""
         return (
             bool(os.getenv('OPENAI_API_KEY')) or 
             bool(os.getenv('GEMINI_API_KEY')) or 
-            self.local_model is not None
+            (self.backends.is_loaded('local') and self.local_engine.is_loaded)
         )
\ No newline at end of file
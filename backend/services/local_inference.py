@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = "ml_models/fine_tuned_distilgpt2"
+
+
+class LocalInferenceEngine:
+    """Resident CPU inference for the fine-tuned distilgpt2 with dynamic batching
+
+    The model and tokenizer are loaded once. Concurrent requests are queued
+    and a single worker thread drains the queue, running up to
+    ``max_batch_size`` prompts through one ``generate`` call. It waits at
+    most ``max_wait_ms`` for a batch to fill. Prompt and output lengths are
+    both bounded, so a single request cannot monopolize the worker.
+    """
+
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH, max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None, max_new_tokens: Optional[int] = None,
+                 max_input_tokens: Optional[int] = None):
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size or int(os.getenv('LOCAL_MODEL_MAX_BATCH', 8))
+        self.max_wait = (max_wait_ms or float(os.getenv('LOCAL_MODEL_MAX_WAIT_MS', 10))) / 1000
+        self.max_new_tokens = max_new_tokens or int(os.getenv('LOCAL_MODEL_MAX_NEW_TOKENS', 160))
+        self.max_input_tokens = max_input_tokens or int(os.getenv('LOCAL_MODEL_MAX_INPUT_TOKENS', 512))
+
+        self.model = None
+        self.tokenizer = None
+        self._queue: Optional[queue.Queue] = None
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None and self.tokenizer is not None
+
+    def load(self) -> bool:
+        """Load the model and tokenizer once; returns False if unavailable"""
+        if self.is_loaded:
+            return True
+        if not os.path.exists(self.model_path):
+            return False
+
+        try:
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            # Left padding keeps every prompt flush against its generated tokens
+            tokenizer.padding_side = 'left'
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+
+            model = AutoModelForCausalLM.from_pretrained(self.model_path)
+            model.eval()
+
+            threads = os.getenv('LOCAL_MODEL_THREADS')
+            if threads:
+                torch.set_num_threads(int(threads))
+
+            self.tokenizer = tokenizer
+            self.model = model
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load local model from {self.model_path}: {e}")
+            return False
+
+    def share_memory(self) -> None:
+        """Move the model's tensors into shared memory
+
+        Call in a parent process before forking workers: every child then
+        maps the same physical pages instead of holding its own copy.
+        Inference never writes to the weights, so the pages stay shared.
+        """
+        if not self.is_loaded:
+            return
+        for tensor in list(self.model.parameters()) + list(self.model.buffers()):
+            tensor.share_memory_()
+
+    def submit(self, prompt: str, max_new_tokens: Optional[int] = None) -> Future:
+        """Queue a prompt for generation; the future resolves to the generated text"""
+        future: Future = Future()
+        if not self.is_loaded:
+            future.set_exception(RuntimeError("Local model is not loaded"))
+            return future
+
+        self._ensure_worker()
+        self._queue.put((prompt, min(max_new_tokens or self.max_new_tokens, self.max_new_tokens), future))
+        return future
+
+    async def generate(self, prompt: str, max_new_tokens: Optional[int] = None) -> str:
+        """Generate a continuation of ``prompt`` without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(prompt, max_new_tokens))
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so a model preloaded in a parent
+        # process gets a fresh queue and worker in each child.
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, args=(self._queue,),
+                                            name='local-inference', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run(self, requests: queue.Queue) -> None:
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            live = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                outputs = self._generate_batch(live)
+                for (_, _, future), text in zip(live, outputs):
+                    future.set_result(text)
+            except Exception as e:
+                logger.error(f"Local batch generation failed: {e}")
+                for _, _, future in live:
+                    future.set_exception(e)
+
+    def _generate_batch(self, batch: List[Tuple[str, int, Future]]) -> List[str]:
+        """Run one forward pass for a batch and decode each request's new tokens"""
+        import torch
+
+        prompts = [prompt for prompt, _, _ in batch]
+        budgets = [max_new_tokens for _, max_new_tokens, _ in batch]
+        encoded = self.tokenizer(
+            prompts,
+            return_tensors='pt',
+            padding=True,
+            truncation=True,
+            max_length=self.max_input_tokens
+        )
+
+        with torch.inference_mode():
+            output_ids = self.model.generate(
+                **encoded,
+                max_new_tokens=max(budgets),
+                do_sample=True,
+                top_p=0.95,
+                temperature=0.8,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+
+        prompt_length = encoded['input_ids'].shape[1]
+        return [
+            self.tokenizer.decode(ids[prompt_length:prompt_length + budget], skip_special_tokens=True)
+            for ids, budget in zip(output_ids, budgets)
+        ]
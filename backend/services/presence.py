@@ -0,0 +1,70 @@
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TICK_MS = int(os.getenv('PRESENCE_TICK_MS', 50))
+
+
+class PresenceTicker:
+    """Coalesce cursor and selection updates into one frame per room per tick
+
+    Updates only overwrite the participant's latest position; a per-room
+    background task emits everything pending as a single ``presence``
+    event every ``interval_ms``. Fan-out is then bounded by the tick rate
+    however fast people type. A room's task stops after a tick with nothing
+    to send and is restarted by the next update.
+
+    ``on_flush(room, positions)``, if given, is called with each flushed
+    batch (e.g. to persist the latest positions).
+    """
+
+    def __init__(self, socketio, interval_ms: int = PRESENCE_TICK_MS,
+                 on_flush: Optional[Callable[[str, Dict[str, Dict]], None]] = None):
+        self.socketio = socketio
+        self.interval = interval_ms / 1000
+        self.on_flush = on_flush
+        self._pending: Dict[str, Dict[str, Dict]] = {}
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def update(self, room: str, user_id: str, cursor_position: Optional[Dict] = None,
+               selection: Optional[Dict] = None) -> None:
+        """Record a participant's latest cursor; it goes out with the next frame"""
+        with self._lock:
+            self._pending.setdefault(room, {})[user_id] = {
+                'cursor_position': cursor_position,
+                'selection': selection
+            }
+            if room in self._running:
+                return
+            self._running.add(room)
+        self.socketio.start_background_task(self._run, room)
+
+    def remove(self, room: str, user_id: str) -> None:
+        """Drop a leaving participant's unsent position"""
+        with self._lock:
+            self._pending.get(room, {}).pop(user_id, None)
+
+    def _run(self, room: str) -> None:
+        while True:
+            self.socketio.sleep(self.interval)
+            with self._lock:
+                positions = self._pending.pop(room, None)
+                if not positions:
+                    self._running.discard(room)
+                    return
+
+            self.socketio.emit('presence', {
+                'cursors': [{'user_id': user_id, **position} for user_id, position in positions.items()],
+                'timestamp': datetime.utcnow().isoformat()
+            }, to=room)
+
+            if self.on_flush is not None:
+                try:
+                    self.on_flush(room, positions)
+                except Exception as e:
+                    logger.warning(f"Presence flush for {room} failed: {e}")
@@ -0,0 +1,269 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from utils.tokens import TokenCounter, get_token_counter
+
+# Input token budget for the code part of a prompt
+PROMPT_CODE_BUDGET = int(os.getenv('PROMPT_CODE_BUDGET', 1500))
+# Correction needs the whole file; above this it is not attempted
+PROMPT_CORRECTION_BUDGET = int(os.getenv('PROMPT_CORRECTION_BUDGET', 3000))
+PROMPT_MAX_ISSUES = int(os.getenv('PROMPT_MAX_ISSUES', 8))
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv('LLM_MAX_OUTPUT_TOKENS', 2000))
+
+INTENSITY_STYLES = {
+    'mild': 'gentle and constructive',
+    'medium': 'sarcastic but helpful',
+    'brutal': 'very sarcastic and brutally honest'
+}
+
+# Location suffixes/prefixes the analyzers put on issues
+LINE_PATTERNS = [
+    re.compile(r'\s*\(line (\d+)(?:, col \d+)?\)'),
+    re.compile(r'line (\d+), col \d+,\s*'),
+    re.compile(r'^\S+?:(\d+):\d+:\s*'),
+]
+PYLINT_ID = re.compile(r'^([CRWEF])\d{4}:')
+
+# Severity ranks: lower is more important
+CRITICAL, ERROR, WARNING, CONVENTION, INFO = range(5)
+PYLINT_SEVERITY = {'F': CRITICAL, 'E': ERROR, 'W': WARNING, 'R': CONVENTION, 'C': CONVENTION}
+
+
+@dataclass
+class Prompt:
+    system: str
+    user: str
+    max_tokens: int
+
+
+def issue_severity(issue: str) -> int:
+    """Rank an analyzer issue string by severity"""
+    match = PYLINT_ID.match(issue)
+    if match:
+        return PYLINT_SEVERITY[match.group(1)]
+
+    lowered = issue.lower()
+    if lowered.startswith(('security:', 'syntax error')) or 'parsing error' in lowered:
+        return CRITICAL
+    if ' error - ' in lowered or lowered.startswith('error'):
+        return ERROR
+    if lowered.startswith('performance:') or ' warning - ' in lowered:
+        return WARNING
+    if lowered.startswith(('limited analysis', 'analysis error')):
+        return INFO
+    return CONVENTION
+
+
+def issue_lines(issue: str) -> List[int]:
+    """Source line numbers an issue refers to, if any"""
+    return [int(m.group(1)) for pattern in LINE_PATTERNS for m in pattern.finditer(issue)]
+
+
+def rank_issues(issues: List[str], limit: int = PROMPT_MAX_ISSUES) -> List[str]:
+    """Deduplicate issues that differ only by location and order them by severity
+
+    Repeats are folded into one entry listing their lines, so the model
+    sees each distinct problem once.
+    """
+    groups: Dict[str, Tuple[int, int, List[int]]] = {}
+    for position, issue in enumerate(issues):
+        key = issue
+        for pattern in LINE_PATTERNS:
+            key = pattern.sub('', key)
+        key = key.strip()
+        if key not in groups:
+            groups[key] = (issue_severity(issue), position, [])
+        groups[key][2].extend(issue_lines(issue))
+
+    ranked = sorted(groups.items(), key=lambda item: item[1][:2])[:limit]
+
+    result = []
+    for text, (_, _, lines) in ranked:
+        if len(lines) == 1:
+            text = f"{text} (line {lines[0]})"
+        elif lines:
+            text = f"{text} (lines {', '.join(str(line) for line in sorted(set(lines))[:6])})"
+        result.append(text)
+    return result
+
+
+class PromptBuilder:
+    """Build LLM prompts that fit a token budget
+
+    Issues are deduplicated and ranked so the most severe ones survive the
+    cut. Code that exceeds the budget is trimmed to the regions around the
+    reported issues plus the top of the file, with gaps marked. Output
+    caps follow the size of what is asked for instead of a fixed number.
+    """
+
+    def __init__(self, counter: Optional[TokenCounter] = None, code_budget: int = PROMPT_CODE_BUDGET,
+                 correction_budget: int = PROMPT_CORRECTION_BUDGET, max_issues: int = PROMPT_MAX_ISSUES):
+        self._counter = counter
+        self.code_budget = code_budget
+        self.correction_budget = correction_budget
+        self.max_issues = max_issues
+
+    @property
+    def counter(self) -> TokenCounter:
+        if self._counter is None:
+            self._counter = get_token_counter()
+        return self._counter
+
+    def count(self, text: str) -> int:
+        return self.counter.count(text)
+
+    def roast(self, code: str, issues: List[str], language: str, intensity: str) -> Prompt:
+        ranked = rank_issues(issues, self.max_issues)
+        excerpt = self.fit_code(code, ranked, self.code_budget)
+        user = f"""As a {INTENSITY_STYLES.get(intensity, 'sarcastic')} code reviewer, provide feedback on this {language} code.
+
+Code:
+```{language}
+{excerpt}
+```
+
+Issues found:
+{chr(10).join(ranked) if ranked else 'No major issues found'}
+
+Provide your feedback in a humorous, roast-style format. Keep it under 3 sentences:"""
+        return Prompt(
+            system="You are a sarcastic code reviewer. Provide humorous but helpful feedback.",
+            user=user,
+            max_tokens=self.roast_tokens(ranked)
+        )
+
+    def suggestions(self, code: str, issues: List[str], language: str) -> Prompt:
+        ranked = rank_issues(issues, self.max_issues)
+        excerpt = self.fit_code(code, ranked, self.code_budget)
+        user = f"""Given this {language} code and these issues, provide 3 specific suggestions for improvement:
+
+Code:
+```{language}
+{excerpt}
+```
+
+Issues:
+{chr(10).join(ranked) if ranked else 'No major issues found'}
+
+Provide suggestions in the format:
+1. Suggestion one
+2. Suggestion two
+3. Suggestion three"""
+        return Prompt(
+            system="You are a helpful code reviewer providing constructive suggestions.",
+            user=user,
+            max_tokens=self.suggestion_tokens(ranked)
+        )
+
+    def roast_tokens(self, ranked: List[str]) -> int:
+        """Output cap for a roast: three sentences, a little longer with more issues to mock"""
+        return min(160, 80 + 10 * len(ranked))
+
+    def suggestion_tokens(self, ranked: List[str]) -> int:
+        """Output cap for three suggestions, each about as long as the issue it addresses"""
+        return min(400, max(150, 120 + self.count('\n'.join(ranked[:3]))))
+
+    def correction(self, code: str, issues: List[str], language: str) -> Optional[Prompt]:
+        """Correction prompt, or None when the code is too large to rewrite whole"""
+        code_tokens = self.count(code)
+        if code_tokens > self.correction_budget:
+            return None
+
+        ranked = rank_issues(issues, self.max_issues)
+        user = f"""Correct this {language} code by fixing the following issues:
+
+Issues to fix:
+{chr(10).join(ranked[:5])}
+
+Original code:
+```{language}
+{code}
+```
+
+Provide only the corrected code without any explanations:"""
+        return Prompt(
+            system="You are a code correction assistant.",
+            user=user,
+            # Room for the whole file plus some growth from the fixes
+            max_tokens=min(LLM_MAX_OUTPUT_TOKENS, max(256, int(code_tokens * 1.3) + 64))
+        )
+
+    def review(self, code: str, issues: List[str], language: str, intensity: str) -> Tuple[Prompt, bool]:
+        """Single prompt asking for roast, suggestions and correction as one JSON object
+
+        Returns the prompt and whether it asks for the corrected code, which
+        is left out when the code is too large to rewrite whole.
+        """
+        ranked = rank_issues(issues, self.max_issues)
+        code_tokens = self.count(code)
+        with_correction = code_tokens <= self.correction_budget
+        excerpt = code if with_correction else self.fit_code(code, ranked, self.code_budget)
+
+        fields = [
+            f'"roast": a {INTENSITY_STYLES.get(intensity, "sarcastic")}, humorous roast of the code in under 3 sentences',
+            '"suggestions": an array of 3 specific suggestions for improvement, as strings'
+        ]
+        max_tokens = self.roast_tokens(ranked) + self.suggestion_tokens(ranked)
+        if with_correction:
+            fields.append('"corrected_code": the full code with the issues fixed, as a string without markdown')
+            max_tokens += max(256, int(code_tokens * 1.3) + 64)
+
+        user = f"""Review this {language} code.
+
+Code:
+```{language}
+{excerpt}
+```
+
+Issues found:
+{chr(10).join(ranked) if ranked else 'No major issues found'}
+
+Respond with only a JSON object with these keys:
+{chr(10).join(f'- {field}' for field in fields)}"""
+        return Prompt(
+            system="You are a sarcastic but helpful code reviewer. You always answer with valid JSON.",
+            user=user,
+            max_tokens=min(LLM_MAX_OUTPUT_TOKENS, max_tokens)
+        ), with_correction
+
+    def fit_code(self, code: str, issues: List[str], budget: int) -> str:
+        """Return code unchanged if it fits, else an excerpt that does"""
+        if self.count(code) <= budget:
+            return code
+
+        lines = code.splitlines()
+        costs = [self.count(line) + 1 for line in lines]
+
+        keep = set()
+        spent = 0
+
+        # Windows around the (1-based) lines issues point at come first
+        for issue in issues:
+            for line in issue_lines(issue):
+                window = [i for i in range(line - 3, line + 2) if 0 <= i < len(lines) and i not in keep]
+                cost = sum(costs[i] for i in window)
+                if spent + cost <= budget:
+                    keep.update(window)
+                    spent += cost
+
+        # Then as much of the top of the file as still fits
+        for index in range(len(lines)):
+            if index in keep:
+                continue
+            if spent + costs[index] > budget:
+                break
+            keep.add(index)
+            spent += costs[index]
+
+        excerpt = []
+        previous = -1
+        for index in sorted(keep):
+            if index != previous + 1:
+                excerpt.append(f"... ({index - previous - 1} lines omitted) ...")
+            excerpt.append(lines[index])
+            previous = index
+        if previous < len(lines) - 1:
+            excerpt.append(f"... ({len(lines) - previous - 1} lines omitted) ...")
+        return '\n'.join(excerpt)
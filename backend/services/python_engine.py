@@ -0,0 +1,117 @@
+import ast
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from radon.metrics import h_visit_ast, mi_compute
+from radon.raw import analyze
+from radon.visitors import ComplexityVisitor
+
+Rule = Callable[[ast.AST, List[str]], None]
+
+
+def _check_docstring(node: ast.AST, issues: List[str]) -> None:
+    if not ast.get_docstring(node):
+        issues.append(f"No docstring for {node.__class__.__name__.lower()} '{getattr(node, 'name', 'module')}'")
+
+
+def _check_single_letter_name(node: ast.Name, issues: List[str]) -> None:
+    if isinstance(node.ctx, ast.Store) and len(node.id) == 1 and node.id.isalpha():
+        issues.append(f"Single-letter variable name '{node.id}'")
+
+
+def _check_long_function(node: ast.FunctionDef, issues: List[str]) -> None:
+    body_lines = len(node.body)
+    if body_lines > 50:
+        issues.append(f"Overly long function '{node.name}' ({body_lines} lines)")
+
+
+def _is_string_piece(node: ast.AST) -> bool:
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, (str, bytes))
+    if isinstance(node, ast.Call):
+        return isinstance(node.func, ast.Name) and node.func.id == 'str'
+    return isinstance(node, ast.JoinedStr)
+
+
+def _loop_statements(nodes: Iterable[ast.AST]) -> Iterator[ast.AST]:
+    """Nodes in a loop's body, leaving out nested loops (they check themselves) and scopes"""
+    for node in nodes:
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While, ast.FunctionDef,
+                             ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        yield node
+        yield from _loop_statements(ast.iter_child_nodes(node))
+
+
+def _check_string_concat_in_loop(node: ast.AST, issues: List[str]) -> None:
+    for child in _loop_statements(node.body):
+        if isinstance(child, ast.AugAssign) and isinstance(child.op, ast.Add) and _is_string_piece(child.value):
+            issues.append("Performance: String built with += inside a loop; use str.join() instead "
+                          f"(line {child.lineno}, col {child.col_offset + 1})")
+
+
+# AST rules keyed by the node type they inspect
+DEFAULT_RULES: Dict[type, List[Rule]] = {
+    ast.Module: [_check_docstring],
+    ast.ClassDef: [_check_docstring],
+    ast.FunctionDef: [_check_docstring, _check_long_function],
+    ast.Name: [_check_single_letter_name],
+    ast.For: [_check_string_concat_in_loop],
+    ast.AsyncFor: [_check_string_concat_in_loop],
+    ast.While: [_check_string_concat_in_loop],
+}
+
+
+class PythonAnalysisEngine:
+    """Single-parse Python analysis engine
+
+    The source is parsed once, and every AST rule runs in a single walk of
+    that tree, dispatched by node type. The radon complexity and Halstead
+    metrics reuse the tree rather than re-parsing, but their visitors still
+    walk it separately, and radon's raw metrics tokenize the source on their
+    own. That is three tree walks and one tokenize per analysis.
+    """
+
+    def __init__(self, rules: Optional[Dict[type, List[Rule]]] = None):
+        self.rules = rules or DEFAULT_RULES
+
+    def analyze(self, code: str) -> Dict[str, Any]:
+        """Parse and analyze code, returning its AST issues and metrics
+
+        Raises ``SyntaxError`` if the code cannot be parsed.
+        """
+        tree = ast.parse(code)
+        raw = analyze(code)
+        complexity = ComplexityVisitor.from_ast(tree)
+        blocks = complexity.blocks
+
+        metrics = {
+            'line_count': len(code.splitlines()),
+            'character_count': len(code),
+            'cyclomatic_complexity': max([block.complexity for block in blocks] + [0]),
+            'function_count': len(blocks),
+            'maintainability_index': self._maintainability_index(tree, raw, complexity),
+            'comment_lines': raw.comments,
+            'blank_lines': raw.blank,
+            'code_lines': raw.loc,
+        }
+
+        issues = []
+        for node in ast.walk(tree):
+            for rule in self.rules.get(type(node), ()):
+                rule(node, issues)
+
+        return {
+            'issues': issues,
+            'metrics': metrics
+        }
+
+    def _maintainability_index(self, tree: ast.AST, raw, complexity: ComplexityVisitor) -> float:
+        """Same result as ``radon.metrics.mi_visit(code, multi=True)`` without re-parsing"""
+        comment_lines = raw.comments + raw.multi
+        comments = comment_lines / float(raw.sloc) * 100 if raw.sloc != 0 else 0
+        return mi_compute(
+            h_visit_ast(tree).total.volume,
+            complexity.total_complexity,
+            raw.lloc,
+            comments
+        )
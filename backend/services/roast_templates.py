@@ -0,0 +1,119 @@
+import json
+import random
+import re
+import string
+from typing import Dict, List, Optional, Tuple
+
+# Issue patterns per template category, most specific first. Named groups
+# inside a pattern become template fields (category prefix stripped).
+CATEGORY_PATTERNS = [
+    ('no_docstring',
+     r"No docstring for \w+ '(?P<no_docstring__name>[^']*)'"
+     r"|C011[456]: Missing (?:\w+ )?docstring"),
+    ('single_letter_var',
+     r"Single-letter variable name '(?P<single_letter_var__name>[^']*)'"),
+    ('generic_var',
+     r"C010[34]: [^\"]*\"(?P<generic_var__name>[^\"]+)\""),
+    ('long_function',
+     r"Overly long function '(?P<long_function__name>[^']*)'"
+     r"|R0915: Too many statements"),
+    ('excessive_nesting',
+     r"R1702: Too many nested blocks \((?P<excessive_nesting__depth>\d+)/"
+     r"|Blocks are nested too deeply \((?P<excessive_nesting__depth2>\d+)\)"),
+    ('high_complexity',
+     r"R0912: Too many branches \((?P<high_complexity__score>\d+)/"
+     r"|'(?P<high_complexity__name>[^']*)' is too complex\. The McCabe rating is (?P<high_complexity__score2>\d+)"
+     r"|has a complexity of (?P<high_complexity__score3>\d+)"),
+    ('low_maintainability',
+     r"[Mm]aintainability index (?P<low_maintainability__score>[\d.]+)"),
+    ('pylint',
+     r"[CRWEF]\d{4}: "),
+]
+
+# Values for fields an issue did not supply
+FIELD_DEFAULTS = {
+    'name': 'this code',
+    'depth': 'several',
+    'score': 'high',
+}
+
+
+def _compile_template(template: str) -> Tuple[str, Tuple[str, ...]]:
+    """Turn a ``str.format`` template into a %-format string and its field order"""
+    parts = []
+    fields = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        parts.append(literal.replace('%', '%%'))
+        if field is not None:
+            parts.append('%s')
+            fields.append(field)
+    return ''.join(parts), tuple(fields)
+
+
+class TemplateRoaster:
+    """Issue-aware roasts from precompiled templates
+
+    The fallback roast when no LLM answers, so it is built to be cheap:
+    templates are compiled once into %-format strings indexed by category
+    and intensity, and issues are classified with one combined regex. A
+    roast is then a dict lookup, a ``random.choice`` and a single %-format.
+    """
+
+    def __init__(self, path: str = 'ml_models/roast_templates.json'):
+        with open(path, 'r') as f:
+            raw = json.load(f)
+
+        self.templates: Dict[Tuple[str, str], List[Tuple[str, Tuple[str, ...]]]] = {
+            (category, intensity): [_compile_template(t) for t in templates]
+            for category, by_intensity in raw.items()
+            for intensity, templates in by_intensity.items()
+            if templates
+        }
+
+        categories = [(c, p) for c, p in CATEGORY_PATTERNS if any(key[0] == c for key in self.templates)]
+        self.classifier = re.compile('|'.join(f"(?P<{c}>{p})" for c, p in categories))
+        self.priority = {category: rank for rank, (category, _) in enumerate(categories)}
+
+        # Field groups of each category, resolved once instead of per match
+        self.category_fields: Dict[str, List[Tuple[str, str]]] = {category: [] for category, _ in categories}
+        for group in self.classifier.groupindex:
+            if '__' in group:
+                category, field = group.split('__', 1)
+                self.category_fields[category].append((group, field.rstrip('0123456789')))
+
+    def classify(self, issue: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Category of an issue and the template fields it supplies"""
+        match = self.classifier.search(issue)
+        if match is None:
+            return None
+        category = match.lastgroup
+        fields = {'issue': issue}
+        for group, field in self.category_fields[category]:
+            value = match.group(group)
+            if value is not None:
+                fields[field] = value
+        return category, fields
+
+    def roast(self, issues: List[str], intensity: str) -> str:
+        """Roast the most specific issue found, or the code in general"""
+        best = None
+        for issue in issues:
+            classified = self.classify(issue)
+            if classified is None or (classified[0], intensity) not in self.templates:
+                continue
+            if best is None or self.priority[classified[0]] < self.priority[best[0]]:
+                best = classified
+                if self.priority[best[0]] == 0:
+                    break
+
+        if best is None:
+            # Unclassified issues get the generic issue templates
+            best = ('pylint', {'issue': issues[0]}) if issues else ('general', {})
+            if (best[0], intensity) not in self.templates:
+                if issues:
+                    return f"Found {len(issues)} issues that need fixing."
+                return "Your code is surprisingly decent. I'm almost disappointed."
+
+        fmt, names = random.choice(self.templates[(best[0], intensity)])
+        values = best[1]
+        return fmt % tuple(values.get(name) or FIELD_DEFAULTS.get(name, 'something') for name in names)
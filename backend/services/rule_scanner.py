@@ -0,0 +1,220 @@
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RULES_DIR = os.getenv('RULES_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rules'))
+
+# Comments and string literals per lexer family, used to mask them out
+_STRING_C = r"'(?:\\.|[^'\\\n])*'|\"(?:\\.|[^\"\\\n])*\""
+LEXERS = {
+    'python': re.compile(
+        r"(?P<comment>#[^\n]*)"
+        r"|(?P<string>[rRbBuUfF]{0,2}(?:'''[\s\S]*?'''|\"\"\"[\s\S]*?\"\"\"|" + _STRING_C + r"))"
+    ),
+    'c': re.compile(
+        r"(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)"
+        r"|(?P<string>" + _STRING_C + r")"
+    ),
+    'javascript': re.compile(
+        r"(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)"
+        r"|(?P<string>" + _STRING_C + r"|`(?:\\.|[^`\\])*`)"
+    ),
+}
+
+_NOT_NEWLINE = re.compile(r"[^\n]")
+_NOT_QUOTE_OR_NEWLINE = re.compile(r"[^'\"`\n]")
+
+
+def _blank(match: 're.Match') -> str:
+    """Blank out a comment, or a string's contents (its quotes are kept)"""
+    if match.lastgroup == 'comment':
+        return _NOT_NEWLINE.sub(' ', match.group())
+    return _NOT_QUOTE_OR_NEWLINE.sub(' ', match.group())
+
+
+def _rule_pattern(rule: Dict) -> str:
+    if 'token' in rule:
+        token = re.escape(rule['token'])
+        # Identifier-like tokens must not match inside longer names (literal_eval, obj.eval)
+        return r"(?<![\w.])" + token if rule['token'][:1].isidentifier() else token
+    return rule['regex']
+
+
+def _hit(match: 're.Match') -> Tuple[int, str]:
+    """Offset and text of a match, narrowed to its ``at`` group when the rule has one"""
+    if 'at' in match.re.groupindex and match.group('at') is not None:
+        return match.start('at'), match.group('at')
+    return match.start(), match.group()
+
+
+def _rule_anchors(rule: Dict) -> List[str]:
+    """Literals at least one of which occurs wherever the rule can match"""
+    if 'token' in rule:
+        return [rule['token']]
+    return rule.get('anchors', [])
+
+
+def _literal_trie(literals: List[str]) -> str:
+    """Regex matching any of the literals, factored into a prefix trie
+
+    A plain alternation retries every literal at every position; the trie
+    shares prefixes, so matching cost depends on literal length rather than
+    on how many literals there are.
+    """
+    trie: Dict = {}
+    for literal in literals:
+        node = trie
+        for char in literal.lower():
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node: Dict) -> str:
+        terminal = '' in node
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            body = '(?:' + body + ')?'
+        return body
+
+    return emit(trie)
+
+
+class _ScanPlan:
+    """Compiled rules for one scan mode (masked or raw source)"""
+
+    def __init__(self, rules: List[Dict], indexes: List[int]):
+        self.rules = rules
+        self.by_anchor: Dict[str, List[int]] = {}
+        unanchored = []
+        for i in indexes:
+            anchors = _rule_anchors(rules[i])
+            if not anchors:
+                unanchored.append(i)
+            for anchor in anchors:
+                self.by_anchor.setdefault(anchor.lower(), []).append(i)
+
+        # A lookahead finds an anchor at every position, so occurrences that
+        # overlap another anchor's are not consumed by it
+        self.prefilter = re.compile(
+            '(?=(' + _literal_trie(list(self.by_anchor)) + '))', re.IGNORECASE
+        ) if self.by_anchor else None
+        self.confirm = {i: re.compile(_rule_pattern(rules[i]), re.MULTILINE) for i in indexes}
+        # Rules without anchors can only be found by a full alternation pass
+        self.fallback = re.compile(
+            '|'.join(f"(?P<r{i}>{_rule_pattern(rules[i]).replace('(?P<at>', '(?:')})" for i in unanchored),
+            re.MULTILINE
+        ) if unanchored else None
+
+    def matches(self, text: str, line_starts: List[int]) -> Iterator[Tuple[int, int, str]]:
+        """Yield ``(rule_index, offset)`` for every rule hit in text"""
+        if self.prefilter is not None:
+            candidates = set()
+            for match in self.prefilter.finditer(text):
+                line = bisect.bisect_right(line_starts, match.start()) - 1
+                # The trie yields the longest anchor here; shorter ones that
+                # are prefixes of it occur here too
+                found = match.group(1).lower()
+                for length in range(1, len(found) + 1):
+                    for i in self.by_anchor.get(found[:length], ()):
+                        candidates.add((line, i))
+
+            for line, i in sorted(candidates):
+                end = line_starts[line + 1] if line + 1 < len(line_starts) else len(text)
+                for match in self.confirm[i].finditer(text, line_starts[line], end):
+                    yield (i, *_hit(match))
+
+        if self.fallback is not None:
+            for match in self.fallback.finditer(text):
+                i = int(match.lastgroup[1:])
+                # The alternation cannot hold several ``at`` groups; re-match for the position
+                yield (i, *_hit(self.confirm[i].match(text, match.start())))
+
+
+class RuleScanner:
+    """Multi-pattern scanner for a language's token and regex rules
+
+    Every rule names literal anchors (a token rule is its own anchor). All
+    anchors are compiled into one trie-shaped regex, so the code is walked
+    once whatever the number of rules, and a rule's full pattern only runs
+    on the lines where one of its anchors occurs. Rules without anchors
+    still work but are scanned by a plain alternation.
+
+    Rules scan the code with comments and string contents blanked out
+    unless they set ``"code_only": false`` (e.g. to find hardcoded secrets,
+    which live in strings). Masking preserves offsets, so line and column
+    are exact in both modes. Rules match within a single line. A rule whose
+    regex has a ``(?P<at>...)`` group reports that group's position rather
+    than the start of the whole match (e.g. when it is anchored at ``^``).
+    """
+
+    def __init__(self, rules: List[Dict], lexer: Optional[str] = None):
+        self.rules = rules
+        self.lexer = LEXERS.get(lexer) if lexer else None
+        masked = [i for i, r in enumerate(rules) if r.get('code_only', True) and self.lexer]
+        raw = [i for i, r in enumerate(rules) if not (r.get('code_only', True) and self.lexer)]
+        self.masked = _ScanPlan(rules, masked) if masked else None
+        self.raw = _ScanPlan(rules, raw) if raw else None
+
+    @classmethod
+    def from_pack(cls, language: str, rules_dir: str = RULES_DIR) -> 'RuleScanner':
+        """Load ``<rules_dir>/<language>.json``; an unknown language has no rules"""
+        try:
+            with open(os.path.join(rules_dir, f"{language}.json")) as f:
+                pack = json.load(f)
+        except FileNotFoundError:
+            return cls([])
+        return cls(pack.get('rules', []), pack.get('lexer'))
+
+    def scan(self, code: str) -> List[Dict]:
+        """All rule hits in source order, with 1-based line and column"""
+        if self.masked is None and self.raw is None:
+            return []
+
+        line_starts = [0] + [m.end() for m in re.finditer('\n', code)]
+        seen = set()
+        hits = []
+        for plan, text in ((self.masked, self.lexer.sub(_blank, code) if self.masked else None),
+                           (self.raw, code)):
+            if plan is None:
+                continue
+            for i, offset, matched in plan.matches(text, line_starts):
+                # Report the first non-blank character of the hit
+                start = offset + len(matched) - len(matched.lstrip())
+                if (i, start) in seen:
+                    continue
+                seen.add((i, start))
+                rule = self.rules[i]
+                line = bisect.bisect_right(line_starts, start)
+                hits.append({
+                    'id': rule['id'],
+                    'category': rule['category'],
+                    'message': rule['message'],
+                    'line': line,
+                    'column': start - line_starts[line - 1] + 1,
+                })
+
+        hits.sort(key=lambda hit: (hit['line'], hit['column']))
+        return hits
+
+
+_scanners: Dict[str, RuleScanner] = {}
+_scanners_lock = threading.Lock()
+
+
+def get_rule_scanner(language: str) -> RuleScanner:
+    """Get the compiled scanner for a language's rule pack, loading it on first use"""
+    scanner = _scanners.get(language)
+    if scanner is None:
+        with _scanners_lock:
+            scanner = _scanners.get(language)
+            if scanner is None:
+                scanner = _scanners[language] = RuleScanner.from_pack(language)
+    return scanner
@@ -0,0 +1,95 @@
+import base64
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from typing import Optional, Union
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def audio_digest(text: str, voice: str, intensity: str) -> str:
+    """Content address for a rendered roast: same text, voice and intensity -> same blob"""
+    digest = hashlib.sha256()
+    for part in (text, voice, intensity):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def render_key(digest: str) -> str:
+    """Single-flight key for rendering a blob, kept apart from the blob's own ``audio:`` key"""
+    return f"tts:{digest}"
+
+
+class AudioStore:
+    """Content-addressed store for generated audio blobs
+
+    Blobs live on local disk when ``directory`` (or ``AUDIO_STORE_DIR``) is
+    set, otherwise in Redis under ``audio:<digest>`` with a TTL. Analysis
+    results carry only the blob's URL, so cached results stay small and
+    audio is only transferred when a client actually plays it.
+    """
+
+    def __init__(self, redis_client=None, directory: Optional[str] = None, ttl: Optional[int] = None):
+        self.redis = redis_client
+        self.directory = directory or os.getenv('AUDIO_STORE_DIR')
+        self.ttl = ttl or int(os.getenv('AUDIO_TTL', 7 * 24 * 3600))
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def url_for(digest: str) -> str:
+        return f"/api/audio/{digest}"
+
+    def put(self, digest: str, audio: Union[bytes, str]) -> None:
+        """Store a blob; base64 strings are decoded to raw bytes first"""
+        if isinstance(audio, str):
+            audio = base64.b64decode(audio)
+
+        if self.directory:
+            path = self._path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see partial blobs
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(temp_path, path)
+        else:
+            try:
+                self.redis.set(f"audio:{digest}", audio, ex=self.ttl)
+            except redis.RedisError as e:
+                logger.warning(f"Audio store write failed for {digest}: {e}")
+
+    def get(self, digest: str) -> Optional[bytes]:
+        if not DIGEST_RE.match(digest):
+            return None
+
+        if self.directory:
+            try:
+                with open(self._path(digest), 'rb') as f:
+                    return f.read()
+            except FileNotFoundError:
+                return None
+
+        try:
+            return self.redis.get(f"audio:{digest}")
+        except redis.RedisError as e:
+            logger.warning(f"Audio store read failed for {digest}: {e}")
+            return None
+
+    def exists(self, digest: str) -> bool:
+        if self.directory:
+            return os.path.exists(self._path(digest))
+        try:
+            return bool(self.redis.exists(f"audio:{digest}"))
+        except redis.RedisError:
+            return False
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
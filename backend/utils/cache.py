@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_code(code: str) -> str:
+    """Normalize line endings so the same snippet hashes identically on every platform"""
+    return code.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def content_key(prefix: str, code: str, *parts: Any) -> str:
+    """Build a stable, content-addressed cache key
+
+    Unlike ``hash()``, which is salted per process, a SHA-256 digest is the
+    same in every gunicorn worker and survives restarts.
+    """
+    digest = hashlib.sha256()
+    digest.update(normalize_code(code).encode('utf-8'))
+    for part in parts:
+        digest.update(b'\x00')
+        digest.update(str(part).encode('utf-8'))
+    return f"{prefix}:{digest.hexdigest()}"
+
+
+class LRUCache:
+    """Bounded, thread-safe in-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheManager:
+    """Two-tier cache: an in-process LRU (L1) in front of Redis (L2)
+
+    Values are JSON-serialized in Redis. L1 hands back the stored object
+    itself, so callers must treat cached values as read-only.
+    """
+
+    def __init__(self, redis_client, local_max_entries: Optional[int] = None,
+                 local_ttl: Optional[float] = None):
+        self.redis = redis_client
+        self.local = LRUCache(
+            max_entries=local_max_entries or int(os.getenv('CACHE_L1_MAX_ENTRIES', 1024)),
+            default_ttl=local_ttl or float(os.getenv('CACHE_L1_TTL', 300))
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value from L1, falling back to Redis on a miss"""
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        try:
+            raw = self.redis.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+            return None
+
+        if raw is None:
+            return None
+
+        value = json.loads(raw)
+        self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any, ttl: int = 3600) -> None:
+        """Store a value in both tiers"""
+        self.local.set(key, value, ttl=min(ttl, self.local.default_ttl))
+        try:
+            self.redis.set(key, json.dumps(value), ex=ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Cache write failed for {key}: {e}")
+
+    def delete(self, key: str) -> None:
+        """Remove a value from both tiers"""
+        self.local.delete(key)
+        try:
+            self.redis.delete(key)
+        except redis.RedisError as e:
+            logger.warning(f"Cache delete failed for {key}: {e}")
+
+    def cached_stage(self, key: Union[str, Callable[[Dict[str, Any]], str]],
+                     func: Callable[[Dict[str, Any]], Awaitable[Any]],
+                     ttl: int = 3600) -> Callable[[Dict[str, Any]], Awaitable[Any]]:
+        """Wrap an async pipeline stage so its result is served from and stored in the cache
+
+        ``key`` may be a callable that builds the key from the stage's
+        dependency results, for stages whose inputs are only known at run time.
+        """
+        async def run(deps: Dict[str, Any]) -> Any:
+            stage_key = key(deps) if callable(key) else key
+            cached = self.get(stage_key)
+            if cached is not None:
+                return cached
+            result = await func(deps)
+            self.set(stage_key, result, ttl=ttl)
+            return result
+
+        return run
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterator, Tuple
+
+
+def iterate_async(async_iterable: AsyncIterable) -> Iterator:
+    """Drive an async iterable from synchronous code, e.g. a streaming Flask response
+
+    A private event loop is created for the lifetime of the iteration.
+    """
+    loop = asyncio.new_event_loop()
+    iterator = async_iterable.__aiter__()
+    try:
+        while True:
+            try:
+                item = loop.run_until_complete(iterator.__anext__())
+            except StopAsyncIteration:
+                break
+            yield item
+    finally:
+        try:
+            # If the consumer stopped early, close the iterator inside the loop
+            # and cancel whatever work it left behind before closing the loop
+            if hasattr(iterator, 'aclose'):
+                loop.run_until_complete(iterator.aclose())
+            leftover = asyncio.all_tasks(loop)
+            for task in leftover:
+                task.cancel()
+            if leftover:
+                loop.run_until_complete(asyncio.gather(*leftover, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+
+async def interleave(source: AsyncIterable[Tuple[str, Any]],
+                     queue: asyncio.Queue) -> AsyncIterator[Tuple[str, Any]]:
+    """Yield ``(name, value)`` items from source, mixed with items pushed onto queue
+
+    Lets callbacks running inside the source (e.g. per-token callbacks)
+    emit events between the source's own items. Ends when the source ends;
+    an error in the source is raised here.
+    """
+    done = object()
+    failure = []
+
+    async def pump():
+        try:
+            async for item in source:
+                queue.put_nowait(item)
+        except Exception as e:
+            failure.append(e)
+        finally:
+            queue.put_nowait(done)
+
+    task = asyncio.ensure_future(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            yield item
+        if failure:
+            raise failure[0]
+    finally:
+        task.cancel()
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format a server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,63 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRegistry:
+    """Named factories whose products are built on first use
+
+    Heavy analyzers and model backends register a factory here instead of
+    being imported or constructed at module import time. Each entry is built
+    exactly once, either the first time it is requested or during an
+    explicit ``warmup()``.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        """Return the named entry, building it if this is the first request"""
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Nothing registered under '{name}'")
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                logger.info(f"Loaded '{name}' in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return self._instances[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def loaded(self) -> List[str]:
+        return list(self._instances)
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Build entries ahead of time; returns load time in seconds per entry
+
+        Entries whose factory fails are logged and skipped, so they are
+        retried on first use.
+        """
+        timings = {}
+        for name in names or list(self._factories):
+            start = time.perf_counter()
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning(f"Warmup of '{name}' failed: {e}")
+                continue
+            timings[name] = time.perf_counter() - start
+        return timings
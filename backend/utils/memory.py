@@ -0,0 +1,39 @@
+import os
+import resource
+from typing import Dict, Union
+
+# smaps_rollup fields reported, in the order they appear in the kernel output
+SMAPS_FIELDS = {
+    'Rss': 'rss_mb',
+    'Pss': 'pss_mb',
+    'Shared_Clean': 'shared_clean_mb',
+    'Shared_Dirty': 'shared_dirty_mb',
+    'Private_Clean': 'private_clean_mb',
+    'Private_Dirty': 'private_dirty_mb',
+    'Swap': 'swap_mb',
+}
+
+
+def process_memory(pid: Union[int, str] = 'self') -> Dict[str, float]:
+    """Memory breakdown of a process in MB
+
+    ``rss_mb`` counts shared pages in full for every process, so it
+    overstates the real cost of forked workers. ``pss_mb`` splits shared
+    pages among the processes mapping them, and ``uss_mb`` is the memory
+    that would be freed if this process exited. Falls back to peak RSS on
+    platforms without ``/proc/<pid>/smaps_rollup``.
+    """
+    report = {'pid': os.getpid() if pid == 'self' else int(pid)}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0].rstrip(':') in SMAPS_FIELDS:
+                    report[SMAPS_FIELDS[parts[0].rstrip(':')]] = round(int(parts[1]) / 1024, 1)
+    except OSError:
+        if pid == 'self':
+            report['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        return report
+
+    report['uss_mb'] = round(report.get('private_clean_mb', 0) + report.get('private_dirty_mb', 0), 1)
+    return report
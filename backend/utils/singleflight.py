@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Delete / extend the lease only if we still hold it
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Cached in place of a None result, which the cache itself reads as a miss
+EMPTY_RESULT = {'__singleflight__': 'empty'}
+
+
+class SingleFlight:
+    """Coalesce identical in-flight computations across workers
+
+    The first caller to miss the cache takes a Redis lease on the key and
+    computes the value (the leader). Concurrent callers with the same key
+    wait for the leader's result to appear in the cache instead of
+    recomputing it.
+
+    The leader renews its lease while it works. If the leader dies, the
+    lease expires after ``lease_ttl`` seconds. If it fails, it releases the
+    lease straight away. In both cases a waiting follower takes over as the
+    new leader. A follower that waits longer than ``wait_timeout`` computes
+    the value itself.
+
+    A ``None`` result is published as a marker kept for at most
+    ``empty_ttl`` seconds, so followers see it instead of recomputing, and a
+    transient failure (e.g. no audio from TTS) is retried soon after.
+    """
+
+    def __init__(self, redis_client, cache_manager, lease_ttl: Optional[float] = None,
+                 wait_timeout: Optional[float] = None, poll_interval: float = 0.05,
+                 max_poll_interval: float = 0.5, empty_ttl: int = 60):
+        self.redis = redis_client
+        self.cache = cache_manager
+        self.lease_ttl = lease_ttl or float(os.getenv('SINGLEFLIGHT_LEASE_TTL', 30))
+        self.wait_timeout = wait_timeout or float(os.getenv('SINGLEFLIGHT_WAIT_TIMEOUT', 90))
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.empty_ttl = empty_ttl
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]], ttl: int = 3600) -> Any:
+        """Return the cached value for key, computing it at most once across workers"""
+        found, cached = self._lookup(key)
+        if found:
+            return cached
+
+        lease_key = f"lease:{key}"
+        deadline = time.monotonic() + self.wait_timeout
+        interval = self.poll_interval
+
+        while True:
+            token = self._acquire(lease_key)
+            if token is not None:
+                return await self._lead(key, lease_key, token, func, ttl)
+
+            # Someone else is computing it; wait for their result
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+
+            found, cached = self._lookup(key)
+            if found:
+                return cached
+
+            if time.monotonic() > deadline:
+                logger.warning(f"Timed out waiting for in-flight {key}; computing it locally")
+                result = await func()
+                self._store(key, result, ttl)
+                return result
+
+    def stage(self, key: Union[str, Callable[[Dict[str, Any]], str]],
+              func: Callable[[Dict[str, Any]], Awaitable[Any]],
+              ttl: int = 3600) -> Callable[[Dict[str, Any]], Awaitable[Any]]:
+        """Wrap an async pipeline stage so its result is cached and computed at most once
+
+        The single-flight counterpart of ``CacheManager.cached_stage``.
+        """
+        async def run(deps: Dict[str, Any]) -> Any:
+            stage_key = key(deps) if callable(key) else key
+            return await self.do(stage_key, lambda: func(deps), ttl=ttl)
+
+        return run
+
+    async def _lead(self, key: str, lease_key: str, token: str,
+                    func: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+        renewer = asyncio.ensure_future(self._renew(lease_key, token))
+        try:
+            result = await func()
+            self._store(key, result, ttl)
+            return result
+        finally:
+            renewer.cancel()
+            self._release(lease_key, token)
+
+    def _lookup(self, key: str) -> Tuple[bool, Any]:
+        """(found, value) for key; a cached empty marker is found with value None"""
+        cached = self.cache.get(key)
+        if cached is None:
+            return False, None
+        if cached == EMPTY_RESULT:
+            return True, None
+        return True, cached
+
+    def _store(self, key: str, result: Any, ttl: int) -> None:
+        if result is None:
+            self.cache.set(key, EMPTY_RESULT, ttl=min(ttl, self.empty_ttl))
+        else:
+            self.cache.set(key, result, ttl=ttl)
+
+    def _acquire(self, lease_key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        try:
+            if self.redis.set(lease_key, token, nx=True, px=int(self.lease_ttl * 1000)):
+                return token
+            return None
+        except redis.RedisError as e:
+            # Without Redis we cannot coordinate; just compute locally
+            logger.warning(f"Lease acquire failed for {lease_key}: {e}")
+            return token
+
+    def _release(self, lease_key: str, token: str) -> None:
+        try:
+            self.redis.eval(RELEASE_SCRIPT, 1, lease_key, token)
+        except redis.RedisError as e:
+            logger.warning(f"Lease release failed for {lease_key}: {e}")
+
+    async def _renew(self, lease_key: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                self.redis.eval(RENEW_SCRIPT, 1, lease_key, token, int(self.lease_ttl * 1000))
+            except redis.RedisError as e:
+                logger.warning(f"Lease renewal failed for {lease_key}: {e}")
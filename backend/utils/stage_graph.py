@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+StageFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class Stage:
+    """A named unit of work with explicit dependencies"""
+
+    def __init__(self, name: str, func: StageFunc, depends_on: Optional[List[str]] = None):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on or [])
+
+
+class StageGraph:
+    """Run async stages concurrently, respecting their dependencies
+
+    Every stage receives a dict with the results of the stages it depends on.
+    Stages without unmet dependencies start immediately, so independent work
+    (e.g. several LLM round trips) overlaps and the total wall time is bounded
+    by the slowest dependency chain instead of the sum of all stages.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: StageFunc, depends_on: Optional[List[str]] = None) -> 'StageGraph':
+        """Register a stage; dependencies must already be registered"""
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' already registered")
+        for dependency in depends_on or []:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = Stage(name, func, depends_on)
+        return self
+
+    def _start(self, results: Dict[str, Any]) -> Dict[str, asyncio.Task]:
+        """Schedule every stage not already present in ``results``"""
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> Any:
+            if stage.depends_on:
+                await asyncio.gather(*(tasks[dep] for dep in stage.depends_on if dep in tasks))
+            inputs = {dep: results[dep] for dep in stage.depends_on}
+            results[stage.name] = await stage.func(inputs)
+            return results[stage.name]
+
+        # Stages are registered in topological order, so every dependency
+        # task exists before the tasks waiting on it are created.
+        for name, stage in self.stages.items():
+            if name in results:
+                continue
+            tasks[name] = asyncio.ensure_future(run_stage(stage))
+
+        return tasks
+
+    async def run(self, initial: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run all stages and return their results keyed by stage name"""
+        results: Dict[str, Any] = dict(initial or {})
+        tasks = self._start(results)
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        return results
+
+    async def stream(self, initial: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """Run all stages, yielding ``(name, result)`` as each one completes"""
+        results: Dict[str, Any] = dict(initial or {})
+        tasks = self._start(results)
+        names = {task: name for name, task in tasks.items()}
+        pending = set(tasks.values())
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield names[task], task.result()
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,66 @@
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_DIR = os.getenv('TOKENIZER_DIR', 'ml_models/fine_tuned_distilgpt2')
+
+# Rough characters-per-token for code when no tokenizer is available
+CHARS_PER_TOKEN = 3.5
+
+
+class TokenCounter:
+    """Count prompt tokens with the best local tokenizer available
+
+    Tries tiktoken's ``cl100k_base`` (OpenAI's encoding), then the GPT-2
+    byte-level BPE shipped with the local model (vocab.json/merges.txt),
+    and finally a character-based estimate.
+
+    tiktoken is optional and not in requirements.txt. When it is installed
+    it downloads the encoding on first use unless it is already cached;
+    point ``TIKTOKEN_CACHE_DIR`` at a pre-fetched copy to stay offline. If
+    the download fails, the next tokenizer is used.
+    """
+
+    def __init__(self, tokenizer_dir: str = TOKENIZER_DIR):
+        self.backend = 'heuristic'
+        self._encode = None
+
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding('cl100k_base')
+            self._encode = lambda text: encoding.encode(text, disallowed_special=())
+            self.backend = 'tiktoken'
+            return
+        except Exception:
+            pass
+
+        try:
+            from tokenizers import ByteLevelBPETokenizer
+            tokenizer = ByteLevelBPETokenizer(
+                os.path.join(tokenizer_dir, 'vocab.json'),
+                os.path.join(tokenizer_dir, 'merges.txt')
+            )
+            self._encode = lambda text: tokenizer.encode(text).ids
+            self.backend = 'bpe'
+        except Exception as e:
+            logger.info(f"No local tokenizer available, estimating token counts: {e}")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encode is None:
+            return int(len(text) / CHARS_PER_TOKEN) + 1
+        return len(self._encode(text))
+
+
+_default_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """Get the process-wide token counter, loading the tokenizer on first use"""
+    global _default_counter
+    if _default_counter is None:
+        _default_counter = TokenCounter()
+    return _default_counter
@@ -0,0 +1,95 @@
+"""Benchmark the single-parse Python analysis engine against the legacy pipeline
+
+Run from the repository root:
+
+    python benchmarks/bench_python_engine.py
+
+Only the parse/metrics/AST-rule work is measured; pylint runs on its own
+worker pool and is excluded from both sides.
+"""
+import ast
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from radon.complexity import cc_visit
+from radon.metrics import mi_visit
+from radon.raw import analyze
+
+from services.python_engine import PythonAnalysisEngine
+
+FUNCTION_TEMPLATE = '''
+def compute_{index}(values, threshold):
+    """Filter and aggregate values"""
+    # running total
+    total = 0
+    for v in values:
+        if v > threshold and v % 2 == 0:
+            total += v
+        elif v < 0:
+            total -= v
+    x = total * 2
+    return x
+'''
+
+
+def make_source(line_count: int) -> str:
+    """Generate a Python module of roughly ``line_count`` lines"""
+    lines_per_function = FUNCTION_TEMPLATE.count('\n')
+    functions = max(1, line_count // lines_per_function)
+    return '"""Synthetic module"""\n' + ''.join(FUNCTION_TEMPLATE.format(index=i) for i in range(functions))
+
+
+def legacy_analyze(code: str) -> dict:
+    """The pre-engine pipeline: ast.parse, cc_visit, mi_visit and analyze each parse the code"""
+    tree = ast.parse(code)
+    metrics = {'line_count': len(code.splitlines()), 'character_count': len(code)}
+    complexity_results = cc_visit(code)
+    metrics['cyclomatic_complexity'] = max([func.complexity for func in complexity_results] + [0])
+    metrics['function_count'] = len(complexity_results)
+    metrics['maintainability_index'] = mi_visit(code, multi=True)
+    raw_metrics = analyze(code)
+    metrics['comment_lines'] = raw_metrics.comments
+    metrics['blank_lines'] = raw_metrics.blank
+    metrics['code_lines'] = raw_metrics.loc
+
+    issues = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.Module)):
+            if not ast.get_docstring(node):
+                issues.append(f"No docstring for {node.__class__.__name__.lower()} '{getattr(node, 'name', 'module')}'")
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            if len(node.id) == 1 and node.id.isalpha():
+                issues.append(f"Single-letter variable name '{node.id}'")
+        if isinstance(node, ast.FunctionDef):
+            body_lines = len(node.body)
+            if body_lines > 50:
+                issues.append(f"Overly long function '{node.name}' ({body_lines} lines)")
+    return {'issues': issues, 'metrics': metrics}
+
+
+def best_of(func, code: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(code)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    engine = PythonAnalysisEngine()
+    print(f"{'lines':>8} {'legacy (ms)':>12} {'engine (ms)':>12} {'speedup':>8}")
+    for line_count in (1_000, 10_000, 50_000):
+        code = make_source(line_count)
+        assert legacy_analyze(code) == engine.analyze(code), "engine output diverged from legacy"
+        repeat = 5 if line_count < 50_000 else 3
+        legacy = best_of(legacy_analyze, code, repeat)
+        single = best_of(engine.analyze, code, repeat)
+        print(f"{line_count:>8} {legacy * 1000:>12.1f} {single * 1000:>12.1f} {legacy / single:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark how rule scanning cost grows with the number of rules
+
+Run from the repository root:
+
+    python benchmarks/bench_rule_scanner.py
+
+Scans a generated Python module with the shipped rule pack plus N
+synthetic rules. With the anchor prefilter the time should stay roughly
+flat as N grows; a plain alternation of all rules grows linearly.
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from services.rule_scanner import RuleScanner, get_rule_scanner
+
+SNIPPET = '''
+def handler_{index}(request, data):
+    """Process a request"""  # eval( in a comment is ignored
+    for key in data.keys():
+        result = "value: " + str(data[key])
+    for i in range(len(data)):
+        os.system(request.args[i])
+    return result
+'''
+
+
+def synthetic_rules(count: int) -> list:
+    rng = random.Random(count)
+    rules = []
+    for i in range(count):
+        name = ''.join(rng.choices(string.ascii_lowercase, k=8))
+        if i % 10:
+            rules.append({'id': f"SYN-{i}", 'category': 'security', 'message': name, 'token': f"{name}("})
+        else:
+            rules.append({'id': f"SYN-{i}", 'category': 'performance', 'message': name,
+                          'regex': rf"\b{name}\s*=\s*\w+\(", 'anchors': [name]})
+    return rules
+
+
+def bench(scanner: RuleScanner, code: str, rounds: int = 10) -> float:
+    scanner.scan(code)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        scanner.scan(code)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    code = ''.join(SNIPPET.format(index=i) for i in range(250))
+    base = get_rule_scanner('python')
+    print(f"{len(code.splitlines())} lines, {len(base.scan(code))} hits from the python pack")
+    print(f"{'rules':>6} {'ms/scan':>9}")
+    for extra in (0, 100, 1000, 5000):
+        scanner = RuleScanner(base.rules + synthetic_rules(extra), 'python')
+        print(f"{len(scanner.rules):>6} {bench(scanner, code):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
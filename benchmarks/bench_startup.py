@@ -0,0 +1,70 @@
+"""Measure backend worker startup time and memory
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--repeat 5] [--warmup]
+
+Each sample imports ``backend/app.py`` in a fresh interpreter, which is what
+a gunicorn worker does on boot, and reports the wall time and peak RSS of
+that process. With ``--warmup`` the sample also runs ``warmup_services()``,
+showing the cost that lazy loading defers until first use.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PROBE = '''
+import json, resource, sys, time
+sys.path.insert(0, "backend")
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+timings = {}
+if WARMUP:
+    timings = app.warmup_services()
+total = time.perf_counter() - start
+print(json.dumps({
+    "import_s": imported,
+    "total_s": total,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": sorted(m for m in ("torch", "transformers", "openai", "google.generativeai",
+                                        "javalang", "esprima", "lizard", "radon") if m in sys.modules),
+    "warmup": timings,
+}))
+'''
+
+
+def sample(warmup: bool) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.replace('WARMUP', str(warmup))],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', action='store_true', help='also run warmup_services()')
+    args = parser.parse_args()
+
+    samples = [sample(args.warmup) for _ in range(args.repeat)]
+    print(f"import app:   median {statistics.median(s['import_s'] for s in samples) * 1000:.0f} ms")
+    if args.warmup:
+        print(f"with warmup:  median {statistics.median(s['total_s'] for s in samples) * 1000:.0f} ms")
+        for name, seconds in samples[-1]['warmup'].items():
+            print(f"  {name:<20} {seconds * 1000:.0f} ms")
+    print(f"peak RSS:     median {statistics.median(s['peak_rss_mb'] for s in samples):.0f} MB")
+    print(f"heavy modules loaded: {', '.join(samples[-1]['heavy_modules']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Per-worker memory report for a running gunicorn backend
+
+Run on the host (or in the container) serving the backend:
+
+    python benchmarks/memory_report.py [MASTER_PID]
+
+Without a PID the gunicorn master is found with ``pgrep``. For each worker
+it prints RSS, PSS and USS. When the model weights are shared, each
+worker's PSS/USS stays well below its RSS, and the total PSS is the real
+memory footprint of the whole server.
+"""
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from utils.memory import process_memory
+
+
+def find_master() -> int:
+    pids = subprocess.run(['pgrep', '-o', '-f', 'gunicorn'], capture_output=True, text=True).stdout.split()
+    if not pids:
+        sys.exit("No gunicorn process found")
+    return int(pids[0])
+
+
+def children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def main():
+    master = int(sys.argv[1]) if len(sys.argv) > 1 else find_master()
+    rows = [('master', process_memory(master))]
+    rows += [('worker', process_memory(pid)) for pid in children(master)]
+
+    print(f"{'role':<8} {'pid':>7} {'rss MB':>9} {'pss MB':>9} {'uss MB':>9} {'shared MB':>10}")
+    for role, report in rows:
+        shared = report.get('shared_clean_mb', 0) + report.get('shared_dirty_mb', 0)
+        print(f"{role:<8} {report['pid']:>7} {report.get('rss_mb', 0):>9.1f} {report.get('pss_mb', 0):>9.1f} "
+              f"{report.get('uss_mb', 0):>9.1f} {shared:>10.1f}")
+
+    print(f"{'total':<8} {'':>7} {sum(r.get('rss_mb', 0) for _, r in rows):>9.1f} "
+          f"{sum(r.get('pss_mb', 0) for _, r in rows):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
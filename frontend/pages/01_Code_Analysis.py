@@ -7,6 +7,8 @@ from components.code_editor import CodeEditor
 from components.voice_player import VoicePlayer
 from components.metrics_display import MetricsDisplay
 
+BACKEND_URL = "http://localhost:5001"
+
 def render():
     st.title("🔍 Code Analysis & Roasting")
     st.markdown("Analyze your code across multiple languages with AI-powered feedback")
@@ -47,81 +49,178 @@ def render():
         # Analyze button
         if st.button("🚀 Analyze & Roast", use_container_width=True):
             if code.strip():
-                with st.spinner("Analyzing code..."):
-                    result = analyze_code(code, language, intensity)
-                    if result:
-                        st.session_state.analysis_result = result
-                        st.rerun()
+                st.session_state.analysis_request = {
+                    "code": code,
+                    "language": language,
+                    "intensity": intensity
+                }
+                st.session_state.analysis_result = None
             else:
                 st.warning("Please enter some code to analyze")
     
     with col2:
         st.subheader("📊 Analysis Results")
         
-        if st.session_state.analysis_result:
-            result = st.session_state.analysis_result
-            
-            # Display roasts
-            st.markdown("### 🔥 Roasts")
-            if 'roast' in result and 'text' in result['roast']:
-                st.markdown(f"""
-                <div class="roast-card">
-                    <div class="roast-content">{result['roast']['text']}</div>
-                    <div class="roast-intensity">{result['roast']['intensity'].upper()}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # Play audio
-            if 'audio' in result and result['audio']:
-                VoicePlayer(result['audio']).render()
-            
-            # Display metrics
-            if 'metrics' in result:
-                st.markdown("### 📈 Code Metrics")
-                MetricsDisplay(result['metrics']).render()
+        if st.session_state.get('analysis_request'):
+            # Render each stage as the backend streams it in
+            analysis_request = st.session_state.pop('analysis_request')
+            placeholder = st.empty()
+            result = None
+            for partial in stream_analysis(**analysis_request):
+                result = partial
+                with placeholder.container():
+                    render_result(result, language, interactive=False)
             
-            # Display issues
-            if 'analysis' in result and 'issues' in result['analysis']:
-                st.markdown("### ⚠️ Issues Found")
-                issues = result['analysis']['issues']
-                if issues:
-                    for i, issue in enumerate(issues[:10]):  # Limit to 10 issues
-                        st.markdown(f"**{i+1}.** {issue}")
-                else:
-                    st.success("🎉 No major issues found!")
-            
-            # Display suggestions
-            if 'suggestions' in result:
-                st.markdown("### 💡 Suggestions")
-                for i, suggestion in enumerate(result['suggestions'][:5]):
-                    st.markdown(f"**{i+1}.** {suggestion}")
-            
-            # Display corrected code
-            if 'corrected_code' in result and result['corrected_code']:
-                with st.expander("✨ Improved Code", expanded=False):
-                    st.code(result['corrected_code'], language=language)
-                    
-                    # Download button
-                    st.download_button(
-                        label="📥 Download Improved Code",
-                        data=result['corrected_code'],
-                        file_name=f"improved_code.{get_file_extension(language)}",
-                        mime="text/plain"
-                    )
-            
-            # Share results
-            st.markdown("---")
-            if st.button("📤 Share Analysis", use_container_width=True):
-                share_analysis(result)
+            if result:
+                st.session_state.analysis_result = result
+                st.rerun()
+        
+        elif st.session_state.analysis_result:
+            render_result(st.session_state.analysis_result, language)
         
         else:
             st.info("👈 Enter code and click 'Analyze & Roast' to see results")
 
+def render_result(result, language, interactive=True):
+    """Render a (possibly partial) analysis result
+    
+    Widgets are only rendered when ``interactive`` is set, since partial
+    results are redrawn repeatedly while the analysis streams in.
+    """
+    # Display roasts
+    st.markdown("### 🔥 Roasts")
+    if 'roast' in result and 'text' in result['roast']:
+        st.markdown(f"""
+        <div class="roast-card">
+            <div class="roast-content">{result['roast']['text']}</div>
+            <div class="roast-intensity">{result['roast']['intensity'].upper()}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.caption("Roasting in progress...")
+    
+    # Play audio (the result only carries the blob's URL)
+    if interactive and 'audio' in result and result['audio']:
+        audio_bytes = fetch_audio(result['audio'])
+        if audio_bytes:
+            VoicePlayer(audio_bytes).render()
+    
+    # Display metrics
+    if 'metrics' in result:
+        st.markdown("### 📈 Code Metrics")
+        MetricsDisplay(result['metrics']).render()
+    
+    # Display issues
+    if 'analysis' in result and 'issues' in result['analysis']:
+        st.markdown("### ⚠️ Issues Found")
+        issues = result['analysis']['issues']
+        if issues:
+            for i, issue in enumerate(issues[:10]):  # Limit to 10 issues
+                st.markdown(f"**{i+1}.** {issue}")
+        else:
+            st.success("🎉 No major issues found!")
+    
+    # Display suggestions
+    if 'suggestions' in result:
+        st.markdown("### 💡 Suggestions")
+        for i, suggestion in enumerate(result['suggestions'][:5]):
+            st.markdown(f"**{i+1}.** {suggestion}")
+    
+    # Display corrected code
+    if 'corrected_code' in result and result['corrected_code']:
+        with st.expander("✨ Improved Code", expanded=False):
+            st.code(result['corrected_code'], language=language)
+            
+            if interactive:
+                # Download button
+                st.download_button(
+                    label="📥 Download Improved Code",
+                    data=result['corrected_code'],
+                    file_name=f"improved_code.{get_file_extension(language)}",
+                    mime="text/plain"
+                )
+    
+    # Share results
+    if interactive:
+        st.markdown("---")
+        if st.button("📤 Share Analysis", use_container_width=True):
+            share_analysis(result)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def fetch_audio(audio_url):
+    """Fetch an audio blob; URLs are content-addressed, so they are safe to cache"""
+    try:
+        response = requests.get(f"{BACKEND_URL}{audio_url}", timeout=10)
+        if response.status_code == 200:
+            return response.content
+    except requests.exceptions.RequestException:
+        pass
+    return None
+
+def stream_analysis(code, language, intensity):
+    """Stream analysis stages from the backend, yielding the merged result after each one
+    
+    The roast and suggestions are also yielded token by token as drafts,
+    which the final stage events then replace. Falls back to the blocking
+    endpoint if the stream cannot be opened.
+    """
+    result = {}
+    drafts = {}
+    try:
+        with requests.post(
+            f"{BACKEND_URL}/api/analyze/stream",
+            json={
+                "code": code,
+                "language": language,
+                "roast_level": intensity,
+                "user_id": st.session_state.get("user_id", "anonymous"),
+                "stream_tokens": True
+            },
+            stream=True,
+            timeout=(5, 60)
+        ) as response:
+            if response.status_code != 200:
+                st.error(f"Analysis failed: {response.text}")
+                return
+            
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:") and event:
+                    payload = json.loads(line[len("data:"):])
+                    if event == "error":
+                        st.error(f"Analysis failed: {payload.get('message', payload.get('error'))}")
+                        return
+                    if event.endswith("_token"):
+                        stage = event[:-len("_token")]
+                        drafts[stage] = drafts.get(stage, "") + payload["text"]
+                        if stage == "roast":
+                            result["roast"] = {"text": drafts[stage], "intensity": intensity}
+                        elif stage == "suggestions":
+                            result["suggestions"] = [s.strip() for s in drafts[stage].splitlines() if s.strip()]
+                    else:
+                        result.update(payload)
+                    yield result
+                    event = None
+    
+    except requests.exceptions.RequestException:
+        if not result:
+            fallback = analyze_code(code, language, intensity)
+            if fallback:
+                yield fallback
+        return
+    
+    # Track in session state
+    if 'stats' not in st.session_state:
+        st.session_state.stats = {'analyses': 0, 'generations': 0}
+    st.session_state.stats['analyses'] += 1
+
 def analyze_code(code, language, intensity):
     """Send code to backend for analysis"""
     try:
         response = requests.post(
-            "http://localhost:5001/api/analyze",
+            f"{BACKEND_URL}/api/analyze",
             json={
                 "code": code,
                 "language": language,
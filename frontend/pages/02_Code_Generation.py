@@ -0,0 +1,184 @@
+import streamlit as st
+import requests
+import json
+
+BACKEND_URL = "http://localhost:5001"
+
+def render():
+    st.title("⚡ Code Generation")
+    st.markdown("Describe what you need and watch the code being written")
+    
+    if 'generation_result' not in st.session_state:
+        st.session_state.generation_result = None
+    
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        st.subheader("💬 Prompt")
+        
+        prompt = st.text_area(
+            "What should the code do?",
+            height=200,
+            placeholder="e.g. Parse a CSV file and print the average of each column"
+        )
+        
+        language = st.selectbox(
+            "Select Language",
+            ["python", "javascript", "java", "cpp", "typescript", "go", "rust"],
+            index=0
+        )
+        
+        complexity = st.radio(
+            "Complexity",
+            ["simple", "medium", "advanced"],
+            index=1,
+            horizontal=True
+        )
+        
+        if st.button("✨ Generate Code", use_container_width=True):
+            if prompt.strip():
+                st.session_state.generation_request = {
+                    "prompt": prompt,
+                    "language": language,
+                    "complexity": complexity
+                }
+                st.session_state.generation_result = None
+            else:
+                st.warning("Please describe the code you want")
+    
+    with col2:
+        st.subheader("🧾 Generated Code")
+        
+        if st.session_state.get('generation_request'):
+            # Render the code and roast as the backend streams them in
+            generation_request = st.session_state.pop('generation_request')
+            placeholder = st.empty()
+            result = None
+            for partial in stream_generation(**generation_request):
+                result = partial
+                with placeholder.container():
+                    render_result(result, language, interactive=False)
+            
+            if result:
+                st.session_state.generation_result = result
+                st.rerun()
+        
+        elif st.session_state.generation_result:
+            render_result(st.session_state.generation_result, language)
+        
+        else:
+            st.info("👈 Describe your code and click 'Generate Code'")
+
+def render_result(result, language, interactive=True):
+    """Render a (possibly partial) generation result"""
+    if result.get('code'):
+        st.code(result['code'], language=language)
+        
+        if interactive:
+            st.download_button(
+                label="📥 Download Code",
+                data=result['code'],
+                file_name=f"generated_code.{get_file_extension(language)}",
+                mime="text/plain"
+            )
+    else:
+        st.caption("Generating...")
+    
+    if 'roast' in result and result['roast'].get('text'):
+        st.markdown("### 🔥 Roast of the Generated Code")
+        st.markdown(result['roast']['text'])
+    
+    if 'analysis' in result and result['analysis'].get('issues'):
+        with st.expander("⚠️ Issues Found", expanded=False):
+            for i, issue in enumerate(result['analysis']['issues'][:10]):
+                st.markdown(f"**{i+1}.** {issue}")
+
+def stream_generation(prompt, language, complexity):
+    """Stream generated code from the backend token by token, yielding the merged result
+    
+    Falls back to the blocking endpoint if the stream cannot be opened.
+    """
+    result = {}
+    drafts = {}
+    try:
+        with requests.post(
+            f"{BACKEND_URL}/api/generate/stream",
+            json={
+                "prompt": prompt,
+                "language": language,
+                "complexity": complexity,
+                "user_id": st.session_state.get("user_id", "anonymous")
+            },
+            stream=True,
+            timeout=(5, 120)
+        ) as response:
+            if response.status_code != 200:
+                st.error(f"Generation failed: {response.text}")
+                return
+            
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:") and event:
+                    payload = json.loads(line[len("data:"):])
+                    if event == "error":
+                        st.error(f"Generation failed: {payload.get('error')}")
+                        return
+                    if event == "code_token":
+                        drafts["code"] = drafts.get("code", "") + payload["text"]
+                        result["code"] = drafts["code"]
+                    elif event == "roast_token":
+                        drafts["roast"] = drafts.get("roast", "") + payload["text"]
+                        result["roast"] = {"text": drafts["roast"]}
+                    else:
+                        result.update(payload)
+                    yield result
+                    event = None
+    
+    except requests.exceptions.RequestException:
+        if not result:
+            fallback = generate_code(prompt, language, complexity)
+            if fallback:
+                yield fallback
+        return
+    
+    if 'stats' not in st.session_state:
+        st.session_state.stats = {'analyses': 0, 'generations': 0}
+    st.session_state.stats['generations'] += 1
+
+def generate_code(prompt, language, complexity):
+    """Generate code with the blocking endpoint"""
+    try:
+        response = requests.post(
+            f"{BACKEND_URL}/api/generate",
+            json={
+                "prompt": prompt,
+                "language": language,
+                "complexity": complexity,
+                "user_id": st.session_state.get("user_id", "anonymous")
+            },
+            timeout=60
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        st.error(f"Generation failed: {response.text}")
+        return None
+    
+    except Exception as e:
+        st.error(f"Connection error: {str(e)}")
+        return None
+
+def get_file_extension(language):
+    """Get file extension for language"""
+    extensions = {
+        "python": "py",
+        "javascript": "js",
+        "java": "java",
+        "cpp": "cpp",
+        "typescript": "ts",
+        "go": "go",
+        "rust": "rs"
+    }
+    return extensions.get(language, "txt")
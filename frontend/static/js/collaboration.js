@@ -0,0 +1,292 @@
+// Delta-based code synchronization for collaboration sessions.
+//
+// Mirrors backend/models/operations.py: an operation is
+// {type: 'insert', pos, text} or {type: 'delete', pos, length} and a delta
+// is a list of operations. The client keeps at most one delta in flight;
+// edits made while waiting for its code_ack are buffered, and incoming
+// deltas from other participants are transformed past both.
+//
+// Every ack and delta carries the version it produced, one past the
+// previous. They can arrive out of order (e.g. through the message queue
+// between workers), so each is held until the gap before it fills; a gap
+// that stays open asks the server for a resync.
+
+(function (global) {
+    'use strict';
+
+    function insert(pos, text) {
+        return { type: 'insert', pos: pos, text: text };
+    }
+
+    function del(pos, length) {
+        return { type: 'delete', pos: pos, length: length };
+    }
+
+    function apply(text, delta) {
+        delta.forEach(function (op) {
+            if (op.type === 'insert') {
+                text = text.slice(0, op.pos) + op.text + text.slice(op.pos);
+            } else {
+                text = text.slice(0, op.pos) + text.slice(op.pos + op.length);
+            }
+        });
+        return text;
+    }
+
+    function diff(oldText, newText) {
+        var limit = Math.min(oldText.length, newText.length);
+        var prefix = 0;
+        while (prefix < limit && oldText[prefix] === newText[prefix]) {
+            prefix++;
+        }
+        var suffix = 0;
+        while (suffix < limit - prefix &&
+               oldText[oldText.length - 1 - suffix] === newText[newText.length - 1 - suffix]) {
+            suffix++;
+        }
+
+        var delta = [];
+        if (oldText.length - prefix - suffix > 0) {
+            delta.push(del(prefix, oldText.length - prefix - suffix));
+        }
+        if (newText.length - prefix - suffix > 0) {
+            delta.push(insert(prefix, newText.slice(prefix, newText.length - suffix)));
+        }
+        return delta;
+    }
+
+    function transformOp(a, b, aFirst) {
+        if (b.type === 'insert') {
+            var shift = b.text.length;
+            if (a.type === 'insert') {
+                if (a.pos < b.pos || (a.pos === b.pos && aFirst)) {
+                    return [a];
+                }
+                return [insert(a.pos + shift, a.text)];
+            }
+            var start = a.pos, end = a.pos + a.length;
+            if (b.pos <= start) {
+                return [del(start + shift, a.length)];
+            }
+            if (b.pos >= end) {
+                return [a];
+            }
+            var before = b.pos - start;
+            return [del(start, before), del(start + shift, a.length - before)];
+        }
+
+        var bStart = b.pos, bEnd = b.pos + b.length;
+        if (a.type === 'insert') {
+            if (a.pos <= bStart) {
+                return [a];
+            }
+            if (a.pos >= bEnd) {
+                return [insert(a.pos - b.length, a.text)];
+            }
+            return [insert(bStart, a.text)];
+        }
+        var aStart = a.pos, aEnd = a.pos + a.length;
+        if (aEnd <= bStart) {
+            return [a];
+        }
+        if (aStart >= bEnd) {
+            return [del(aStart - b.length, a.length)];
+        }
+        var remaining = a.length - (Math.min(aEnd, bEnd) - Math.max(aStart, bStart));
+        return remaining ? [del(Math.min(aStart, bStart), remaining)] : [];
+    }
+
+    // Returns [a', b'] with a' applying after b and b' applying after a
+    function transformPair(a, b, aFirst) {
+        if (!a.length || !b.length) {
+            return [a, b];
+        }
+        var head, tail;
+        if (a.length > 1) {
+            head = transformPair(a.slice(0, 1), b, aFirst);
+            tail = transformPair(a.slice(1), head[1], aFirst);
+            return [head[0].concat(tail[0]), tail[1]];
+        }
+        if (b.length > 1) {
+            head = transformPair(a, b.slice(0, 1), aFirst);
+            tail = transformPair(head[0], b.slice(1), aFirst);
+            return [tail[0], head[1].concat(tail[1])];
+        }
+        return [transformOp(a[0], b[0], aFirst), transformOp(b[0], a[0], !aFirst)];
+    }
+
+    // Keeps a local copy of the session code in step with the server.
+    //
+    // options.onChange(code, delta) is called whenever remote edits change
+    // the code; options.onResync(code) when the server replaced it wholesale;
+    // options.onPresence(cursors) with each batched frame of other
+    // participants' cursors.
+    var RESYNC_AFTER_MS = 2000;
+
+    function CollaborationClient(socket, sessionId, userId, options) {
+        this.socket = socket;
+        this.sessionId = sessionId;
+        this.userId = userId;
+        this.options = options || {};
+        this.code = '';
+        this.version = 0;
+        this.inflight = null;
+        this.buffer = null;
+        this.pending = {};
+        this.gapTimer = null;
+
+        var self = this;
+        socket.on('code_sync', function (data) { self.resync(data); });
+        socket.on('code_resync', function (data) { self.resync(data); });
+        socket.on('code_ack', function (data) { self.acknowledge(data); });
+        socket.on('code_delta', function (data) { self.receive(data); });
+        socket.on('presence', function (data) { self.presence(data); });
+    }
+
+    CollaborationClient.prototype.resync = function (data) {
+        this.code = data.code;
+        this.version = data.version;
+        this.inflight = null;
+        this.buffer = null;
+        if (this.options.onResync) {
+            this.options.onResync(this.code);
+        }
+        this.drain();
+    };
+
+    CollaborationClient.prototype.requestResync = function () {
+        this.socket.emit('request_resync', {
+            session_id: this.sessionId,
+            user_id: this.userId
+        });
+    };
+
+    // Record a local edit, given the editor's full text after it
+    CollaborationClient.prototype.edit = function (newCode, cursorPosition) {
+        var delta = diff(this.code, newCode);
+        if (!delta.length) {
+            return;
+        }
+        this.code = newCode;
+        this.cursorPosition = cursorPosition;
+        if (this.inflight) {
+            this.buffer = (this.buffer || []).concat(delta);
+        } else {
+            this.send(delta);
+        }
+    };
+
+    CollaborationClient.prototype.send = function (delta) {
+        this.inflight = delta;
+        this.socket.emit('code_delta', {
+            session_id: this.sessionId,
+            user_id: this.userId,
+            version: this.version,
+            ops: delta,
+            cursor_position: this.cursorPosition
+        });
+    };
+
+    // Report a cursor move or selection without an edit. The server batches
+    // these, so calling this on every keystroke is fine.
+    CollaborationClient.prototype.moveCursor = function (cursorPosition, selection) {
+        this.cursorPosition = cursorPosition;
+        this.socket.emit('cursor_update', {
+            session_id: this.sessionId,
+            user_id: this.userId,
+            cursor_position: cursorPosition,
+            selection: selection
+        });
+    };
+
+    CollaborationClient.prototype.presence = function (data) {
+        var userId = this.userId;
+        var cursors = data.cursors.filter(function (cursor) { return cursor.user_id !== userId; });
+        if (cursors.length && this.options.onPresence) {
+            this.options.onPresence(cursors);
+        }
+    };
+
+    CollaborationClient.prototype.acknowledge = function (data) {
+        this.enqueue('ack', data);
+    };
+
+    CollaborationClient.prototype.receive = function (data) {
+        this.enqueue('delta', data);
+    };
+
+    CollaborationClient.prototype.enqueue = function (kind, data) {
+        // A duplicate, or already covered by a resync; applying it would
+        // move the version backwards
+        if (data.version <= this.version) {
+            return;
+        }
+        this.pending[data.version] = { kind: kind, data: data };
+        this.drain();
+    };
+
+    // Apply held acks and deltas for as long as the next version is present
+    CollaborationClient.prototype.drain = function () {
+        var self = this;
+        var next;
+        Object.keys(this.pending).forEach(function (version) {
+            if (Number(version) <= self.version) {
+                delete self.pending[version];
+            }
+        });
+        while ((next = this.pending[this.version + 1])) {
+            delete this.pending[this.version + 1];
+            if (next.kind === 'ack') {
+                this.applyAck(next.data);
+            } else {
+                this.applyDelta(next.data);
+            }
+        }
+
+        if (!Object.keys(this.pending).length) {
+            clearTimeout(this.gapTimer);
+            this.gapTimer = null;
+        } else if (this.gapTimer === null) {
+            this.gapTimer = setTimeout(function () {
+                self.gapTimer = null;
+                if (Object.keys(self.pending).length) {
+                    self.requestResync();
+                }
+            }, RESYNC_AFTER_MS);
+        }
+    };
+
+    CollaborationClient.prototype.applyAck = function (data) {
+        this.version = data.version;
+        this.inflight = null;
+        if (this.buffer) {
+            var buffer = this.buffer;
+            this.buffer = null;
+            this.send(buffer);
+        }
+    };
+
+    CollaborationClient.prototype.applyDelta = function (data) {
+        var ops = data.ops;
+        var pair;
+        // The server applied these before our pending edits, so they win ties
+        if (this.inflight) {
+            pair = transformPair(this.inflight, ops, false);
+            this.inflight = pair[0];
+            ops = pair[1];
+        }
+        if (this.buffer) {
+            pair = transformPair(this.buffer, ops, false);
+            this.buffer = pair[0];
+            ops = pair[1];
+        }
+        this.version = data.version;
+        this.code = apply(this.code, ops);
+        if (this.options.onChange) {
+            this.options.onChange(this.code, ops, data);
+        }
+    };
+
+    global.CollaborationClient = CollaborationClient;
+    global.CollaborationOps = { apply: apply, diff: diff, transformPair: transformPair };
+})(typeof window !== 'undefined' ? window : this);
@@ -7,7 +7,7 @@ redis-server --daemonize yes
 sleep 3
 
 # Start backend
-cd backend && gunicorn --bind 0.0.0.0:5001 --workers 2 app:app &
+WEB_CONCURRENCY=2 gunicorn --config backend/gunicorn.conf.py app:app &
 
 # Start frontend
 cd /app/frontend && streamlit run app.py --server.port 8501 --server.address 0.0.0.0
\ No newline at end of file
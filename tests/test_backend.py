@@ -0,0 +1,104 @@
+import random
+
+import fakeredis
+import pytest
+
+from models.collaboration import CollaborationSession
+from models.operations import _transform_pair, apply, delete, diff, insert
+from services.collaboration_store import SessionStore
+
+
+def _random_delta(rng, text):
+    """One or two random edits against text"""
+    delta = []
+    for _ in range(rng.randint(1, 2)):
+        text_after = apply(text, delta)
+        pos = rng.randint(0, len(text_after))
+        if text_after and rng.random() < 0.4:
+            pos = min(pos, len(text_after) - 1)
+            delta.append(delete(pos, rng.randint(1, len(text_after) - pos)))
+        else:
+            delta.append(insert(pos, rng.choice(['x', 'yy', '\n', 'zzz'])))
+    return delta
+
+
+def test_transform_converges_for_concurrent_deltas():
+    rng = random.Random(1234)
+    for _ in range(3000):
+        text = ''.join(rng.choice('abc \n') for _ in range(rng.randint(0, 12)))
+        a, b = _random_delta(rng, text), _random_delta(rng, text)
+
+        a_after_b, b_after_a = _transform_pair(a, b, a_first=False)
+
+        assert apply(apply(text, b), a_after_b) == apply(apply(text, a), b_after_a)
+
+
+def test_diff_round_trips():
+    rng = random.Random(99)
+    for _ in range(500):
+        old = ''.join(rng.choice('ab\n') for _ in range(rng.randint(0, 20)))
+        new = ''.join(rng.choice('ab\n') for _ in range(rng.randint(0, 20)))
+        assert apply(old, diff(old, new)) == new
+
+
+def test_session_merges_edits_made_against_the_same_version():
+    session = CollaborationSession('s1', 'demo', 'alice')
+    session.update_code('print("hi")\n', 'alice')
+    base = session.version
+
+    # Both clients edit version `base`; the server merges bob's past alice's
+    alice = [insert(0, '# header\n')]
+    bob = [insert(len(session.code), 'print("bye")\n')]
+    _, alice_applied = session.apply_delta(alice, base, 'alice')
+    _, bob_applied = session.apply_delta(bob, base, 'bob')
+
+    # Alice's edit was acked first, so she applies bob's merged delta as is;
+    # bob rebases alice's past his own pending edit, as the JS client does
+    alice_view = apply(apply('print("hi")\n', alice), bob_applied)
+    bob_view = apply(apply('print("hi")\n', bob), _transform_pair(bob, alice_applied, a_first=False)[1])
+    assert session.code == '# header\nprint("hi")\nprint("bye")\n'
+    assert alice_view == bob_view == session.code
+    assert session.get_code_at_version(base) == 'print("hi")\n'
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def test_session_store_workers_converge(redis_client):
+    first, second = SessionStore(redis_client), SessionStore(redis_client)
+    session = CollaborationSession('shared', 'demo', 'alice')
+    session.update_code('x = 1\n', 'alice')
+    first.create(session)
+
+    first.apply_delta(first.get('shared'), [insert(0, '# a\n')], 1, 'alice')
+    # The second worker edits the version it last saw; the store catches it up
+    second.apply_delta(second.get('shared'), [insert(6, 'y = 2\n')], 1, 'bob')
+
+    assert first.get('shared').code == second.get('shared').code == '# a\nx = 1\ny = 2\n'
+    assert first.get('shared').version == 3
+
+
+def test_session_store_retries_commit_after_concurrent_write(redis_client, monkeypatch):
+    first, second = SessionStore(redis_client), SessionStore(redis_client)
+    session = CollaborationSession('raced', 'demo', 'alice')
+    first.create(session)
+    second.get('raced')
+
+    original = SessionStore._write_commit
+    raced = []
+
+    def write_commit(store, pipe, *args):
+        # Let the other worker commit between our WATCH and EXEC, once
+        if store is first and not raced:
+            raced.append(True)
+            second.update_code(second.get('raced'), 'from second\n', 'bob')
+        return original(store, pipe, *args)
+
+    monkeypatch.setattr(SessionStore, '_write_commit', write_commit)
+    version, _ = first.apply_delta(first.get('raced'), [insert(0, 'from first\n')], 0, 'alice')
+
+    assert raced and version == 2
+    assert first.get('raced').code == second.get('raced').code
+    assert 'from first\n' in first.get('raced').code and 'from second\n' in first.get('raced').code
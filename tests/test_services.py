@@ -0,0 +1,315 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from services.llm_router import CircuitBreaker, LLMProvider, LLMRouter, LLMRouterError
+from services.rule_scanner import RuleScanner
+from utils.audio_store import AudioStore, audio_digest, render_key
+from utils.cache import CacheManager
+from utils.singleflight import SingleFlight
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def singleflight(redis_client):
+    return SingleFlight(redis_client, CacheManager(redis_client), poll_interval=0.01)
+
+
+def test_rendered_audio_survives_single_flight(redis_client, singleflight):
+    store = AudioStore(redis_client)
+    digest = audio_digest("Nice code. Said no one.", 'python', 'medium')
+
+    async def synthesize():
+        store.put(digest, b'ID3-mp3-bytes')
+        return store.url_for(digest)
+
+    url = asyncio.run(singleflight.do(render_key(digest), synthesize))
+
+    assert url == f"/api/audio/{digest}"
+    assert store.get(digest) == b'ID3-mp3-bytes'
+
+
+def test_single_flight_computes_once_across_callers(singleflight):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'text': 'roasted'}
+
+    async def run():
+        return await asyncio.gather(*(singleflight.do('roast:abc', compute) for _ in range(5)))
+
+    assert asyncio.run(run()) == [{'text': 'roasted'}] * 5
+    assert len(calls) == 1
+
+
+def test_single_flight_shares_empty_results(singleflight):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return None
+
+    async def run():
+        return await asyncio.gather(*(singleflight.do('tts:abc', compute) for _ in range(4)))
+
+    assert asyncio.run(run()) == [None] * 4
+    assert len(calls) == 1
+
+
+def _ids(hits):
+    return [(hit['id'], hit['line'], hit['column']) for hit in hits]
+
+
+def test_rule_scanner_finds_overlapping_anchors():
+    scanner = RuleScanner([
+        {'id': 'SHORT', 'category': 'style', 'regex': 'ab', 'anchors': ['ab'], 'message': 'm'},
+        {'id': 'LONG', 'category': 'style', 'regex': 'abc', 'anchors': ['abc'], 'message': 'm'},
+        {'id': 'TAIL', 'category': 'style', 'regex': 'bcd', 'anchors': ['bcd'], 'message': 'm'},
+    ])
+
+    assert sorted(_ids(scanner.scan('x = abcd'))) == [('LONG', 1, 5), ('SHORT', 1, 5), ('TAIL', 1, 6)]
+
+
+def test_rule_scanner_masks_comments_and_strings():
+    scanner = RuleScanner.from_pack('python')
+    code = "# eval(x) is bad\nmsg = 'eval(x)'\nvalue = eval(data)\n"
+
+    assert [hit for hit in _ids(scanner.scan(code)) if hit[0] == 'PY-SEC-001'] == [('PY-SEC-001', 3, 9)]
+
+
+def test_rule_scanner_raw_rules_see_strings():
+    scanner = RuleScanner.from_pack('python')
+
+    assert ('PY-SEC-009', 1, 1) in _ids(scanner.scan("api_key = 'sk-123456'\n"))
+
+
+def test_rule_scanner_reports_at_group_column():
+    scanner = RuleScanner.from_pack('python')
+    code = "if key in table.keys():\n    pass\n"
+
+    assert ('PY-PERF-002', 1, 8) in _ids(scanner.scan(code))
+
+
+def test_java_string_concat_flagged_only_in_loops():
+    pytest.importorskip('javalang')
+    from services.code_quality import CodeQualityAnalyzer
+
+    code = (
+        "class A {\n"
+        "  String f(int n) {\n"
+        "    String s = \"\";\n"
+        "    s += \"header\";\n"
+        "    for (int i = 0; i < n; i++) {\n"
+        "      s += \"row \" + i;\n"
+        "    }\n"
+        "    return s;\n"
+        "  }\n"
+        "}\n"
+    )
+    issues = [issue for issue in CodeQualityAnalyzer().analyze_java(code)['issues'] if '+=' in issue]
+
+    assert issues == ["Performance: String built with += inside a loop; use StringBuilder (line 6, col 7)"]
+
+
+def test_batch_job_timeout_recycles_pool():
+    import time
+    from services.batch_analysis import BatchAnalyzer
+
+    analyzer = BatchAnalyzer(cache_manager=None, analyzer_version='test', max_workers=1, item_timeout=1)
+    try:
+        executor = analyzer._get_executor()
+        with pytest.raises(TimeoutError):
+            asyncio.run(analyzer._run_job(executor, time.sleep, 120))
+        assert analyzer._executor is None
+
+        analyzer.item_timeout = 60
+        executor = analyzer._get_executor()
+        assert asyncio.run(analyzer._run_job(executor, abs, -3)) == 3
+    finally:
+        analyzer.shutdown()
+
+
+class StubProvider(LLMProvider):
+    """Answers with its name after ``delay`` seconds, or raises if ``fail`` is set"""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        super().__init__(timeout=5)
+        self.name = self.label = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def complete(self, messages, temperature, max_tokens):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return f"answer from {self.name}"
+
+
+MESSAGES = [{'role': 'user', 'content': 'roast me'}]
+
+
+def _open_breaker(provider, cooldown=0.0):
+    provider.breaker.cooldown = cooldown
+    for _ in range(provider.breaker.failure_threshold):
+        provider.breaker.record_failure(provider.stats)
+    assert provider.breaker.state == CircuitBreaker.OPEN
+
+
+def test_router_fails_over_to_next_provider():
+    primary, backup = StubProvider('primary', fail=True), StubProvider('backup')
+    router = LLMRouter([primary, backup], hedge=False)
+
+    assert asyncio.run(router.complete(MESSAGES)) == ('answer from backup', 'backup')
+    assert primary.breaker.consecutive_failures == 1
+
+
+def test_router_hedges_slow_primary_without_blaming_it():
+    primary, backup = StubProvider('primary', delay=1.0), StubProvider('backup')
+    router = LLMRouter([primary, backup], hedge=True, default_hedge_delay=0.05)
+
+    assert asyncio.run(router.complete(MESSAGES)) == ('answer from backup', 'backup')
+    assert primary.breaker.state == CircuitBreaker.CLOSED
+    assert primary.breaker.consecutive_failures == 0
+
+
+def test_router_skips_open_breaker_until_cooldown_then_closes_on_probe():
+    flaky, backup = StubProvider('flaky'), StubProvider('backup')
+    router = LLMRouter([flaky, backup], hedge=False)
+    _open_breaker(flaky, cooldown=60)
+
+    assert asyncio.run(router.complete(MESSAGES))[1] == 'backup'
+    assert flaky.calls == 0
+    assert flaky.breaker.state == CircuitBreaker.OPEN
+
+    flaky.breaker.cooldown = 0
+    assert asyncio.run(router.complete(MESSAGES))[1] == 'flaky'
+    assert flaky.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_breaker():
+    flaky, backup = StubProvider('flaky', fail=True), StubProvider('backup')
+    router = LLMRouter([flaky, backup], hedge=False)
+    _open_breaker(flaky)
+
+    assert asyncio.run(router.complete(MESSAGES))[1] == 'backup'
+    assert flaky.breaker.state == CircuitBreaker.OPEN
+
+
+def test_listing_candidates_does_not_take_the_probe():
+    flaky = StubProvider('flaky')
+    _open_breaker(flaky)
+    router = LLMRouter([StubProvider('primary'), flaky], hedge=False)
+
+    asyncio.run(router.complete(MESSAGES))
+
+    assert flaky.breaker.state == CircuitBreaker.OPEN
+    assert flaky.breaker.is_available()
+
+
+def test_cancelled_probe_is_released():
+    probe, backup = StubProvider('probe', delay=1.0), StubProvider('backup')
+    _open_breaker(probe)
+    router = LLMRouter([probe, backup], hedge=True, default_hedge_delay=0.05)
+
+    assert asyncio.run(router.complete(MESSAGES))[1] == 'backup'
+    assert probe.breaker.state == CircuitBreaker.OPEN
+    assert probe.breaker.is_available()
+
+
+def test_caller_cancelling_a_probe_releases_it():
+    probe = StubProvider('probe', delay=1.0)
+    _open_breaker(probe)
+    router = LLMRouter([probe], hedge=False)
+
+    async def run():
+        task = asyncio.ensure_future(router.complete(MESSAGES))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert probe.breaker.state == CircuitBreaker.OPEN
+
+
+def test_router_stream_fails_over_and_respects_exclude():
+    local, broken, remote = StubProvider('local'), StubProvider('broken', fail=True), StubProvider('remote')
+    router = LLMRouter([local, broken, remote])
+    chunks = []
+
+    text, label = asyncio.run(router.stream(MESSAGES, chunks.append, exclude=('local',)))
+
+    assert (text, label) == ('answer from remote', 'remote')
+    assert chunks == ['answer from remote']
+    assert local.calls == 0
+
+
+def test_router_raises_when_everything_is_excluded():
+    router = LLMRouter([StubProvider('local')])
+
+    with pytest.raises(LLMRouterError):
+        asyncio.run(router.complete(MESSAGES, exclude=('local',)))
+
+
+ENGINE_SAMPLE = '''"""Module docstring"""
+# a comment
+
+
+def grade(score):
+    """Map a score to a letter"""
+    if score > 90:
+        return 'A'
+    elif score > 75:
+        return 'B'
+    for bonus in range(3):
+        if bonus and score + bonus > 75:
+            return 'B-'
+    return 'C'
+
+
+class Report:
+    def render(self, items):
+        out = ''
+        for item in items:
+            out += str(item)
+        return out
+'''
+
+
+def test_python_engine_metrics_match_radon():
+    from radon.complexity import cc_visit
+    from radon.metrics import mi_visit
+    from radon.raw import analyze
+
+    from services.python_engine import PythonAnalysisEngine
+
+    metrics = PythonAnalysisEngine().analyze(ENGINE_SAMPLE)['metrics']
+    blocks = cc_visit(ENGINE_SAMPLE)
+    raw = analyze(ENGINE_SAMPLE)
+
+    assert metrics['maintainability_index'] == pytest.approx(mi_visit(ENGINE_SAMPLE, multi=True))
+    assert metrics['cyclomatic_complexity'] == max(block.complexity for block in blocks)
+    assert metrics['function_count'] == len(blocks)
+    assert (metrics['comment_lines'], metrics['blank_lines'], metrics['code_lines']) == (raw.comments, raw.blank, raw.loc)
+
+
+def test_python_engine_rules():
+    from services.python_engine import PythonAnalysisEngine
+
+    issues = PythonAnalysisEngine().analyze(ENGINE_SAMPLE)['issues']
+
+    assert "No docstring for classdef 'Report'" in issues
+    assert "No docstring for functiondef 'render'" in issues
+    assert "No docstring for functiondef 'grade'" not in issues
+    assert ("Performance: String built with += inside a loop; use str.join() instead (line 21, col 13)"
+            in issues)